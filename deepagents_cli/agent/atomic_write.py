@@ -0,0 +1,320 @@
+"""
+Atomic file writes shared by every write tool.
+
+A write goes to a temporary file in the target's directory, which is then
+renamed over the target with ``os.replace``. Readers, and a crash, see
+either the old or the new content, never a partial file. The target's
+permission bits are kept (a new file gets the umask's default, as with
+``open``), an existing target that is not writable raises PermissionError,
+and a symlinked target is written through rather than replaced.
+
+``WriteBatch`` commits several files as a group. All temporary files are
+written (and fsynced) first, concurrently on a small thread pool, then
+renamed one after another, and each affected directory is synced once at
+the end. If any temporary write fails, nothing is renamed. With
+``config.FSYNC_WRITES`` off the fsync calls are skipped: writes are faster,
+but a power loss may lose the latest ones.
+
+With ``journal=True`` a batch is a transaction: a write-ahead journal
+(see ``journal``) is recorded before the first rename. If a rename fails the
+files already renamed are rolled back from it, and ``recover_journals``
+rolls back transactions interrupted by a crash. Either every file gets its
+new content or none does. Frontends call ``recover_interrupted_writes`` when
+a session opens a root; it does nothing unless writes are allowed.
+
+Each renamed file is dropped from the content cache and reported to the
+search indexes, so callers do not invalidate anything themselves.
+"""
+from __future__ import annotations
+
+import errno
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Set, Tuple
+
+from . import config
+from .content_cache import content_cache
+from .journal import JournalEntry, JournalLock, journal_dir, pending_journals, read_journal, rollback_plan, write_journal
+from .logging import log
+from .query_cache import query_cache
+from .search_index import invalidate as _invalidate_index
+
+
+# temp files written (and fsynced) in parallel by one commit
+MAX_WRITE_WORKERS = 8
+
+
+def _encode(text: str, encoding: str) -> bytes:
+    # same newline translation as open(..., "w") / Path.write_text
+    if os.linesep != "\n":
+        text = text.replace("\n", os.linesep)
+    return text.encode(encoding)
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def _create_temp(directory: str, name: str, mode: int) -> Tuple[int, str]:
+    """Create a new temp file for ``name`` in ``directory``; the umask applies to ``mode``."""
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+    for _ in range(tempfile.TMP_MAX):
+        tmp = os.path.join(directory, f".{name}.{os.urandom(4).hex()}.tmp")
+        try:
+            return os.open(tmp, flags, mode), tmp
+        except FileExistsError:
+            continue
+    raise FileExistsError(errno.EEXIST, "No usable temporary file name", directory)
+
+
+def _fsync_dir(path: str) -> None:
+    if os.name == "nt":
+        return  # directories cannot be opened for fsync on Windows
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class WriteBatch:
+    """Stage whole-file writes and apply them together with ``commit()``."""
+
+    def __init__(self, fsync: Optional[bool] = None, journal: bool = False,
+                 root: Optional[str | os.PathLike[str]] = None, workers: int = MAX_WRITE_WORKERS):
+        self.fsync = config.FSYNC_WRITES if fsync is None else fsync
+        self.journal = journal
+        self.workers = workers
+        self.root = root  # where the journal is kept; defaults to FS_ROOT
+        self._staged: List[Tuple[str, bytes]] = []
+
+    def __len__(self) -> int:
+        return len(self._staged)
+
+    def add_bytes(self, path: str | os.PathLike[str], data: bytes) -> None:
+        self._staged.append((os.path.realpath(path), data))
+
+    def add_text(self, path: str | os.PathLike[str], text: str, encoding: str = "utf-8") -> None:
+        self.add_bytes(path, _encode(text, encoding))
+
+    def _write_temp(self, target: str, data: bytes) -> str:
+        directory, name = os.path.split(target)
+        os.makedirs(directory, exist_ok=True)
+        try:
+            mode: Optional[int] = os.stat(target).st_mode & 0o7777
+        except FileNotFoundError:
+            mode = None
+        else:
+            # os.replace only needs the directory to be writable; refuse like open() would
+            if not os.access(target, os.W_OK):
+                raise PermissionError(errno.EACCES, os.strerror(errno.EACCES), target)
+        fd, tmp = _create_temp(directory, name, 0o666 if mode is None else 0o600)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            if mode is not None:
+                os.chmod(tmp, mode)
+        except BaseException:
+            _unlink(tmp)
+            raise
+        return tmp
+
+    def _prepare(self, target: str, data: bytes) -> Tuple[str, Optional[JournalEntry]]:
+        entry = JournalEntry.diff(target, _read_old(target), data) if self.journal else None
+        tmp = self._write_temp(target, data)
+        if entry is not None:
+            entry.tmp = tmp
+        return tmp, entry
+
+    def _prepare_all(self, items: List[Tuple[str, bytes]]) -> List[Tuple[str, Optional[JournalEntry]]]:
+        workers = min(self.workers, len(items))
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(self._prepare, target, data) for target, data in items]
+                outcomes = []
+                for future in futures:
+                    try:
+                        outcomes.append(future.result())
+                    except BaseException as e:
+                        outcomes.append(e)
+        else:
+            outcomes = []
+            for target, data in items:
+                try:
+                    outcomes.append(self._prepare(target, data))
+                except BaseException as e:
+                    outcomes.append(e)
+                    break
+        errors = [o for o in outcomes if isinstance(o, BaseException)]
+        if errors:
+            for o in outcomes:
+                if not isinstance(o, BaseException):
+                    _unlink(o[0])
+            raise errors[0]
+        return outcomes
+
+    def commit(self) -> List[str]:
+        """Write every staged file; return the paths written, in staging order.
+
+        A later write to the same path wins. Raises if a temporary file
+        cannot be written (no target is touched) or if a rename fails. After
+        a failed rename, files renamed before it keep their new content,
+        unless the batch is journaled, in which case they are rolled back.
+        """
+        latest = {target: data for target, data in self._staged}
+        self._staged.clear()
+        root = self.root if self.root is not None else config.FS_ROOT
+        if self.journal:
+            recover_journals(root)
+        prepared = self._prepare_all(list(latest.items()))
+        temps = [(tmp, target) for (tmp, _), target in zip(prepared, latest)]
+        entries = [entry for _, entry in prepared if entry is not None]
+        journal: Optional[JournalLock] = None
+        if self.journal:
+            try:
+                journal = write_journal(journal_dir(root), entries, self.fsync)
+            except BaseException:
+                for tmp, _ in temps:
+                    _unlink(tmp)
+                raise
+        written: List[str] = []
+        try:
+            for tmp, target in temps:
+                os.replace(tmp, target)
+                written.append(target)
+                _invalidate(target)
+        except BaseException:
+            if journal is not None:
+                _rollback(entries[:len(written)], self.fsync)
+                journal.release()
+                written = []
+            raise
+        finally:
+            for tmp, _ in temps[len(written):]:
+                _unlink(tmp)
+            if self.fsync:
+                for directory in {os.path.dirname(t) for t in written}:
+                    _fsync_dir(directory)
+        if journal is not None:
+            journal.release()  # commit point
+        return written
+
+
+def _invalidate(path: str) -> None:
+    content_cache.invalidate(path)
+    _invalidate_index(path)
+    query_cache.clear()
+
+
+def _read_old(path: str) -> Optional[bytes]:
+    try:
+        return content_cache.read_bytes(path, populate=False)
+    except FileNotFoundError:
+        return None
+
+
+def _rollback(entries: List[JournalEntry], fsync: bool) -> List[str]:
+    """Undo journaled writes in reverse order; return the paths restored."""
+    restored = []
+    for entry in reversed(entries):
+        if entry.tmp:
+            _unlink(entry.tmp)
+        applies, old = rollback_plan(entry)
+        if not applies:
+            continue
+        if old is None:
+            _unlink(entry.path)
+            _invalidate(entry.path)
+        else:
+            atomic_write_bytes(entry.path, old, fsync)
+        restored.append(entry.path)
+    return restored
+
+
+_RECOVERED: Set[str] = set()
+_RECOVER_LOCK = threading.Lock()
+
+
+def recover_journals(root: Optional[str | os.PathLike[str]] = None, force: bool = False) -> List[str]:
+    """Roll back transactions under ``root`` that a crash left unfinished.
+
+    A journal whose lock is held belongs to a transaction still running in
+    another session (or thread) and is left alone; the root is then checked
+    again on the next call. Otherwise runs once per root per process unless
+    ``force`` is set. Returns the paths that were restored.
+    """
+    root = os.path.abspath(root if root is not None else config.FS_ROOT)
+    with _RECOVER_LOCK:
+        if root in _RECOVERED and not force:
+            return []
+        _RECOVERED.add(root)
+    restored: List[str] = []
+    in_progress = False
+    for path in pending_journals(root):
+        try:
+            lock = JournalLock.acquire(path)
+        except OSError as e:
+            log(f"atomic_write: cannot lock journal {path}: {e}")
+            continue
+        if lock is None:
+            in_progress = True
+            continue
+        if not path.exists():
+            lock.release()  # committed after it was listed
+            continue
+        try:
+            restored += _rollback(read_journal(path), config.FSYNC_WRITES)
+        except (OSError, ValueError) as e:
+            log(f"atomic_write: cannot replay journal {path}: {e}")
+            lock.release(delete_journal=False)
+            continue
+        lock.release()
+        log(f"atomic_write: rolled back unfinished transaction {path.name}")
+    if in_progress:
+        with _RECOVER_LOCK:
+            _RECOVERED.discard(root)
+    return restored
+
+
+def recover_interrupted_writes(root: Optional[str | os.PathLike[str]] = None) -> str:
+    """Run ``recover_journals`` for a session opening ``root``; return a notice for the user.
+
+    Without ``config.ALLOW_FS_WRITE`` nothing on disk is touched and the
+    journals are left for a session that may write. The notice names the
+    restored files, or is empty if nothing was restored.
+    """
+    if not config.ALLOW_FS_WRITE:
+        return ""
+    root = os.path.abspath(root if root is not None else config.FS_ROOT)
+    restored = recover_journals(root)
+    if not restored:
+        return ""
+    names = ", ".join(os.path.relpath(path, root) for path in restored)
+    return f"Rolled back {len(restored)} file(s) left by an interrupted multi-file edit: {names}"
+
+
+def atomic_write_bytes(path: str | os.PathLike[str], data: bytes, fsync: Optional[bool] = None) -> None:
+    """Replace ``path`` with ``data`` atomically (parent directories are created)."""
+    batch = WriteBatch(fsync)
+    batch.add_bytes(path, data)
+    batch.commit()
+
+
+def atomic_write_text(path: str | os.PathLike[str], text: str, encoding: str = "utf-8",
+                      fsync: Optional[bool] = None) -> None:
+    """Like ``Path.write_text`` but atomic; see ``atomic_write_bytes``."""
+    atomic_write_bytes(path, _encode(text, encoding), fsync)
+
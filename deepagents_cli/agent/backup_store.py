@@ -0,0 +1,275 @@
+"""
+Content-addressed backup store for the write tools.
+
+Before a tool overwrites a file, the old bytes are stored once under
+``~/.deepagents/backups/objects/`` keyed by their sha256 and compressed
+with zlib, so saving the same content twice (or the same file in many
+places) costs nothing extra. A small SQLite index records, per path, the
+ordered list of versions, so undo is a lookup rather than a search for a
+``.backup`` sibling file.
+
+Undo keeps a per-path cursor: after a restore it records which version was
+written back, so the next undo continues from there instead of from the
+newest version, and consecutive undos walk back through the history. The
+content a run of undos replaced is saved once, as a version marked
+``undo``, and can be restored by id. A new write (a new backup) resets the
+cursor.
+
+The store is bounded: each path keeps at most ``MAX_VERSIONS_PER_PATH``
+versions, and when the compressed objects exceed ``max_bytes`` the oldest
+versions are evicted, older-than-latest versions of each path first, and
+then unreferenced objects are deleted. The version being added is always
+kept, so a single object larger than ``max_bytes`` still gets one backup.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from .atomic_write import atomic_write_bytes
+from .content_cache import content_cache
+from .logging import log
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+MAX_VERSIONS_PER_PATH = 20
+_COMPRESS_LEVEL = 6
+
+
+@dataclass
+class BackupVersion:
+    id: int
+    path: str
+    hash: str
+    size: int
+    created: float
+    undo: bool = False  # saved by restore() rather than before a write
+
+
+class BackupStore:
+    """Deduplicated, compressed file versions with a per-path undo index."""
+
+    def __init__(self, directory: Optional[str | os.PathLike[str]] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = Path(directory) if directory is not None else Path.home() / ".deepagents" / "backups"
+        self.max_bytes = max_bytes
+        self.objects_dir = self.directory / "objects"
+        self.db_path = self.directory / "index.db"
+        self._lock = threading.Lock()
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS objects (
+                    hash TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    stored_size INTEGER NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS versions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    path TEXT NOT NULL,
+                    hash TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    undo INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            if "undo" not in {row[1] for row in conn.execute("PRAGMA table_info(versions)")}:
+                conn.execute("ALTER TABLE versions ADD COLUMN undo INTEGER NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_versions_path ON versions(path, id)")
+            # the version the last undo wrote back, and its hash to tell if the file changed since
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cursors (
+                    path TEXT PRIMARY KEY,
+                    version_id INTEGER NOT NULL,
+                    hash TEXT NOT NULL
+                )
+            """)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """One transaction on a fresh connection, closed afterwards."""
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / digest[2:]
+
+    @staticmethod
+    def _key(path: str | os.PathLike[str]) -> str:
+        return os.path.realpath(path)
+
+    def backup(self, path: str | os.PathLike[str], undo: bool = False) -> Optional[BackupVersion]:
+        """Record the current content of ``path``; returns None if it does not exist.
+
+        A backup taken before a write (``undo=False``) also resets the
+        path's undo cursor.
+        """
+        key = self._key(path)
+        try:
+            data = content_cache.read_bytes(key, populate=False)
+        except FileNotFoundError:
+            return None
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock, self._connect() as conn:
+            if not undo:
+                conn.execute("DELETE FROM cursors WHERE path = ?", (key,))
+            last = conn.execute(
+                "SELECT hash FROM versions WHERE path = ? ORDER BY id DESC LIMIT 1", (key,)).fetchone()
+            if last is None or last[0] != digest:
+                if conn.execute("SELECT 1 FROM objects WHERE hash = ?", (digest,)).fetchone() is None:
+                    stored = self._write_object(digest, data)
+                    conn.execute("INSERT INTO objects (hash, size, stored_size) VALUES (?, ?, ?)",
+                                 (digest, len(data), stored))
+                added = conn.execute("INSERT INTO versions (path, hash, created, undo) VALUES (?, ?, ?, ?)",
+                                     (key, digest, time.time(), int(undo))).lastrowid
+                conn.execute("""
+                    DELETE FROM versions WHERE path = ? AND id NOT IN (
+                        SELECT id FROM versions WHERE path = ? ORDER BY id DESC LIMIT ?)
+                """, (key, key, MAX_VERSIONS_PER_PATH))
+                self._evict(conn, keep=added)
+                # an undo cursor must not point at a version trimmed or evicted above
+                conn.execute("DELETE FROM cursors WHERE version_id NOT IN (SELECT id FROM versions)")
+            row = conn.execute(
+                "SELECT id, created FROM versions WHERE path = ? ORDER BY id DESC LIMIT 1", (key,)).fetchone()
+        return BackupVersion(row[0], key, digest, len(data), row[1])
+
+    def _write_object(self, digest: str, data: bytes) -> int:
+        target = self._object_path(digest)
+        payload = zlib.compress(data, _COMPRESS_LEVEL)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(payload)
+        os.replace(tmp, target)
+        return len(payload)
+
+    def _evict(self, conn: sqlite3.Connection, keep: int) -> None:
+        total = conn.execute("SELECT COALESCE(SUM(stored_size), 0) FROM objects").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # older versions first; each path's latest version only when nothing else is left.
+        # The version just added (``keep``) is never evicted, even if it alone exceeds the cap.
+        rows = conn.execute("""
+            SELECT v.id, v.id = (SELECT MAX(id) FROM versions WHERE path = v.path) AS latest
+            FROM versions v WHERE v.id != ? ORDER BY latest, v.id
+        """, (keep,)).fetchall()
+        for version_id, _ in rows:
+            conn.execute("DELETE FROM versions WHERE id = ?", (version_id,))
+            total -= self._drop_unreferenced(conn)
+            if total <= self.max_bytes:
+                break
+        log(f"backup_store: evicted down to {total} bytes")
+
+    def _drop_unreferenced(self, conn: sqlite3.Connection) -> int:
+        freed = 0
+        for digest, stored in conn.execute("""
+            SELECT hash, stored_size FROM objects
+            WHERE hash NOT IN (SELECT DISTINCT hash FROM versions)
+        """).fetchall():
+            conn.execute("DELETE FROM objects WHERE hash = ?", (digest,))
+            try:
+                os.unlink(self._object_path(digest))
+            except OSError:
+                pass
+            freed += stored
+        return freed
+
+    def versions(self, path: str | os.PathLike[str]) -> List[BackupVersion]:
+        """Backups of ``path``, newest first."""
+        key = self._key(path)
+        with self._connect() as conn:
+            rows = conn.execute("""
+                SELECT v.id, v.hash, o.size, v.created, v.undo FROM versions v JOIN objects o ON o.hash = v.hash
+                WHERE v.path = ? ORDER BY v.id DESC
+            """, (key,)).fetchall()
+        return [BackupVersion(r[0], key, r[1], r[2], r[3], bool(r[4])) for r in rows]
+
+    def _cursor(self, key: str) -> Optional[int]:
+        """The version the last undo of ``key`` restored, if the file still holds it."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT version_id, hash FROM cursors WHERE path = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        try:
+            current = hashlib.sha256(content_cache.read_bytes(key, populate=False)).hexdigest()
+        except FileNotFoundError:
+            return None
+        return row[0] if current == row[1] else None
+
+    def undo_steps(self, path: str | os.PathLike[str]) -> List[Tuple[Optional[int], BackupVersion]]:
+        """All versions of ``path``, newest first, each with the ``steps`` that restores it.
+
+        The step is None for versions undo does not walk to: those saved by
+        an undo, and those newer than the version the last undo restored.
+        """
+        key = self._key(path)
+        cursor = self._cursor(key)
+        out: List[Tuple[Optional[int], BackupVersion]] = []
+        step = 0
+        for version in self.versions(key):
+            if version.undo or (cursor is not None and version.id >= cursor):
+                out.append((None, version))
+            else:
+                step += 1
+                out.append((step, version))
+        return out
+
+    def read(self, version: BackupVersion) -> bytes:
+        with open(self._object_path(version.hash), "rb") as f:
+            return zlib.decompress(f.read())
+
+    def restore(self, path: str | os.PathLike[str], steps: int = 1,
+                version_id: Optional[int] = None) -> BackupVersion:
+        """Write back the version ``steps`` undos back, or the one with ``version_id``.
+
+        Steps count from the version the previous undo restored, so repeated
+        ``restore(path)`` calls step back one write at a time (see
+        ``undo_steps``). The content the first undo replaces is saved as an
+        ``undo`` version. Raises LookupError if there is no such version.
+        """
+        key = self._key(path)
+        history = self.undo_steps(key)
+        if version_id is not None:
+            found = [v for _, v in history if v.id == version_id]
+            if not found:
+                raise LookupError(f"no backup #{version_id} for {path}")
+            version = found[0]
+        else:
+            reachable = [v for step, v in history if step is not None]
+            if steps < 1 or steps > len(reachable):
+                raise LookupError(f"no backup {steps} step(s) back for {path} ({len(reachable)} available)")
+            version = reachable[steps - 1]
+        data = self.read(version)
+        if self._cursor(key) is None:
+            self.backup(key, undo=True)
+        atomic_write_bytes(key, data)
+        with self._lock, self._connect() as conn:
+            # the undo backup above may have trimmed the version just restored
+            conn.execute("""
+                INSERT OR REPLACE INTO cursors SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM versions WHERE id = ?)
+            """, (key, version.id, version.hash, version.id))
+        return version
+
+
+_STORE: Optional[BackupStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_backup_store() -> BackupStore:
+    """Return the process-wide store under ``~/.deepagents/backups``."""
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = BackupStore()
+        return _STORE
@@ -12,8 +12,18 @@ from rich.syntax import Syntax
 from rich.panel import Panel
 from rich.tree import Tree
 
+from .atomic_write import atomic_write_text
+from .backup_store import get_backup_store
+from .content_cache import content_cache
+from .fs_walk import compile_glob, walk
+from .line_index import read_lines, split_lines
+from .search_engine import search_files
+
 console = Console()
 
+# grep_search stops scanning after this many matches and reports "N+"
+GREP_COUNT_LIMIT = 100
+
 class ClaudeCommands:
     """Claude Code-style system commands."""
     
@@ -31,14 +41,11 @@ class ClaudeCommands:
             if not path.exists():
                 return f"❌ File not found: {file_path}"
             
-            content = path.read_text(encoding='utf-8', errors='replace')
-            lines = content.splitlines()
-            
-            # Apply line range if specified
+            # Apply line range if specified; ranged reads only decode the requested lines
             if start_line is not None or end_line is not None:
-                start = (start_line - 1) if start_line else 0
-                end = end_line if end_line else len(lines)
-                lines = lines[start:end]
+                lines, _ = read_lines(path, start_line, end_line)
+            else:
+                lines = split_lines(content_cache.read_text(path, 'utf-8', 'replace'))
                 
             # Format with line numbers like Claude Code
             formatted_lines = []
@@ -73,16 +80,12 @@ class ClaudeCommands:
         try:
             path = Path(file_path)
             
-            # Create backup if file exists
+            # Back up the old content to the shared store
             if create_backup and path.exists():
-                backup_path = path.with_suffix(path.suffix + '.backup')
-                backup_path.write_bytes(path.read_bytes())
-            
-            # Ensure parent directory exists
-            path.parent.mkdir(parents=True, exist_ok=True)
+                get_backup_store().backup(path)
             
-            # Write content
-            path.write_text(content, encoding='utf-8')
+            # Write content (atomically; parent directories are created)
+            atomic_write_text(path, content)
             
             lines_written = len(content.splitlines())
             return f"✅ Wrote {lines_written} lines to {file_path}"
@@ -97,7 +100,7 @@ class ClaudeCommands:
             if not path.exists():
                 return f"❌ File not found: {file_path}"
             
-            content = path.read_text(encoding='utf-8')
+            content = content_cache.read_text(path, 'utf-8')
             
             if old_text not in content:
                 return f"❌ Text not found in {file_path}: '{old_text[:50]}...'"
@@ -105,12 +108,11 @@ class ClaudeCommands:
             # Perform replacement
             new_content = content.replace(old_text, new_text)
             
-            # Create backup
-            backup_path = path.with_suffix(path.suffix + '.backup')
-            backup_path.write_text(content, encoding='utf-8')
+            # Back up the old content to the shared store
+            get_backup_store().backup(path)
             
             # Write new content
-            path.write_text(new_content, encoding='utf-8')
+            atomic_write_text(path, new_content)
             
             return f"✅ Edited {file_path} - replaced text successfully"
             
@@ -182,43 +184,32 @@ class ClaudeCommands:
             if not path.exists():
                 return f"❌ Directory not found: {directory}"
             
-            # Get files to search
-            if file_pattern == "*":
-                files = [f for f in path.rglob("*") if f.is_file()]
-            else:
-                files = list(path.rglob(file_pattern))
+            # Get files to search (ignored directories are pruned, not walked)
+            name_pattern = compile_glob("**/" + file_pattern)
+            files = [Path(entry.path) for rel, entry in walk(path) if name_pattern.fullmatch(rel)]
             
             # Filter text files only
             text_extensions = {'.py', '.js', '.ts', '.html', '.css', '.json', '.md', '.txt', '.yaml', '.yml'}
             files = [f for f in files if f.suffix.lower() in text_extensions or f.suffix == '']
             
-            results = []
             flags = 0 if case_sensitive else re.IGNORECASE
             
-            for file_path in files:
-                try:
-                    content = file_path.read_text(encoding='utf-8', errors='replace')
-                    lines = content.splitlines()
-                    
-                    for i, line in enumerate(lines):
-                        if re.search(pattern, line, flags):
-                            # Add context lines
-                            start = max(0, i - context_lines)
-                            end = min(len(lines), i + context_lines + 1)
-                            
-                            context = []
-                            for j in range(start, end):
-                                marker = "►" if j == i else " "
-                                context.append(f"{j+1:4d}{marker} {lines[j]}")
-                            
-                            results.append({
-                                'file': str(file_path.relative_to(path)),
-                                'line': i + 1,
-                                'context': '\n'.join(context)
-                            })
-                            
-                except Exception:
-                    continue  # Skip files that can't be read
+            # Read and scan files in parallel; unreadable files are skipped
+            # Stop scanning once enough matches are found to show and count
+            found = search_files(files, pattern, flags, context_lines=context_lines, errors='replace',
+                                 max_matches=GREP_COUNT_LIMIT)
+            results = []
+            for hit in found.hits:
+                context = []
+                for j, text in hit.context:
+                    marker = "►" if j == hit.line_no else " "
+                    context.append(f"{j:4d}{marker} {text}")
+                
+                results.append({
+                    'file': str(hit.path.relative_to(path)),
+                    'line': hit.line_no,
+                    'context': '\n'.join(context)
+                })
             
             if not results:
                 return f"❌ No matches found for pattern: {pattern}"
@@ -231,10 +222,11 @@ class ClaudeCommands:
                     border_style="green"
                 ))
             
+            more = "+" if found.truncated else ""
             if len(results) > 10:
-                console.print(f"... and {len(results) - 10} more matches")
+                console.print(f"... and {len(results) - 10}{more} more matches")
             
-            return f"✅ Found {len(results)} matches for '{pattern}'"
+            return f"✅ Found {len(results)}{more} matches for '{pattern}'"
             
         except Exception as e:
             return f"❌ Search error: {str(e)}"
@@ -8,8 +8,22 @@ import subprocess
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Union
 import fnmatch
+import heapq
+from itertools import islice
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .atomic_write import atomic_write_text
+from .backup_store import get_backup_store
+from .content_cache import content_cache
+from .file_kind import file_kind
+from .file_stream import read_window
+from .fs_walk import count_children as fs_count_children, iglob, walk
+from .line_index import read_lines, split_lines
 from .logging import log
+from .search_engine import SearchStream, close_cursor, open_cursor, resume_cursor
+from .matcher import required_literals
+from .search_index import get_index, index_prefix_for
 
 
 def read_file_unrestricted(file_path: str, start_line: int = None, end_line: int = None) -> str:
@@ -30,31 +44,26 @@ def read_file_unrestricted(file_path: str, start_line: int = None, end_line: int
         
         # Check if file is too large (>10MB)
         if path.stat().st_size > 10 * 1024 * 1024:
-            return f"File too large to read: {file_path} ({path.stat().st_size} bytes)"
-        
-        try:
-            content = path.read_text(encoding='utf-8', errors='replace')
-        except UnicodeDecodeError:
-            # Try other encodings if UTF-8 fails
-            for encoding in ['latin-1', 'cp1252', 'ascii']:
-                try:
-                    content = path.read_text(encoding=encoding, errors='replace')
-                    break
-                except UnicodeDecodeError:
-                    continue
-            else:
-                return f"Could not decode file: {file_path}"
-        
-        lines = content.splitlines()
-        
-        # Apply line range if specified
-        if start_line is not None or end_line is not None:
-            start = max(0, (start_line - 1)) if start_line else 0
-            end = min(len(lines), end_line) if end_line else len(lines)
-            lines = lines[start:end]
-            line_offset = start_line or 1
+            return (f"File too large to read: {file_path} ({path.stat().st_size} bytes); "
+                    f"use read_file_stream to page through it")
+        
+        # Encoding (or binary) is sniffed once per file version and cached
+        kind = file_kind(path)
+        if kind.binary:
+            return f"Binary file, not shown: {file_path} ({path.stat().st_size} bytes)"
+        
+        # Ranged reads seek straight to the requested lines via the cached line-offset index
+        if (start_line is not None or end_line is not None) and kind.ascii_compatible:
+            lines, _ = read_lines(path, start_line, end_line, encoding=kind.encoding)
+            line_offset = max(1, start_line or 1)
         else:
+            lines = split_lines(content_cache.read_text(path, kind.encoding, 'replace'))
             line_offset = 1
+            if start_line is not None or end_line is not None:
+                start = max(0, (start_line - 1)) if start_line else 0
+                end = min(len(lines), end_line) if end_line else len(lines)
+                lines = lines[start:end]
+                line_offset = start_line or 1
         
         # Format with line numbers like Claude Code
         if len(lines) > 0:
@@ -72,6 +81,116 @@ def read_file_unrestricted(file_path: str, start_line: int = None, end_line: int
         return f"Error reading {file_path}: {str(e)}"
 
 
+_RANGE_SUFFIX = re.compile(r":(\d*)-(\d*)$|:(\d+)$")
+
+
+def _parse_read_spec(spec: str):
+    """Split "path", "path:10-40", "path:10-" or "path:25" into (path, start, end)."""
+    m = _RANGE_SUFFIX.search(spec)
+    if not m:
+        return spec, None, None
+    path = spec[:m.start()]
+    if m.group(3):
+        line = int(m.group(3))
+        return path, line, line
+    start = int(m.group(1)) if m.group(1) else None
+    end = int(m.group(2)) if m.group(2) else None
+    return path, start, end
+
+
+def read_many(paths: List[str], max_total_chars: int = 100000, max_workers: int = 8) -> str:
+    """
+    Read several files (or line ranges) in one call.
+    Each entry is "path", "path:START-END", "path:START-" or "path:LINE".
+    Files are read concurrently; output keeps the given order and stops
+    adding content once max_total_chars is reached.
+    """
+    log(f"tool:read_many count={len(paths)} max_total_chars={max_total_chars}")
+    
+    if not paths:
+        return "No paths given"
+    
+    specs = [_parse_read_spec(p.strip()) for p in paths if p and p.strip()]
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(specs))),
+                            thread_name_prefix="read_many") as pool:
+        bodies = list(pool.map(lambda spec: read_file_unrestricted(*spec), specs))
+    
+    output = []
+    remaining = max(0, max_total_chars)
+    omitted = []
+    for (path, start, end), body in zip(specs, bodies):
+        label = path if start is None and end is None else f"{path} (lines {start or 1}-{end or 'end'})"
+        if remaining <= 0:
+            omitted.append(label)
+            continue
+        if len(body) > remaining:
+            # cut at a line boundary where possible; later files are omitted
+            cut = body.rfind("\n", 0, remaining)
+            body = body[:cut if cut > 0 else remaining] + f"\n[truncated: output budget of {max_total_chars} chars reached]"
+            remaining = 0
+        else:
+            remaining -= len(body)
+        output.append(f"==> {label} <==\n{body}")
+    
+    if omitted:
+        output.append(f"[{len(omitted)} file(s) omitted, over budget: {', '.join(omitted)}]")
+    return "\n\n".join(output)
+
+
+def read_file_stream(file_path: str, cursor: str = None, max_lines: int = 200,
+                     max_bytes: int = 65536, raw: bool = False) -> str:
+    """
+    Page through a file of any size (e.g. multi-GB logs) with constant memory.
+    Returns up to max_lines lines (or a max_bytes raw chunk when raw=True) and a
+    cursor; pass the cursor back to get the next window. UTF-16/32 files cannot
+    be streamed.
+    """
+    log(f"tool:read_file_stream path='{file_path}' cursor={cursor} max_lines={max_lines} raw={raw}")
+    
+    try:
+        path = Path(file_path).resolve()
+        
+        if not path.exists():
+            return f"File not found: {file_path}"
+        
+        if path.is_dir():
+            return f"Path is a directory, not a file: {file_path}"
+        
+        try:
+            kind = file_kind(path)
+            if kind.binary and not raw:
+                return f"Binary file: {file_path} ({path.stat().st_size} bytes); use raw=True to page through it"
+            if not kind.binary and not kind.ascii_compatible:
+                # windows are cut at newline bytes, which UTF-16/32 text does not have
+                return (f"Cannot stream {kind.encoding.upper()} file: {file_path} ({path.stat().st_size} bytes); "
+                        f"use read_file_unrestricted for files up to 10 MB")
+            window = read_window(path, cursor, max_lines=max_lines, max_bytes=max_bytes,
+                                 encoding=kind.encoding or "utf-8", raw=raw)
+        except ValueError as e:
+            return f"Invalid cursor for {file_path}: {e}"
+        
+        if raw:
+            output = [window.text]
+        else:
+            output = []
+            for i, (line_num, line) in enumerate(window.lines):
+                marker = "↪" if i == 0 and window.starts_mid_line else "→"
+                output.append(f"{line_num:5d}{marker}{line}")
+        
+        footer = f"[bytes {window.offset}-{window.next_offset} of {window.size}]"
+        if window.cursor:
+            footer += f" more available with cursor='{window.cursor}'"
+        else:
+            footer += " end of file"
+        output.append(footer)
+        return "\n".join(output)
+        
+    except PermissionError:
+        return f"Permission denied: {file_path}"
+    except Exception as e:
+        return f"Error reading {file_path}: {str(e)}"
+
+
 def write_file_unrestricted(file_path: str, content: str, create_backup: bool = True) -> str:
     """
     Write file with full file system access - Claude Code equivalent.
@@ -81,16 +200,12 @@ def write_file_unrestricted(file_path: str, content: str, create_backup: bool =
     try:
         path = Path(file_path).resolve()
         
-        # Create backup if file exists and requested
+        # Back up the old content to the shared store (undo_file_write restores it)
         if create_backup and path.exists():
-            backup_path = path.with_suffix(path.suffix + '.backup')
-            backup_path.write_bytes(path.read_bytes())
-        
-        # Ensure parent directory exists
-        path.parent.mkdir(parents=True, exist_ok=True)
+            get_backup_store().backup(path)
         
-        # Write content
-        path.write_text(content, encoding='utf-8')
+        # Write content (atomically; parent directories are created)
+        atomic_write_text(path, content)
         
         lines_count = len(content.splitlines())
         return f"Successfully wrote {lines_count} lines to {file_path}"
@@ -101,10 +216,67 @@ def write_file_unrestricted(file_path: str, content: str, create_backup: bool =
         return f"Error writing {file_path}: {str(e)}"
 
 
+def list_file_backups(file_path: str) -> str:
+    """
+    List the saved versions of a file, newest first, with the undo steps and id of each.
+    """
+    log(f"tool:list_file_backups path='{file_path}'")
+    
+    try:
+        versions = get_backup_store().undo_steps(Path(file_path).resolve())
+        if not versions:
+            return f"No backups for {file_path}"
+        
+        result = [f"Backups of {file_path} (steps back, id, newest first):", ""]
+        for step, version in versions:
+            when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(version.created))
+            note = "  (saved before undo)" if version.undo else ""
+            result.append(f"  {step if step is not None else '-':>3}  #{version.id:<5} {when}  "
+                          f"{version.size} bytes  {version.hash[:12]}{note}")
+        return "\n".join(result)
+        
+    except Exception as e:
+        return f"Error listing backups for {file_path}: {str(e)}"
+
+
+def undo_file_write(file_path: str, steps: int = 1, version_id: Optional[int] = None) -> str:
+    """
+    Restore a file to its content from `steps` writes ago (1 = before the last write).
+    Repeated undos keep stepping back; the content replaced by the first one is saved
+    and can be brought back with its `version_id` from list_file_backups.
+    """
+    log(f"tool:undo_file_write path='{file_path}' steps={steps} version_id={version_id}")
+    
+    try:
+        version = get_backup_store().restore(Path(file_path).resolve(), steps, version_id)
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(version.created))
+        return f"Restored {file_path} to the version saved at {when} ({version.size} bytes)"
+        
+    except LookupError as e:
+        return str(e)
+    except PermissionError:
+        return f"Permission denied writing to: {file_path}"
+    except Exception as e:
+        return f"Error restoring {file_path}: {str(e)}"
+
+
+# subdirectory item counts stop here and are shown as "N+"
+_CHILD_COUNT_LIMIT = 10000
+
+
+def _is_dir(entry: os.DirEntry) -> bool:
+    try:
+        return entry.is_dir()
+    except OSError:
+        return False
+
+
 def list_directory_unrestricted(directory: str = ".", pattern: str = "*", 
-                               show_hidden: bool = False, max_items: int = 100) -> str:
+                               show_hidden: bool = False, max_items: int = 100,
+                               count_children: bool = True) -> str:
     """
     List directory with full file system access - Claude Code equivalent.
+    Set count_children=False to skip per-subdirectory item counts on huge trees.
     """
     log(f"tool:list_directory_unrestricted dir='{directory}' pattern='{pattern}' hidden={show_hidden}")
     
@@ -117,29 +289,22 @@ def list_directory_unrestricted(directory: str = ".", pattern: str = "*",
         if not path.is_dir():
             return f"Not a directory: {directory}"
         
-        # Get all items
+        # One scandir pass; DirEntry caches the entry type, so filtering and
+        # sorting need no per-item stat calls
         try:
-            items = list(path.iterdir())
+            with os.scandir(path) as it:
+                items = [
+                    entry for entry in it
+                    if (show_hidden or not entry.name.startswith('.'))
+                    and (pattern == "*" or fnmatch.fnmatch(entry.name, pattern))
+                ]
         except PermissionError:
             return f"Permission denied accessing: {directory}"
         
-        # Filter by pattern
-        if pattern != "*":
-            items = [item for item in items if fnmatch.fnmatch(item.name, pattern)]
-        
-        # Filter hidden files
-        if not show_hidden:
-            items = [item for item in items if not item.name.startswith('.')]
-        
-        # Sort: directories first, then files alphabetically
-        items.sort(key=lambda x: (not x.is_dir(), x.name.lower()))
-        
-        # Limit results
-        if len(items) > max_items:
-            items = items[:max_items]
-            truncated = True
-        else:
-            truncated = False
+        # Sort: directories first, then files alphabetically; only the shown items are fully sorted
+        total = len(items)
+        items = heapq.nsmallest(max_items, items, key=lambda e: (not _is_dir(e), e.name.lower()))
+        truncated = total > len(items)
         
         # Format output like Claude Code
         result = []
@@ -148,15 +313,19 @@ def list_directory_unrestricted(directory: str = ".", pattern: str = "*",
         
         for item in items:
             try:
-                if item.is_dir():
-                    # Count items in subdirectory
+                if _is_dir(item):
+                    if not count_children:
+                        result.append(f"📁 {item.name}/")
+                        continue
+                    # Count items in subdirectory (capped, so huge children stay cheap)
                     try:
-                        subitem_count = len([x for x in item.iterdir() if not x.name.startswith('.') or show_hidden])
-                        result.append(f"📁 {item.name}/ ({subitem_count} items)")
+                        subitem_count, capped = fs_count_children(item.path, show_hidden, _CHILD_COUNT_LIMIT)
+                        more = "+" if capped else ""
+                        result.append(f"📁 {item.name}/ ({subitem_count}{more} items)")
                     except (PermissionError, OSError):
                         result.append(f"📁 {item.name}/ (access denied)")
                 else:
-                    # Show file size
+                    # Show file size (the only stat for a listed file)
                     try:
                         size = item.stat().st_size
                         if size < 1024:
@@ -174,7 +343,7 @@ def list_directory_unrestricted(directory: str = ".", pattern: str = "*",
                 result.append(f"❓ {item.name} (unknown)")
         
         if truncated:
-            result.append(f"\n... and {len(list(path.iterdir())) - max_items} more items")
+            result.append(f"\n... and {total - len(items)} more items")
         
         return "\n".join(result)
         
@@ -184,13 +353,21 @@ def list_directory_unrestricted(directory: str = ".", pattern: str = "*",
 
 def search_files_unrestricted(pattern: str, directory: str = ".", file_pattern: str = "*",
                              context_lines: int = 2, case_sensitive: bool = False,
-                             max_matches: int = 50) -> str:
+                             max_matches: int = 50, cursor: str = None) -> str:
     """
     Search files with full file system access - Claude Code equivalent.
+    Results are paged: when more matches exist, pass the returned cursor to get the next page.
     """
-    log(f"tool:search_files_unrestricted pattern='{pattern}' dir='{directory}' file_pattern='{file_pattern}'")
+    log(f"tool:search_files_unrestricted pattern='{pattern}' dir='{directory}' file_pattern='{file_pattern}' cursor={cursor}")
     
     try:
+        if cursor:
+            parked = resume_cursor(cursor)
+            if parked is None:
+                return f"Cursor {cursor} expired; run the search again"
+            stream, state = parked
+            return _format_search_page(stream, cursor, state["base"], max_matches)
+        
         path = Path(directory).resolve()
         
         if not path.exists():
@@ -206,82 +383,65 @@ def search_files_unrestricted(pattern: str, directory: str = ".", file_pattern:
         except re.error as e:
             return f"Invalid regex pattern: {e}"
         
-        results = []
-        files_searched = 0
-        
-        # Search recursively
-        for file_path in path.rglob("*"):
-            if len(results) >= max_matches:
-                break
-                
-            try:
-                if not file_path.is_file():
-                    continue
-                
-                # Check file pattern
-                if not fnmatch.fnmatch(file_path.name, file_pattern):
-                    continue
-                
-                # Skip binary files and very large files
-                if file_path.stat().st_size > 5 * 1024 * 1024:  # Skip files > 5MB
-                    continue
-                
-                # Try to read as text
+        # Search recursively; inside FS_ROOT the trigram index narrows candidates
+        prefix = index_prefix_for(path)
+        if prefix is not None:
+            candidates = get_index().candidates(required_literals(pattern, flags), prefix)
+        else:
+            candidates = (Path(entry.path) for _, entry in walk(path))
+
+        def files_to_search():
+            for file_path in candidates:
                 try:
-                    content = file_path.read_text(encoding='utf-8', errors='ignore')
-                except (UnicodeDecodeError, PermissionError):
-                    continue
-                
-                files_searched += 1
-                lines = content.splitlines()
-                
-                # Search for pattern in each line
-                for line_num, line in enumerate(lines):
-                    if regex.search(line):
-                        # Get context lines
-                        start_line = max(0, line_num - context_lines)
-                        end_line = min(len(lines), line_num + context_lines + 1)
-                        
-                        context = []
-                        for i in range(start_line, end_line):
-                            marker = "►" if i == line_num else " "
-                            context.append(f"{i+1:4d}{marker} {lines[i]}")
-                        
-                        results.append({
-                            'file': str(file_path.relative_to(path)),
-                            'line': line_num + 1,
-                            'match': line.strip(),
-                            'context': "\n".join(context)
-                        })
-                        
-                        if len(results) >= max_matches:
-                            break
-                            
-            except Exception:
-                continue  # Skip problematic files
-        
-        if not results:
-            return f"No matches found for pattern '{pattern}' in {files_searched} files searched"
-        
-        # Format results like Claude Code
-        output = []
-        output.append(f"Found {len(results)} matches for '{pattern}' in {files_searched} files:")
-        output.append("")
-        
-        for result in results:
-            output.append(f"📄 {result['file']}:{result['line']}")
-            output.append(result['context'])
-            output.append("")
-        
-        if len(results) >= max_matches:
-            output.append(f"(Showing first {max_matches} matches)")
-        
-        return "\n".join(output)
+                    if file_path.is_file() and fnmatch.fnmatch(file_path.name, file_pattern):
+                        yield file_path
+                except OSError:
+                    continue  # Skip problematic files
+
+        # Scan in parallel; large files are scanned through mmap instead of skipped.
+        # Hits are pulled one page at a time, so the scan stops as soon as the page is full.
+        stream = SearchStream(files_to_search(), pattern, flags, context_lines=context_lines)
+        return _format_search_page(stream, None, path, max_matches)
         
     except Exception as e:
         return f"Error searching: {str(e)}"
 
 
+def _format_search_page(stream: SearchStream, token: str, base: Path, max_matches: int) -> str:
+    """Format the next page of hits from a search stream; park it under a cursor if more remain."""
+    hits = stream.take(max(1, max_matches))
+    files_searched = stream.files_searched
+    more = stream.more()
+    if more:
+        # pause read-ahead until the next page is asked for
+        stream.park()
+        token = token or open_cursor(stream, base=base)
+    else:
+        stream.close()
+        if token:
+            close_cursor(token)
+    
+    if not hits:
+        return f"No matches found for pattern '{stream.pattern}' in {files_searched} files searched"
+    
+    # Format results like Claude Code
+    output = []
+    output.append(f"Found {len(hits)} matches for '{stream.pattern}' in {files_searched} files:")
+    output.append("")
+    
+    for hit in hits:
+        output.append(f"📄 {hit.path.relative_to(base)}:{hit.line_no}")
+        for i, text in hit.context:
+            marker = "►" if i == hit.line_no else " "
+            output.append(f"{i:4d}{marker} {text}")
+        output.append("")
+    
+    if more:
+        output.append(f"(Showing {len(hits)} matches; more available with cursor='{token}')")
+    
+    return "\n".join(output)
+
+
 def run_command_unrestricted(command: str, working_dir: str = None, timeout: int = 30) -> str:
     """
     Execute shell command with full system access - Claude Code equivalent.
@@ -347,11 +507,11 @@ def run_command_unrestricted(command: str, working_dir: str = None, timeout: int
         return f"Error executing command: {str(e)}"
 
 
-def glob_files_unrestricted(pattern: str, directory: str = ".") -> str:
+def glob_files_unrestricted(pattern: str, directory: str = ".", max_results: int = 1000) -> str:
     """
     Glob pattern matching with full file system access - Claude Code equivalent.
     """
-    log(f"tool:glob_files_unrestricted pattern='{pattern}' dir='{directory}'")
+    log(f"tool:glob_files_unrestricted pattern='{pattern}' dir='{directory}' max_results={max_results}")
     
     try:
         path = Path(directory).resolve()
@@ -362,8 +522,11 @@ def glob_files_unrestricted(pattern: str, directory: str = ".") -> str:
         if not path.is_dir():
             return f"Not a directory: {directory}"
         
-        # Perform glob search
-        matches = list(path.glob(pattern))
+        # Match while walking: ignored subtrees and directories that cannot
+        # match are never listed, and the walk stops at max_results
+        found = iglob(path, pattern)
+        matches = [Path(entry.path) for _, entry in islice(found, max_results)]
+        truncated = next(found, None) is not None
         
         if not matches:
             return f"No files match pattern '{pattern}' in {directory}"
@@ -373,7 +536,10 @@ def glob_files_unrestricted(pattern: str, directory: str = ".") -> str:
         
         # Format output
         result = []
-        result.append(f"Found {len(matches)} files matching '{pattern}':")
+        if truncated:
+            result.append(f"Found more than {max_results} files matching '{pattern}' (showing first {max_results}):")
+        else:
+            result.append(f"Found {len(matches)} files matching '{pattern}':")
         result.append("")
         
         for match in matches:
@@ -403,7 +569,11 @@ def get_claude_file_tools() -> List:
     """Return all Claude Code-equivalent file tools."""
     return [
         read_file_unrestricted,
+        read_many,
+        read_file_stream,
         write_file_unrestricted, 
+        list_file_backups,
+        undo_file_write,
         list_directory_unrestricted,
         search_files_unrestricted,
         run_command_unrestricted,
@@ -5,13 +5,31 @@ from typing import List, Dict, Any, Optional
 import subprocess
 import json
 import os
+import re
 from pathlib import Path
 from .tools import log
 from . import config
+from .atomic_write import WriteBatch, atomic_write_text
+from .backup_store import get_backup_store
+from .content_cache import content_cache
+from .fs_walk import IgnoreRules, compile_glob, scan_dir
+from .line_index import read_lines, split_lines
+from .query_cache import query_cache
+from .ranking import get_token_index, tokenize
+from .search_engine import search_files
+from .search_index import get_index
 
-def read_file_with_context(path: str, show_line_numbers: bool = True, context_lines: int = 0) -> str:
-    """Read a file with optional line numbers and context - Claude Code style."""
-    log(f"tool:read_file_with_context path='{path}' show_numbers={show_line_numbers}")
+# intelligent_search shows this many matches and stops scanning once it has them
+SEARCH_PAGE_MATCHES = 10
+
+def read_file_with_context(path: str, show_line_numbers: bool = True, context_lines: int = 0,
+                           start_line: int = None, end_line: int = None) -> str:
+    """Read a file with optional line numbers and context - Claude Code style.
+    
+    start_line/end_line (1-based, inclusive) read just that window, widened by
+    context_lines on each side, without decoding the rest of the file.
+    """
+    log(f"tool:read_file_with_context path='{path}' show_numbers={show_line_numbers} start={start_line} end={end_line}")
     
     try:
         full_path = config.FS_ROOT / path if not Path(path).is_absolute() else Path(path)
@@ -19,17 +37,24 @@ def read_file_with_context(path: str, show_line_numbers: bool = True, context_li
         if not full_path.exists():
             return f"❌ File not found: {path}"
         
-        content = full_path.read_text(encoding='utf-8', errors='replace')
-        lines = content.splitlines()
-        
-        if show_line_numbers:
-            # Format like Claude Code with line numbers
-            formatted_lines = []
-            for i, line in enumerate(lines, 1):
-                formatted_lines.append(f"{i:5}→{line}")
-            return "\n".join(formatted_lines)
+        if start_line is not None or end_line is not None:
+            first = max(1, (start_line or 1) - context_lines)
+            last = end_line + context_lines if end_line else None
+            lines, _ = read_lines(full_path, first, last)
+            if not show_line_numbers:
+                return "\n".join(lines)
         else:
-            return content
+            first = 1
+            content = content_cache.read_text(full_path, 'utf-8', 'replace')
+            if not show_line_numbers:
+                return content
+            lines = split_lines(content)
+        
+        # Format like Claude Code with line numbers
+        formatted_lines = []
+        for i, line in enumerate(lines, first):
+            formatted_lines.append(f"{i:5}→{line}")
+        return "\n".join(formatted_lines)
             
     except Exception as e:
         return f"❌ Error reading {path}: {str(e)}"
@@ -41,62 +66,116 @@ def write_file_with_backup(path: str, content: str, create_backup: bool = True)
     try:
         full_path = config.FS_ROOT / path if not Path(path).is_absolute() else Path(path)
         
-        # Create backup if file exists
+        # Back up the old content to the shared store
         if create_backup and full_path.exists():
-            backup_path = full_path.with_suffix(full_path.suffix + '.backup')
-            backup_path.write_bytes(full_path.read_bytes())
+            get_backup_store().backup(full_path)
         
-        # Ensure parent directory exists
-        full_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Write the file
-        full_path.write_text(content, encoding='utf-8')
+        # Write the file (atomically; parent directories are created)
+        atomic_write_text(full_path, content)
         
         return f"✅ Successfully wrote {len(content)} characters to {path}"
         
     except Exception as e:
         return f"❌ Error writing {path}: {str(e)}"
 
-def intelligent_search(query: str, file_patterns: str = "**/*", context: int = 2) -> str:
-    """Advanced search with context lines like Claude Code."""
-    log(f"tool:intelligent_search query='{query}' patterns='{file_patterns}'")
+def intelligent_search(query: str, file_patterns: str = "**/*", context: int = 2,
+                       ranked: bool = False, top_k: int = 10) -> str:
+    """Advanced search with context lines like Claude Code.
+    
+    With ranked=True, files are ranked by BM25 relevance to the query's words
+    (boosted for file name and definition matches) and the best lines of the
+    top_k files are shown, instead of the first hits in path order.
+    """
+    log(f"tool:intelligent_search query='{query}' patterns='{file_patterns}' ranked={ranked}")
     
     try:
+        if ranked:
+            return _ranked_search(query, file_patterns, context, top_k)
+        
         root = config.FS_ROOT
-        results = []
         
-        # Search through files
-        for file_path in root.glob(file_patterns):
-            if file_path.is_file() and not any(exclude in str(file_path) for exclude in ['.git', 'node_modules', '__pycache__']):
-                try:
-                    content = file_path.read_text(encoding='utf-8', errors='ignore')
-                    lines = content.splitlines()
-                    
-                    for line_num, line in enumerate(lines, 1):
-                        if query.lower() in line.lower():
-                            # Get context lines
-                            start = max(0, line_num - context - 1)
-                            end = min(len(lines), line_num + context)
-                            
-                            context_lines = []
-                            for i in range(start, end):
-                                prefix = "→" if i == line_num - 1 else " "
-                                context_lines.append(f"{i+1:5}{prefix}{lines[i]}")
-                            
-                            rel_path = file_path.relative_to(root)
-                            results.append(f"📍 {rel_path}:{line_num}\n" + "\n".join(context_lines))
-                            
-                except Exception:
-                    continue
+        # Repeat queries are served from the session cache while the index is unchanged
+        index = get_index(root)
+        index.refresh()
+        version = index.version
+        key = ("intelligent_search", query, file_patterns, context, str(root))
+        cached = query_cache.get(key, version)
+        if cached is not None:
+            return cached
+        
+        def files():
+            # the trigram index narrows the search to files that contain the query text
+            for path in index.candidates([query], refresh=False):
+                if pattern.fullmatch(path.relative_to(root).as_posix()):
+                    yield path
+        
+        # Search through files in parallel, stopping once there is a page of matches
+        pattern = compile_glob(file_patterns)
+        found = search_files(files(), re.escape(query), re.IGNORECASE, context_lines=context,
+                             max_matches=SEARCH_PAGE_MATCHES)
+        results = []
+        for hit in found.hits:
+            context_lines = []
+            for i, text in hit.context:
+                prefix = "→" if i == hit.line_no else " "
+                context_lines.append(f"{i:5}{prefix}{text}")
+            
+            rel_path = hit.path.relative_to(root)
+            results.append(f"📍 {rel_path}:{hit.line_no}\n" + "\n".join(context_lines))
         
         if results:
-            return f"🔍 Found {len(results)} matches for '{query}':\n\n" + "\n\n".join(results[:10])
+            more = "+" if found.truncated else ""
+            output = f"🔍 Found {len(results)}{more} matches for '{query}':\n\n" + "\n\n".join(results)
         else:
-            return f"🔍 No matches found for '{query}'"
+            output = f"🔍 No matches found for '{query}'"
+        query_cache.put(key, output, version=version)
+        return output
             
     except Exception as e:
         return f"❌ Search error: {str(e)}"
 
+def _ranked_search(query: str, file_patterns: str, context: int, top_k: int) -> str:
+    """BM25-ranked variant of intelligent_search over the token index."""
+    root = config.FS_ROOT
+    index = get_index(root)
+    index.refresh()
+    version = index.version
+    key = ("intelligent_search:ranked", query, file_patterns, context, top_k, str(root))
+    cached = query_cache.get(key, version)
+    if cached is not None:
+        return cached
+    
+    pattern = compile_glob(file_patterns)
+    ranked_files = get_token_index(root).rank(query, top_k, accept=pattern.fullmatch, refresh=False)
+    terms = sorted(set(tokenize(query)), key=len, reverse=True)
+    if not ranked_files or not terms:
+        return f"🔍 No matches found for '{query}'"
+    
+    # Only the top files are scanned; per file, show the lines with the most distinct query terms
+    scores = {f.path: f.score for f in ranked_files}
+    found = search_files([f.path for f in ranked_files], "|".join(map(re.escape, terms)), re.IGNORECASE,
+                         context_lines=context)
+    by_file: Dict[Path, list] = {}
+    for hit in found.hits:
+        by_file.setdefault(hit.path, []).append(hit)
+    best = []
+    for f in ranked_files:
+        hits = by_file.get(f.path, [])
+        top = sorted(hits, key=lambda h: -sum(t in h.line.lower() for t in terms))[:3]
+        best.extend(sorted(top, key=lambda h: h.line_no))
+    results = []
+    for hit in best:
+        context_lines = []
+        for i, text in hit.context:
+            prefix = "→" if i == hit.line_no else " "
+            context_lines.append(f"{i:5}{prefix}{text}")
+        rel_path = hit.path.relative_to(root)
+        results.append(f"📍 {rel_path}:{hit.line_no} (score {scores[hit.path]:.2f})\n" + "\n".join(context_lines))
+    
+    output = f"🔍 Top {len(ranked_files)} files for '{query}' by relevance:\n\n" + "\n\n".join(results)
+    query_cache.put(key, output, version=version)
+    return output
+
 def project_structure(path: str = ".", max_depth: int = 3, show_hidden: bool = False) -> str:
     """Generate an intelligent project overview like Claude Code."""
     log(f"tool:project_structure path='{path}' depth={max_depth}")
@@ -108,27 +187,26 @@ def project_structure(path: str = ".", max_depth: int = 3, show_hidden: bool = F
             return f"❌ Path not found: {path}"
         
         structure = []
-        ignored_dirs = {'.git', 'node_modules', '__pycache__', '.venv', 'venv', 'dist', 'build'}
+        rules = IgnoreRules(base_path)
         
-        def add_path(current_path: Path, depth: int, prefix: str = ""):
+        def add_path(current_path: str, rel_dir: str, depth: int, prefix: str = ""):
             if depth > max_depth:
                 return
-                
-            items = sorted(current_path.iterdir())
-            dirs = [p for p in items if p.is_dir() and (show_hidden or not p.name.startswith('.'))]
-            files = [p for p in items if p.is_file() and (show_hidden or not p.name.startswith('.'))]
+            
+            # Cached listing (re-read only if the directory changed); ignored directories are pruned
+            items = scan_dir(current_path, rules, rel_dir, show_hidden, cached=True)
+            dirs = [p for p in items if p.is_dir()]
+            files = [p for p in items if p.is_file()]
             
             # Add directories first
             for i, dir_path in enumerate(dirs):
-                if dir_path.name in ignored_dirs:
-                    continue
-                    
                 is_last_dir = i == len(dirs) - 1 and not files
                 connector = "└── " if is_last_dir else "├── "
                 structure.append(f"{prefix}{connector}{dir_path.name}/")
                 
                 next_prefix = prefix + ("    " if is_last_dir else "│   ")
-                add_path(dir_path, depth + 1, next_prefix)
+                rel = f"{rel_dir}/{dir_path.name}" if rel_dir else dir_path.name
+                add_path(dir_path.path, rel, depth + 1, next_prefix)
             
             # Add files
             for i, file_path in enumerate(files):
@@ -142,7 +220,7 @@ def project_structure(path: str = ".", max_depth: int = 3, show_hidden: bool = F
                 structure.append(f"{prefix}{connector}{file_path.name}{size_str}")
         
         structure.append(f"📁 {base_path.name}/")
-        add_path(base_path, 0)
+        add_path(str(base_path), "", 0)
         
         return "\n".join(structure)
         
@@ -214,56 +292,48 @@ def smart_git_status() -> str:
         return f"❌ Git status error: {str(e)}"
 
 def multi_file_edit(edits: List[Dict[str, Any]]) -> str:
-    """Perform multiple file edits atomically like Claude Code."""
+    """Perform multiple file edits atomically like Claude Code.
+    
+    The edits are committed as one journaled transaction: either every file
+    gets its new content or, if any write fails, the journal rolls all of
+    them back.
+    """
     log(f"tool:multi_file_edit count={len(edits)}")
     
     try:
         results = []
-        backups = []
-        
-        # Create backups first
-        for edit in edits:
-            file_path = Path(edit['file'])
-            if file_path.exists():
-                backup_path = file_path.with_suffix(file_path.suffix + '.tmp_backup')
-                backup_path.write_bytes(file_path.read_bytes())
-                backups.append((file_path, backup_path))
+        batch = WriteBatch(journal=True)
+        pending: Dict[Path, str] = {}
         
-        # Apply edits
+        # Compute every new file content in memory first
         for edit in edits:
             file_path = config.FS_ROOT / edit['file']
             
             if 'content' in edit:
                 # Full file replacement
-                file_path.parent.mkdir(parents=True, exist_ok=True)
-                file_path.write_text(edit['content'], encoding='utf-8')
+                pending[file_path] = edit['content']
                 results.append(f"✅ Updated {edit['file']}")
                 
             elif 'find' in edit and 'replace' in edit:
-                # Find and replace
-                if file_path.exists():
-                    content = file_path.read_text(encoding='utf-8')
-                    new_content = content.replace(edit['find'], edit['replace'])
-                    file_path.write_text(new_content, encoding='utf-8')
+                # Find and replace (on top of earlier edits to the same file)
+                if file_path in pending or file_path.exists():
+                    content = pending.get(file_path)
+                    if content is None:
+                        content = content_cache.read_text(file_path, 'utf-8')
+                    pending[file_path] = content.replace(edit['find'], edit['replace'])
                     results.append(f"✅ Replaced text in {edit['file']}")
                 else:
                     results.append(f"❌ File not found: {edit['file']}")
         
-        # Clean up backups on success
-        for original, backup in backups:
-            if backup.exists():
-                backup.unlink()
+        # Journaled group commit: all files change or none do
+        for file_path, content in pending.items():
+            batch.add_text(file_path, content)
+        batch.commit()
         
         return "🔄 Multi-file edit completed:\n" + "\n".join(results)
         
     except Exception as e:
-        # Restore backups on failure
-        for original, backup in backups:
-            if backup.exists():
-                original.write_bytes(backup.read_bytes())
-                backup.unlink()
-        
-        return f"❌ Multi-file edit failed: {str(e)}\n(Files restored from backup)"
+        return f"❌ Multi-file edit failed: {str(e)}\n(No files were changed)"
 
 def claude_code_tools() -> List:
     """Return the enhanced Claude Code-style tools."""
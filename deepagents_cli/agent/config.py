@@ -4,6 +4,7 @@ Shared runtime configuration for DeepAgents CLI tools.
 - FS_ROOT: sandbox root for host filesystem operations (defaults to current working directory)
 - ALLOW_FS_READ: allow reading files under FS_ROOT
 - ALLOW_FS_WRITE: allow writing/modifying files under FS_ROOT (default False)
+- FSYNC_WRITES: fsync files written by the tools before they replace the original (default True)
 
 These can be adjusted by the CLI at startup based on flags/env.
 """
@@ -17,6 +18,10 @@ FS_ROOT: Path = Path(os.getcwd()).resolve()
 ALLOW_FS_READ: bool = True
 ALLOW_FS_WRITE: bool = False
 ALLOW_AUTO_APPLY: bool = False
+FSYNC_WRITES: bool = True
+
+# per-root agent state (index, journals, proposals) lives in <root>/.deepagents
+STATE_DIRNAME = ".deepagents"
 
 
 def set_fs_root(path: str | os.PathLike[str]) -> None:
@@ -24,6 +29,23 @@ def set_fs_root(path: str | os.PathLike[str]) -> None:
     FS_ROOT = Path(path).resolve()
 
 
+def make_state_dir(directory: str | os.PathLike[str]) -> Path:
+    """Create ``directory`` (a ``.deepagents`` state dir or a directory inside one).
+
+    The state dir gets a ``.gitignore`` that keeps agent state out of the
+    user's git status.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for path in (directory, *directory.parents):
+        if path.name == STATE_DIRNAME:
+            gitignore = path / ".gitignore"
+            if not gitignore.exists():
+                gitignore.write_text("*\n")
+            break
+    return directory
+
+
 def set_allow_fs_read(value: bool) -> None:
     global ALLOW_FS_READ
     ALLOW_FS_READ = bool(value)
@@ -41,3 +63,9 @@ def set_allow_auto_apply(value: bool) -> None:
     """
     global ALLOW_AUTO_APPLY
     ALLOW_AUTO_APPLY = bool(value)
+
+
+def set_fsync_writes(value: bool) -> None:
+    """Fsync written files and their directories; off is faster but a power loss may drop recent writes."""
+    global FSYNC_WRITES
+    FSYNC_WRITES = bool(value)
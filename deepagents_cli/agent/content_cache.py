@@ -0,0 +1,168 @@
+"""
+Process-wide file content cache shared by the read and search tools.
+
+Entries hold a file's raw bytes plus the text decoded from them for each
+``(encoding, errors)`` pair a caller asked for. Every lookup does one
+``os.stat`` and serves the cached copy only if size, mtime and inode are
+unchanged, so edits made outside the agent are always picked up. Memory is
+bounded by total bytes with LRU eviction, and files larger than
+``max_entry_bytes`` are read straight through without being cached.
+
+Bulk readers such as the search tools pass ``populate=False``: they still
+benefit from hot entries but do not flush the agent's working set.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from .file_kind import file_kind
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+_StatKey = Tuple[int, int, int]  # (size, mtime_ns, inode)
+
+
+@dataclass
+class _Entry:
+    stat_key: _StatKey
+    data: bytes
+    texts: Dict[Tuple[str, str], str] = field(default_factory=dict)
+
+    @property
+    def cost(self) -> int:
+        return len(self.data) + sum(len(t) for t in self.texts.values())
+
+
+def _stat_key(st: os.stat_result) -> _StatKey:
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+
+def _decode(data: bytes, encoding: str, errors: str) -> str:
+    # same newline handling as open(..., "r") / Path.read_text
+    text = data.decode(encoding, errors)
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+class ContentCache:
+    """Byte-bounded LRU of file contents validated by stat on every lookup."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, max_entry_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes if max_entry_bytes is not None else max_bytes // 8
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: str, stat_key: _StatKey) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.stat_key == stat_key:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry.cost
+
+    def _store(self, key: str, entry: _Entry) -> None:
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._size += entry.cost
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            old_key, _ = next(iter(self._entries.items()))
+            self._remove(old_key)
+            self.evictions += 1
+
+    def _get(self, path: str | os.PathLike[str], populate: bool) -> Tuple[str, _Entry, os.stat_result]:
+        key = os.path.abspath(path)
+        st = os.stat(key)  # before reading, so a concurrent edit is seen next time
+        return key, self._load(key, st, populate), st
+
+    def _load(self, key: str, st: os.stat_result, populate: bool) -> _Entry:
+        entry = self._lookup(key, _stat_key(st))
+        if entry is None:
+            with open(key, "rb") as f:
+                entry = _Entry(_stat_key(st), f.read())
+            if populate and len(entry.data) <= self.max_entry_bytes:
+                self._store(key, entry)
+        return entry
+
+    def read_bytes(self, path: str | os.PathLike[str], populate: bool = True) -> bytes:
+        """Return the file's bytes, from cache when it has not changed on disk."""
+        return self._get(path, populate)[1].data
+
+    def read_text(self, path: str | os.PathLike[str], encoding: str = "utf-8", errors: str = "strict",
+                  populate: bool = True) -> str:
+        """Like ``Path.read_text``: decoded with universal newlines, cached per encoding."""
+        key, entry, _ = self._get(path, populate)
+        return self._text(key, entry, encoding, errors)
+
+    def read_decoded(self, path: str | os.PathLike[str], errors: str = "replace",
+                     populate: bool = True) -> Optional[str]:
+        """Return the text decoded with the sniffed encoding, or None for a binary file.
+
+        The kind is looked up (or sniffed from the head) before the file is
+        read, so a binary is never read whole.
+        """
+        key = os.path.abspath(path)
+        st = os.stat(key)
+        kind = file_kind(key, st=st)
+        if kind.binary:
+            return None
+        return self._text(key, self._load(key, st, populate), kind.encoding, errors)
+
+    def _text(self, key: str, entry: _Entry, encoding: str, errors: str) -> str:
+        text = entry.texts.get((encoding, errors))
+        if text is None:
+            text = _decode(entry.data, encoding, errors)
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    entry.texts[(encoding, errors)] = text
+                    self._size += len(text)
+                    self._evict()
+        return text
+
+    def invalidate(self, path: str | os.PathLike[str]) -> None:
+        """Drop a cached file, e.g. right after writing it."""
+        with self._lock:
+            self._remove(os.path.abspath(path))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss/eviction counters plus current entry count and size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
+
+
+content_cache = ContentCache()
+
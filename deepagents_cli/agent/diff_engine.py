@@ -0,0 +1,286 @@
+"""
+Line diff engine for proposal previews and patches.
+
+Lines are interned to integers first, so every comparison is an int
+compare. The common prefix and suffix are trimmed, then the rest is split
+recursively. Large regions are first cut at every line that is unique on
+both sides and in the same order (patience diff, one O(n log n) pass);
+smaller regions use the histogram strategy (as in git and JGit), anchoring
+on the common run whose lines occur least often in the old side. Both give
+readable diffs and run in near-linear time on typical edits.
+
+A time budget bounds the work. A region still unsplit when the budget runs
+out is reported as one replace block, so the opcodes are always correct and
+the resulting patch always applies; only the diff is less minimal.
+``unified_diff`` also caps the preview length and ends it with a summary
+line instead of rendering megabytes of diff.
+"""
+from __future__ import annotations
+
+import time
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# (tag, i1, i2, j1, j2) exactly like difflib.SequenceMatcher.get_opcodes()
+Opcode = Tuple[str, int, int, int, int]
+
+# old-side lines occurring more often than this never anchor a split
+MAX_CHAIN = 64
+# regions with more old-side lines than this are split with patience anchors first
+PATIENCE_MIN_LINES = 512
+DEFAULT_BUDGET_SECONDS = 1.0
+MAX_PREVIEW_LINES = 4000
+
+
+def _intern(a: Sequence[str], b: Sequence[str]) -> Tuple[List[int], List[int]]:
+    ids: Dict[str, int] = {}
+    a_ids = [ids.setdefault(line, len(ids)) for line in a]
+    b_ids = [ids.setdefault(line, len(ids)) for line in b]
+    return a_ids, b_ids
+
+
+def _unique_anchors(a: List[int], alo: int, ahi: int, b: List[int], blo: int,
+                    bhi: int) -> List[Tuple[int, int]]:
+    """Longest increasing run of ``(i, j)`` pairs whose line is unique on both sides."""
+    count_a: Dict[int, int] = {}
+    where_a: Dict[int, int] = {}
+    for i in range(alo, ahi):
+        x = a[i]
+        count_a[x] = count_a.get(x, 0) + 1
+        where_a[x] = i
+    count_b: Dict[int, int] = {}
+    where_b: Dict[int, int] = {}
+    for j in range(blo, bhi):
+        x = b[j]
+        if count_a.get(x) == 1:
+            count_b[x] = count_b.get(x, 0) + 1
+            where_b[x] = j
+    pairs = sorted((j, where_a[x]) for x, j in where_b.items() if count_b[x] == 1)
+    # patience sorting over the old-side positions, in new-side order
+    tails: List[int] = []
+    tail_idx: List[int] = []
+    prev: List[int] = []
+    for k, (_, i) in enumerate(pairs):
+        pos = bisect_left(tails, i)
+        if pos == len(tails):
+            tails.append(i)
+            tail_idx.append(k)
+        else:
+            tails[pos] = i
+            tail_idx[pos] = k
+        prev.append(tail_idx[pos - 1] if pos else -1)
+    out: List[Tuple[int, int]] = []
+    k = tail_idx[-1] if tail_idx else -1
+    while k >= 0:
+        j, i = pairs[k]
+        out.append((i, j))
+        k = prev[k]
+    out.reverse()
+    return out
+
+
+def _best_anchor(a: List[int], alo: int, ahi: int, b: List[int], blo: int, bhi: int,
+                 deadline: float) -> Optional[Tuple[int, int, int]]:
+    positions: Dict[int, List[int]] = {}
+    for i in range(alo, ahi):
+        positions.setdefault(a[i], []).append(i)
+    occurrences = [len(positions[a[i]]) for i in range(alo, ahi)]
+    best_key: Optional[Tuple[int, int]] = None
+    best: Optional[Tuple[int, int, int]] = None
+    bi = blo
+    steps = 0
+    while bi < bhi:
+        steps += 1
+        if steps & 1023 == 0 and time.monotonic() > deadline:
+            break
+        pos = positions.get(b[bi])
+        # a line more common than the best anchor so far cannot beat it
+        if pos is None or len(pos) > MAX_CHAIN or (best_key is not None and len(pos) > best_key[0]):
+            bi += 1
+            continue
+        next_bi = bi + 1
+        for ai in pos:
+            sa, sb = ai, bi
+            while sa > alo and sb > blo and a[sa - 1] == b[sb - 1]:
+                sa -= 1
+                sb -= 1
+            ea, eb = ai + 1, bi + 1
+            while ea < ahi and eb < bhi and a[ea] == b[eb]:
+                ea += 1
+                eb += 1
+            count = min(occurrences[sa - alo:ea - alo])
+            key = (count, sa - ea)  # rarest lines first, then the longest run
+            if best_key is None or key < best_key:
+                best_key, best = key, (sa, sb, ea - sa)
+            if eb > next_bi:
+                next_bi = eb
+        bi = next_bi
+    return best
+
+
+def matching_blocks(a: Sequence[str], b: Sequence[str],
+                    budget: Optional[float] = DEFAULT_BUDGET_SECONDS) -> Tuple[List[Tuple[int, int, int]], bool]:
+    """Return ``(blocks, exact)``; blocks are sorted ``(i, j, n)`` runs of equal lines.
+
+    ``exact`` is False if the time budget ran out and some regions were
+    left as whole replace blocks.
+    """
+    a_ids, b_ids = _intern(a, b)
+    deadline = time.monotonic() + budget if budget is not None else float("inf")
+    exact = True
+    blocks: List[Tuple[int, int, int]] = []
+    # the flag is cleared below a region where patience found no anchors
+    stack = [(0, len(a_ids), 0, len(b_ids), True)]
+    while stack:
+        alo, ahi, blo, bhi, patience = stack.pop()
+        n = 0
+        while alo + n < ahi and blo + n < bhi and a_ids[alo + n] == b_ids[blo + n]:
+            n += 1
+        if n:
+            blocks.append((alo, blo, n))
+            alo += n
+            blo += n
+        n = 0
+        while alo < ahi - n and blo < bhi - n and a_ids[ahi - n - 1] == b_ids[bhi - n - 1]:
+            n += 1
+        if n:
+            blocks.append((ahi - n, bhi - n, n))
+            ahi -= n
+            bhi -= n
+        if alo == ahi or blo == bhi:
+            continue
+        if time.monotonic() > deadline:
+            exact = False
+            continue
+        if patience and ahi - alo > PATIENCE_MIN_LINES:
+            anchors = _unique_anchors(a_ids, alo, ahi, b_ids, blo, bhi)
+            if anchors:
+                gap_i, gap_j = alo, blo
+                for i, j in anchors:
+                    blocks.append((i, j, 1))
+                    stack.append((gap_i, i, gap_j, j, True))
+                    gap_i, gap_j = i + 1, j + 1
+                stack.append((gap_i, ahi, gap_j, bhi, True))
+                continue
+            patience = False
+        anchor = _best_anchor(a_ids, alo, ahi, b_ids, blo, bhi, deadline)
+        if anchor is None:
+            continue
+        i, j, n = anchor
+        blocks.append(anchor)
+        stack.append((i + n, ahi, j + n, bhi, patience))
+        stack.append((alo, i, blo, j, patience))
+    blocks.sort()
+    return blocks, exact
+
+
+def opcodes(a: Sequence[str], b: Sequence[str],
+            budget: Optional[float] = DEFAULT_BUDGET_SECONDS) -> Tuple[List[Opcode], bool]:
+    """Return ``(opcodes, exact)`` turning ``a`` into ``b`` (see ``matching_blocks``)."""
+    blocks, exact = matching_blocks(a, b, budget)
+    codes: List[Opcode] = []
+    i = j = 0
+    for ai, bj, n in blocks + [(len(a), len(b), 0)]:
+        tag = "replace" if i < ai and j < bj else "delete" if i < ai else "insert" if j < bj else ""
+        if tag:
+            codes.append((tag, i, ai, j, bj))
+        if n:
+            if codes and codes[-1][0] == "equal":
+                _, i1, _, j1, _ = codes.pop()
+                codes.append(("equal", i1, ai + n, j1, bj + n))
+            else:
+                codes.append(("equal", ai, ai + n, bj, bj + n))
+        i, j = ai + n, bj + n
+    return codes, exact
+
+
+def group_opcodes(codes: List[Opcode], n: int = 3) -> Iterator[List[Opcode]]:
+    """Hunks with up to ``n`` lines of context (as ``SequenceMatcher.get_grouped_opcodes``)."""
+    if not codes:
+        codes = [("equal", 0, 1, 0, 1)]
+    codes = list(codes)
+    if codes[0][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+    if codes[-1][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+    nn = n + n
+    group: List[Opcode] = []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == "equal" and i2 - i1 > nn:
+            group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        yield group
+
+
+def _format_range(start: int, stop: int) -> str:
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return str(beginning)
+    if not length:
+        beginning -= 1
+    return f"{beginning},{length}"
+
+
+def unified_diff(a: Sequence[str], b: Sequence[str], fromfile: str = "", tofile: str = "", n: int = 3,
+                 budget: Optional[float] = DEFAULT_BUDGET_SECONDS,
+                 max_lines: Optional[int] = MAX_PREVIEW_LINES) -> str:
+    """Unified diff text in ``difflib.unified_diff`` format (lines keep their ends).
+
+    Output past ``max_lines`` is replaced by a one-line summary of what was
+    left out; a hunk cut short has its header counts match the lines shown,
+    so the truncated diff still applies. An inexact diff (budget exceeded)
+    is flagged in a last line.
+    """
+    codes, exact = opcodes(a, b, budget)
+    out: List[str] = []
+    room = float("inf") if max_lines is None else max_lines
+    hidden_added = hidden_removed = 0
+
+    for group in group_opcodes(codes, n):
+        # take the group's lines in order until the room runs out
+        taken: List[Tuple[str, Sequence[str]]] = []
+        old_count = new_count = 0
+        changed = False
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                segments = [(" ", a[i1:i2])]
+            else:
+                segments = []
+                if tag in ("replace", "delete"):
+                    segments.append(("-", a[i1:i2]))
+                if tag in ("replace", "insert"):
+                    segments.append(("+", b[j1:j2]))
+            for prefix, lines in segments:
+                take = int(min(len(lines), max(room, 0)))
+                if take:
+                    taken.append((prefix, lines[:take]))
+                    room -= take
+                if prefix == "-":
+                    hidden_removed += len(lines) - take
+                elif prefix == "+":
+                    hidden_added += len(lines) - take
+                old_count += take if prefix != "+" else 0
+                new_count += take if prefix != "-" else 0
+                changed = changed or (take > 0 and prefix != " ")
+        if not changed:
+            continue  # only context fit; nothing worth a hunk
+        if not out:
+            out.append(f"--- {fromfile}\n")
+            out.append(f"+++ {tofile}\n")
+        first = group[0]
+        out.append(f"@@ -{_format_range(first[1], first[1] + old_count)} "
+                   f"+{_format_range(first[3], first[3] + new_count)} @@\n")
+        for prefix, lines in taken:
+            out.extend(prefix + line for line in lines)
+    if hidden_added or hidden_removed:
+        out.append(f"\n... [diff truncated after {max_lines} lines: +{hidden_added} -{hidden_removed} more lines]\n")
+    if out and not exact:
+        out.append("\n... [diff is approximate: time budget exceeded]\n")
+    return "".join(out)
@@ -0,0 +1,100 @@
+"""
+Binary/text and encoding detection for the read and search tools.
+
+Only the first ``SNIFF_BYTES`` of a file are examined:
+
+- a byte-order mark selects UTF-8-with-BOM, UTF-16 or UTF-32
+- otherwise a NUL byte means binary
+- otherwise valid UTF-8 means UTF-8, then cp1252 if it decodes, else latin-1
+
+Results are cached per path and reused while size, mtime and inode are
+unchanged, so later reads and searches skip binaries without opening them
+and decode text once with the right codec.
+"""
+from __future__ import annotations
+
+import codecs
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from .file_stream import utf8_boundary
+
+SNIFF_BYTES = 8192
+MAX_CACHED_KINDS = 4096
+
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+@dataclass(frozen=True)
+class FileKind:
+    binary: bool
+    encoding: Optional[str] = None  # None for binary files
+
+    @property
+    def ascii_compatible(self) -> bool:
+        """True if ``\\n`` is the byte 0x0A (line offsets and byte prefilters apply)."""
+        return not self.binary and not self.encoding.startswith(("utf-16", "utf-32"))
+
+
+BINARY = FileKind(True)
+UTF8 = FileKind(False, "utf-8")
+
+
+def sniff_bytes(head: bytes, complete: bool = False) -> FileKind:
+    """Classify a file from its first bytes; ``complete`` means ``head`` is the whole file."""
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return FileKind(False, encoding)
+    if b"\0" in head:
+        return BINARY
+    try:
+        head.decode("utf-8") if complete else head[:utf8_boundary(head)].decode("utf-8")
+        return UTF8
+    except UnicodeDecodeError:
+        pass
+    try:
+        head.decode("cp1252")
+        return FileKind(False, "cp1252")
+    except UnicodeDecodeError:
+        return FileKind(False, "latin-1")
+
+
+_StatKey = Tuple[int, int, int]
+_KINDS: "OrderedDict[str, Tuple[_StatKey, FileKind]]" = OrderedDict()
+_LOCK = threading.Lock()
+
+
+def file_kind(path: str | os.PathLike[str], head: Optional[bytes] = None,
+              st: Optional[os.stat_result] = None) -> FileKind:
+    """Return the cached kind of ``path``, sniffing it if new or changed.
+
+    Callers that already hold the file's first bytes (and stat) can pass
+    them to avoid a second read.
+    """
+    key = os.path.abspath(path)
+    st = st or os.stat(key)
+    stat_key = (st.st_size, st.st_mtime_ns, st.st_ino)
+    with _LOCK:
+        cached = _KINDS.get(key)
+        if cached is not None and cached[0] == stat_key:
+            _KINDS.move_to_end(key)
+            return cached[1]
+    if head is None:
+        with open(key, "rb") as f:
+            head = f.read(SNIFF_BYTES)
+    kind = sniff_bytes(head[:SNIFF_BYTES], complete=st.st_size <= SNIFF_BYTES)
+    with _LOCK:
+        _KINDS[key] = (stat_key, kind)
+        _KINDS.move_to_end(key)
+        while len(_KINDS) > MAX_CACHED_KINDS:
+            _KINDS.popitem(last=False)
+    return kind
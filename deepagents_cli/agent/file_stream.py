@@ -0,0 +1,125 @@
+"""
+Constant-memory streaming reads for files of any size.
+
+Each call reads at most ``max_bytes`` from a byte offset and returns either
+a window of whole lines or a raw chunk cut at a UTF-8 character boundary,
+plus a continuation cursor. The cursor is stateless: it encodes the next
+byte offset, the line number at that offset, whether it falls inside a long
+line, and the file's inode, so nothing is held open between calls and a
+file replaced in the meantime is detected. Appending to the file (a growing
+log) keeps existing cursors valid. Lines end at ``\\n``, ``\\r\\n`` or a lone
+``\\r``, so line numbers match ``line_index.read_lines``.
+"""
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from .line_index import LINE_END
+
+# hard cap on the buffer a single call may read
+MAX_CHUNK_BYTES = 1024 * 1024
+
+
+@dataclass
+class Window:
+    """One streamed window. ``lines`` holds ``(line_no, text)`` in line mode."""
+    text: str
+    lines: List[Tuple[int, str]]
+    offset: int
+    next_offset: int
+    next_line: int
+    size: int
+    starts_mid_line: bool = False
+    ends_mid_line: bool = False
+    inode: int = 0
+
+    @property
+    def eof(self) -> bool:
+        return self.next_offset >= self.size
+
+    @property
+    def cursor(self) -> Optional[str]:
+        """Token for the next window, or None at end of file."""
+        if self.eof:
+            return None
+        return encode_cursor(self.next_offset, self.next_line, self.ends_mid_line, self.inode)
+
+
+def encode_cursor(offset: int, line_no: int, mid_line: bool, inode: int) -> str:
+    return f"{offset}:{line_no}:{int(mid_line)}:{inode}"
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int, bool, int]:
+    """Return ``(offset, line_no, mid_line, inode)``; raises ValueError if malformed."""
+    offset, line_no, mid, inode = cursor.strip().split(":")
+    return int(offset), int(line_no), mid == "1", int(inode)
+
+
+def utf8_boundary(buf: bytes) -> int:
+    """Length of ``buf`` without a trailing incomplete UTF-8 sequence."""
+    end = len(buf)
+    for back in range(1, min(4, end) + 1):
+        byte = buf[end - back]
+        if byte & 0xC0 != 0x80:  # lead byte or ASCII
+            need = 1 if byte < 0x80 else 2 if byte >> 5 == 0b110 else 3 if byte >> 4 == 0b1110 \
+                else 4 if byte >> 3 == 0b11110 else 1
+            return end - back if need > back else end
+    return end
+
+
+def read_window(path: str | os.PathLike[str], cursor: Optional[str] = None, max_lines: Optional[int] = 200,
+                max_bytes: int = 64 * 1024, encoding: str = "utf-8", errors: str = "replace",
+                raw: bool = False) -> Window:
+    """Read the next window of ``path`` starting at ``cursor`` (file start if None).
+
+    - raw=False: whole lines, at most ``max_lines`` and ``max_bytes``; a single
+      line longer than ``max_bytes`` is returned in pieces
+    - raw=True: a ``max_bytes`` chunk ending on a character boundary
+    Raises ValueError if the cursor no longer matches the file.
+    """
+    max_bytes = max(1, min(int(max_bytes), MAX_CHUNK_BYTES))
+    offset, line_no, mid_line, inode = decode_cursor(cursor) if cursor else (0, 1, False, None)
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        if inode is not None and (inode != st.st_ino or offset > st.st_size):
+            raise ValueError("file was replaced or truncated since the cursor was issued; start again")
+        f.seek(offset)
+        buf = f.read(max_bytes)
+    at_eof = offset + len(buf) >= st.st_size
+
+    if raw:
+        cut = len(buf) if at_eof else utf8_boundary(buf) or len(buf)
+        if not at_eof and cut > 1 and buf[cut - 1:cut] == b"\r":
+            cut -= 1  # a "\r\n" may be split here; leave the "\r" to the next window
+        text = buf[:cut].decode(encoding, errors)
+        newlines = buf.count(b"\n", 0, cut) + buf.count(b"\r", 0, cut) - buf.count(b"\r\n", 0, cut)
+        ends_mid = cut > 0 and buf[cut - 1:cut] not in (b"\n", b"\r")
+        return Window(text, [], offset, offset + cut, line_no + newlines, st.st_size,
+                      mid_line, ends_mid, st.st_ino)
+
+    lines: List[Tuple[int, str]] = []
+    pos = 0
+    while max_lines is None or len(lines) < max_lines:
+        match = LINE_END.search(buf, pos)
+        if match is None or (match.end() == len(buf) and not at_eof and buf.endswith(b"\r")):
+            break  # a "\r" at the end of the buffer may be the first half of "\r\n"
+        lines.append((line_no + len(lines), buf[pos:match.start()].decode(encoding, errors)))
+        pos = match.end()
+    ends_mid = False
+    if (max_lines is None or len(lines) < max_lines) and pos < len(buf):
+        if at_eof:
+            lines.append((line_no + len(lines), buf[pos:].decode(encoding, errors)))
+            pos = len(buf)
+        elif not lines:
+            # one line longer than the buffer: hand it out in pieces
+            cut = utf8_boundary(buf) or len(buf)
+            if cut > 1 and buf[cut - 1:cut] == b"\r":
+                cut -= 1  # a "\r\n" may be split here; leave the "\r" to the next window
+            lines.append((line_no, buf[:cut].decode(encoding, errors)))
+            pos = cut
+            ends_mid = True
+    next_line = line_no + (len(lines) - 1 if ends_mid else len(lines))
+    text = "\n".join(t for _, t in lines)
+    return Window(text, lines, offset, offset + pos, next_line, st.st_size, mid_line, ends_mid, st.st_ino)
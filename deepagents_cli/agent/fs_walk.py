@@ -0,0 +1,476 @@
+"""
+Shared directory walker for the filesystem and search tools.
+
+Each directory is listed with a single ``os.scandir`` call and the resulting
+``DirEntry`` objects (with their cached type and stat data) are handed to the
+caller. Ignored subtrees, meaning ``DEFAULT_IGNORE_DIRS`` and anything matched
+by ``.gitignore`` files, are pruned before descending instead of being walked
+and filtered afterwards. Callers that repeatedly render the same tree can
+pass ``cached=True`` to reuse listings of directories whose mtime has not
+changed (see ``DirCache``). ``iglob`` matches a path glob during the walk
+and only descends into directories that can still lead to a match.
+"""
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_IGNORE_DIRS = {
+    ".git", "node_modules", "dist", "build", "__pycache__", ".venv", "venv",
+    ".deepagents",
+}
+
+# pathlib globbing is case-insensitive on Windows; keep that behavior
+_GLOB_FLAGS = re.IGNORECASE if os.name == "nt" else 0
+
+
+def glob_to_regex(pattern: str) -> str:
+    """Translate a path glob to a regex over ``/``-separated relative paths.
+
+    ``*`` and ``?`` never cross ``/``; ``**`` as a whole component matches
+    zero or more directories.
+    """
+    out: List[str] = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern.startswith("**", i) and (i == 0 or pattern[i - 1] == "/"):
+                j = i + 2
+                if j == n:
+                    out.append(".*")
+                    i = j
+                    continue
+                if pattern[j] == "/":
+                    out.append("(?:.*/)?")
+                    i = j + 1
+                    continue
+            while i + 1 < n and pattern[i + 1] == "*":
+                i += 1
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            j = pattern.find("]", i + 2 if pattern.startswith(("[!", "[^"), i) else i + 1)
+            if j < 0:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:j]
+                if body[:1] in ("!", "^"):
+                    body = "^" + body[1:]
+                out.append("[" + body.replace("\\", "\\\\") + "]")
+                i = j
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+@lru_cache(maxsize=256)
+def compile_glob(pattern: str) -> re.Pattern:
+    """Compile a path glob (see ``glob_to_regex``) for ``fullmatch`` on relative paths."""
+    return re.compile(glob_to_regex(pattern.replace("\\", "/") if os.name == "nt" else pattern), _GLOB_FLAGS)
+
+
+@dataclass
+class _Rule:
+    regex: re.Pattern
+    negate: bool
+    dir_only: bool
+
+
+def parse_gitignore(text: str) -> List[_Rule]:
+    """Parse ``.gitignore`` content into ordered rules."""
+    rules: List[_Rule] = []
+    for raw in text.splitlines():
+        line = raw.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        elif line.startswith("\\"):
+            line = line[1:]  # \# and \! escapes
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+        if "/" in line:
+            body = glob_to_regex(line.lstrip("/"))
+        else:
+            body = "(?:.*/)?" + glob_to_regex(line)
+        rules.append(_Rule(re.compile(body + "(?:/.*)?"), negate, dir_only))
+    return rules
+
+
+_GITIGNORE_CACHE: Dict[str, Tuple[int, List[_Rule]]] = {}
+_GITIGNORE_LOCK = threading.Lock()
+
+
+def _load_gitignore(path: str) -> Optional[List[_Rule]]:
+    """Return parsed rules for a ``.gitignore`` file, cached by mtime."""
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _GITIGNORE_LOCK:
+        cached = _GITIGNORE_CACHE.get(path)
+        if cached and cached[0] == mtime_ns:
+            return cached[1]
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            rules = parse_gitignore(f.read())
+    except OSError:
+        return None
+    with _GITIGNORE_LOCK:
+        _GITIGNORE_CACHE[path] = (mtime_ns, rules)
+    return rules
+
+
+class IgnoreRules:
+    """Decide which paths below ``root`` are ignored.
+
+    Combines ``ignore_dirs`` (matched by directory name) with ``.gitignore``
+    files in ``root``, its subdirectories, and its ancestors up to the
+    enclosing repository. Later and deeper rules win, and ``!`` negation is
+    honored.
+    """
+
+    def __init__(self, root: Path, ignore_dirs: Optional[set] = None, use_gitignore: bool = True):
+        self.root = Path(root)
+        self.ignore_dirs = DEFAULT_IGNORE_DIRS if ignore_dirs is None else ignore_dirs
+        self.use_gitignore = use_gitignore
+        self._dir_rules: Dict[str, Optional[List[_Rule]]] = {}
+        # (path of root relative to the ancestor's directory, rules)
+        self._ancestor_rules: List[Tuple[str, List[_Rule]]] = []
+        if use_gitignore:
+            self._load_ancestors()
+
+    def _load_ancestors(self) -> None:
+        found: List[Tuple[str, List[_Rule]]] = []
+        if (self.root / ".git").exists():
+            return
+        for parent in self.root.resolve().parents:
+            rules = _load_gitignore(str(parent / ".gitignore"))
+            if rules:
+                found.append((self.root.resolve().relative_to(parent).as_posix(), rules))
+            if (parent / ".git").exists():
+                self._ancestor_rules = found[::-1]
+                return
+        # not inside a repository: ancestor .gitignore files do not apply
+
+    def _rules_for(self, rel_dir: str) -> Optional[List[_Rule]]:
+        if rel_dir not in self._dir_rules:
+            self._dir_rules[rel_dir] = _load_gitignore(os.path.join(self.root, rel_dir, ".gitignore"))
+        return self._dir_rules[rel_dir]
+
+    def ignored(self, rel: str, is_dir: bool) -> bool:
+        """Return True if ``rel`` (``/``-separated, relative to root) is ignored."""
+        name = rel.rpartition("/")[2]
+        if is_dir and name in self.ignore_dirs:
+            return True
+        if not self.use_gitignore:
+            return False
+        result = False
+        for prefix, rules in self._ancestor_rules:
+            result = _apply(rules, f"{prefix}/{rel}", is_dir, result)
+        parts = rel.split("/")
+        for i in range(len(parts)):
+            rules = self._rules_for("/".join(parts[:i]))
+            if rules:
+                result = _apply(rules, "/".join(parts[i:]), is_dir, result)
+        return result
+
+
+def _apply(rules: List[_Rule], path: str, is_dir: bool, result: bool) -> bool:
+    for rule in rules:
+        if rule.dir_only and not is_dir:
+            # "dir/" still covers files below a matching directory
+            m = rule.regex.fullmatch(path)
+            if m is None or "/" not in path or not _matches_parent(rule, path):
+                continue
+        elif rule.regex.fullmatch(path) is None:
+            continue
+        result = not rule.negate
+    return result
+
+
+def _matches_parent(rule: _Rule, path: str) -> bool:
+    parent = path.rpartition("/")[0]
+    while parent:
+        if rule.regex.fullmatch(parent):
+            return True
+        parent = parent.rpartition("/")[0]
+    return False
+
+
+def _entry_is_dir(entry: os.DirEntry) -> bool:
+    try:
+        return entry.is_dir()
+    except OSError:
+        return False
+
+
+class CachedEntry:
+    """Snapshot of a ``DirEntry`` (name, path, type) kept by the directory cache."""
+
+    __slots__ = ("name", "path", "_is_dir", "_is_file", "_is_symlink")
+
+    def __init__(self, entry: os.DirEntry):
+        self.name = entry.name
+        self.path = entry.path
+        self._is_dir = _entry_is_dir(entry)
+        try:
+            # False for broken symlinks, sockets and FIFOs, as with DirEntry
+            self._is_file = entry.is_file()
+        except OSError:
+            self._is_file = False
+        try:
+            self._is_symlink = entry.is_symlink()
+        except OSError:
+            self._is_symlink = False
+
+    def is_dir(self) -> bool:
+        return self._is_dir
+
+    def is_file(self) -> bool:
+        return self._is_file
+
+    def is_symlink(self) -> bool:
+        return self._is_symlink
+
+    def stat(self) -> os.stat_result:
+        return os.stat(self.path)
+
+
+# A listing whose directory mtime is this close to the time it was taken may
+# miss a change made in the same timestamp tick, so it is not trusted.
+_RACY_NS = 2_000_000_000
+MAX_CACHED_DIRS = 50000
+
+
+class DirCache:
+    """Sorted directory listings reused while the directory's mtime is unchanged.
+
+    Adding, removing or renaming an entry bumps the directory's mtime, so a
+    cached listing costs one ``stat`` to validate. Ignore rules and hidden
+    filtering are applied by the caller on every use, so ``.gitignore`` edits
+    take effect without invalidation.
+    """
+
+    def __init__(self, max_dirs: int = MAX_CACHED_DIRS):
+        self.max_dirs = max_dirs
+        self._listings: Dict[str, Tuple[int, List[CachedEntry]]] = {}
+        self._lock = threading.Lock()
+
+    def entries(self, path: str | os.PathLike[str]) -> List[CachedEntry]:
+        key = os.fspath(path)
+        mtime_ns = os.stat(key).st_mtime_ns
+        with self._lock:
+            cached = self._listings.get(key)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
+        with os.scandir(key) as it:
+            entries = sorted((CachedEntry(e) for e in it), key=lambda e: e.name)
+        if time.time_ns() - mtime_ns > _RACY_NS:
+            with self._lock:
+                if len(self._listings) >= self.max_dirs:
+                    self._listings.clear()
+                self._listings[key] = (mtime_ns, entries)
+        return entries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._listings.clear()
+
+
+dir_cache = DirCache()
+
+
+def scan_dir(path: str | os.PathLike[str], rules: Optional[IgnoreRules] = None, rel_dir: str = "",
+             show_hidden: bool = True, cached: bool = False) -> List[os.DirEntry]:
+    """List one directory, sorted by name, without ignored or (optionally) hidden entries.
+
+    ``rel_dir`` is the directory's path relative to ``rules.root``. With
+    ``cached=True`` the listing comes from ``dir_cache`` (``CachedEntry``
+    objects with the same name/path/is_dir/is_file/stat interface).
+    """
+    try:
+        if cached:
+            entries = dir_cache.entries(path)
+        else:
+            with os.scandir(path) as it:
+                entries = sorted(it, key=lambda e: e.name)
+    except OSError:
+        return []
+    out = []
+    for entry in entries:
+        if not show_hidden and entry.name.startswith("."):
+            continue
+        if rules is not None:
+            rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if rules.ignored(rel, _entry_is_dir(entry)):
+                continue
+        out.append(entry)
+    return out
+
+
+def count_children(path: str | os.PathLike[str], show_hidden: bool = True,
+                   limit: Optional[int] = None) -> Tuple[int, bool]:
+    """Count a directory's entries in one scandir pass without stat calls.
+
+    Returns ``(count, capped)``; counting stops once ``limit`` is reached.
+    """
+    count = 0
+    with os.scandir(path) as it:
+        for entry in it:
+            if not show_hidden and entry.name.startswith("."):
+                continue
+            count += 1
+            if limit is not None and count >= limit:
+                return count, True
+    return count, False
+
+
+def walk(root: str | os.PathLike[str], rules: Optional[IgnoreRules] = None, include_dirs: bool = False,
+         max_depth: Optional[int] = None, show_hidden: bool = True,
+         follow_symlinks: bool = False, cached: bool = False) -> Iterator[Tuple[str, os.DirEntry]]:
+    """Depth-first walk yielding ``(rel_path, DirEntry)`` in sorted order.
+
+    - rules: defaults to ``IgnoreRules(root)``; ignored subtrees are never entered
+    - include_dirs: also yield directories (before their contents)
+    - max_depth: direct children of root are depth 0; deeper entries are not listed
+    - follow_symlinks: descend into symlinked directories
+    - cached: reuse ``dir_cache`` listings for directories whose mtime is unchanged
+    """
+    root = Path(root)
+    if rules is None:
+        rules = IgnoreRules(root)
+    stack = [("", 0, iter(scan_dir(root, rules, "", show_hidden, cached)))]
+    while stack:
+        rel_dir, depth, entries = stack[-1]
+        entry = next(entries, None)
+        if entry is None:
+            stack.pop()
+            continue
+        rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+        if _entry_is_dir(entry):
+            if include_dirs:
+                yield rel, entry
+            if (max_depth is None or depth < max_depth) and (follow_symlinks or not entry.is_symlink()):
+                stack.append((rel, depth + 1, iter(scan_dir(entry.path, rules, rel, show_hidden, cached))))
+        else:
+            yield rel, entry
+
+
+_GLOB_MAGIC = re.compile(r"[*?\[\\]")
+
+
+def _split_glob(pattern: str) -> List[str]:
+    if os.name == "nt":
+        pattern = pattern.replace("\\", "/")
+    return [seg for seg in pattern.split("/") if seg and seg != "."]
+
+
+class _GlobMatcher:
+    """Component-wise matcher for a path glob (same syntax as ``glob_to_regex``).
+
+    Match state is the set of pattern segments that could consume the next
+    path component, so a directory whose state set is empty cannot contain
+    a match and is never listed.
+    """
+
+    def __init__(self, segments: List[str]):
+        self.segments = segments
+        self.n = len(segments)
+        self.regexes = [None if seg == "**" else re.compile(glob_to_regex(seg), _GLOB_FLAGS)
+                        for seg in segments]
+        self.start = self._closure({0})
+
+    def _closure(self, states: set) -> frozenset:
+        # a non-final "**" may match zero directories
+        out = set(states)
+        todo = list(states)
+        while todo:
+            i = todo.pop()
+            if i < self.n - 1 and self.regexes[i] is None and i + 1 not in out:
+                out.add(i + 1)
+                todo.append(i + 1)
+        return frozenset(out)
+
+    def step(self, states: frozenset, name: str) -> Tuple[frozenset, bool]:
+        """Consume one path component; return ``(next_states, full_match)``."""
+        nxt = set()
+        matched = False
+        for i in states:
+            if i >= self.n:
+                continue
+            regex = self.regexes[i]
+            if regex is None:
+                nxt.add(i)
+                if i == self.n - 1:
+                    matched = True  # a trailing "**" matches everything below
+            elif regex.fullmatch(name):
+                nxt.add(i + 1)
+                if i + 1 == self.n:
+                    matched = True
+        return self._closure(nxt), matched
+
+
+def iglob(root: str | os.PathLike[str], pattern: str, rules: Optional[IgnoreRules] = None,
+          include_dirs: bool = True, follow_symlinks: bool = False,
+          cached: bool = False) -> Iterator[Tuple[str, os.DirEntry]]:
+    """Lazily yield ``(rel_path, DirEntry)`` for paths under ``root`` matching ``pattern``.
+
+    Results follow ``walk`` order and equal filtering ``walk`` with
+    ``compile_glob(pattern)``, but leading literal components are resolved
+    directly (so ``src/**/*.py`` never lists the root) and directories that
+    cannot lead to a match are not listed. Callers stop early with ``islice``.
+
+    A directory in ``rules.ignore_dirs`` that the pattern's leading literal
+    components name, as in ``node_modules/pkg/*.js``, is still searched. A
+    directory ignored by ``.gitignore`` is not, because those rules also
+    match every path below it.
+
+    A trailing ``**`` matches files as well as directories below it, like
+    ``glob.glob(..., recursive=True)`` and ``Path.glob`` from Python 3.13;
+    ``Path.glob`` in earlier versions returns only the directories. Pass
+    ``include_dirs=False`` to get files only.
+    """
+    root = Path(root)
+    if rules is None:
+        rules = IgnoreRules(root)
+    segments = _split_glob(pattern)
+    if not segments:
+        return
+    base = []
+    while len(segments) > 1 and not _GLOB_MAGIC.search(segments[0]) and segments[0] != "..":
+        base.append(segments.pop(0))
+    base_rel = "/".join(base)
+    start = root.joinpath(*base) if base else root
+    if base and not start.is_dir():
+        return
+    matcher = _GlobMatcher(segments)
+    stack = [(base_rel, matcher.start, iter(scan_dir(start, rules, base_rel, True, cached)))]
+    while stack:
+        rel_dir, states, entries = stack[-1]
+        entry = next(entries, None)
+        if entry is None:
+            stack.pop()
+            continue
+        rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+        nxt, matched = matcher.step(states, entry.name)
+        is_dir = _entry_is_dir(entry)
+        if matched and (include_dirs or not is_dir):
+            yield rel, entry
+        if is_dir and nxt and any(i < matcher.n for i in nxt) and (follow_symlinks or not entry.is_symlink()):
+            stack.append((rel, nxt, iter(scan_dir(entry.path, rules, rel, True, cached))))
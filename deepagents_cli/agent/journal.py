@@ -0,0 +1,217 @@
+"""
+Write-ahead journal for grouped file writes.
+
+Before a journaled ``WriteBatch`` renames anything, it records for each
+target the byte range that changes, the old bytes of that range, and a hash
+of the new content. Unchanged prefixes and suffixes are not stored, so a
+refactor touching a few lines in hundreds of files journals only those
+lines. The journal is deleted once every rename has happened. If a rename
+fails, or the process dies first, replaying the journal splices the old
+bytes back into every file that holds the new content and removes files
+the transaction created.
+
+Journals live in ``<root>/.deepagents/journal/`` as small JSON files. Each
+has a ``.lock`` sidecar that the writing process holds an exclusive lock on
+(``flock``, or ``msvcrt.locking`` on Windows) from before the journal
+appears until after it is deleted, so recovery in another session skips
+transactions that are still in progress.
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from . import config
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore[assignment]
+    import msvcrt
+
+JOURNAL_DIRNAME = os.path.join(config.STATE_DIRNAME, "journal")
+JOURNAL_VERSION = 1
+
+_BLOCK = 64 * 1024
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+def _common_prefix(a: bytes, b: bytes) -> int:
+    limit = min(len(a), len(b))
+    pos = 0
+    # compare whole blocks first, then bisect inside the first differing one
+    while pos + _BLOCK <= limit and a[pos:pos + _BLOCK] == b[pos:pos + _BLOCK]:
+        pos += _BLOCK
+    lo, hi = pos, min(pos + _BLOCK, limit)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[pos:mid] == b[pos:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix(a: bytes, b: bytes, limit: int) -> int:
+    # bytes are compared from the end on reversed copies of the tails only
+    if limit <= 0:
+        return 0
+    return _common_prefix(a[len(a) - limit:][::-1], b[len(b) - limit:][::-1])
+
+
+@dataclass
+class JournalEntry:
+    """Undo record for one file: ``old`` replaced ``new_len`` bytes at ``start``."""
+    path: str
+    start: int
+    old: Optional[bytes]  # None if the file did not exist before
+    new_len: int
+    new_hash: str
+    tmp: str = ""
+
+    @classmethod
+    def diff(cls, path: str, old: Optional[bytes], new: bytes, tmp: str = "") -> "JournalEntry":
+        if old is None:
+            return cls(path, 0, None, len(new), content_hash(new), tmp)
+        start = _common_prefix(old, new)
+        suffix = _common_suffix(old, new, min(len(old), len(new)) - start)
+        return cls(path, start, old[start:len(old) - suffix], len(new) - start - suffix,
+                   content_hash(new), tmp)
+
+    def undo(self, current: bytes) -> bytes:
+        """Rebuild the old content from the file's new content."""
+        return current[:self.start] + (self.old or b"") + current[self.start + self.new_len:]
+
+    def to_json(self) -> dict:
+        return {
+            "path": self.path,
+            "start": self.start,
+            "old": None if self.old is None else base64.b64encode(self.old).decode("ascii"),
+            "new_len": self.new_len,
+            "new_hash": self.new_hash,
+            "tmp": self.tmp,
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "JournalEntry":
+        old = data["old"]
+        return cls(data["path"], data["start"], None if old is None else base64.b64decode(old),
+                   data["new_len"], data["new_hash"], data.get("tmp", ""))
+
+
+def journal_dir(root: str | os.PathLike[str]) -> Path:
+    return Path(root) / JOURNAL_DIRNAME
+
+
+class JournalLock:
+    """Exclusive lock on a journal's ``.lock`` sidecar, held by the transaction's owner."""
+
+    def __init__(self, journal: Path, fd: int):
+        self.journal = journal
+        self.path = journal.with_suffix(".lock")
+        self._fd: Optional[int] = fd
+
+    @classmethod
+    def acquire(cls, journal: str | os.PathLike[str]) -> Optional["JournalLock"]:
+        """Lock ``journal`` without waiting; None if another process (or handle) holds it."""
+        journal = Path(journal)
+        fd = os.open(journal.with_suffix(".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            os.close(fd)
+            return None
+        return cls(journal, fd)
+
+    def release(self, delete_journal: bool = True) -> None:
+        """Delete the journal (the commit or recovery point), then drop and delete the lock."""
+        if self._fd is None:
+            return
+        if delete_journal:
+            try:
+                os.unlink(self.journal)
+            except FileNotFoundError:
+                pass
+        try:
+            if fcntl is None:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass  # another recoverer may have it open; an unlocked leftover is harmless
+
+
+def write_journal(directory: str | os.PathLike[str], entries: List[JournalEntry],
+                  fsync: bool = True) -> JournalLock:
+    """Durably record ``entries`` under a lock held until ``release()`` deletes the journal."""
+    directory = Path(directory)
+    if not directory.exists():
+        config.make_state_dir(directory)
+    path = directory / f"{time.time_ns()}-{os.getpid()}.json"
+    lock = JournalLock.acquire(path)
+    if lock is None:
+        raise OSError(f"cannot lock new journal {path}")
+    try:
+        tmp = path.with_suffix(".tmp")
+        payload = {"version": JOURNAL_VERSION, "entries": [e.to_json() for e in entries]}
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        lock.release()
+        raise
+    return lock
+
+
+def read_journal(path: str | os.PathLike[str]) -> List[JournalEntry]:
+    with open(path, "r", encoding="utf-8") as f:
+        payload = json.load(f)
+    if payload.get("version") != JOURNAL_VERSION:
+        raise ValueError(f"unsupported journal version in {path}")
+    return [JournalEntry.from_json(e) for e in payload["entries"]]
+
+
+def pending_journals(root: str | os.PathLike[str]) -> List[Path]:
+    """Journals of unfinished transactions, oldest first; some may still be in progress."""
+    directory = journal_dir(root)
+    try:
+        names = sorted(n for n in os.listdir(directory) if n.endswith(".json"))
+    except OSError:
+        return []
+    return [directory / n for n in names]
+
+
+def rollback_plan(entry: JournalEntry) -> Tuple[bool, Optional[bytes]]:
+    """Return ``(applies, old_content)`` for an entry given the file on disk.
+
+    ``applies`` is False when the file does not hold the transaction's new
+    content (never renamed, or changed since), in which case it is left
+    alone. ``old_content`` None means the file should be removed.
+    """
+    try:
+        with open(entry.path, "rb") as f:
+            current = f.read()
+    except OSError:
+        return False, None
+    if content_hash(current) != entry.new_hash:
+        return False, None
+    return True, None if entry.old is None else entry.undo(current)
@@ -0,0 +1,137 @@
+"""
+Cached newline-offset index for ranged file reads.
+
+The first ranged read of a file records the byte offset of every line start
+(one sequential pass, no decoding). The offsets are cached by path and
+checked against the file's size and mtime. Later reads seek straight to the
+requested lines and decode only that window, so paging through a large file
+costs O(window) per page instead of a full read and ``splitlines()``.
+
+Lines end at ``\\n``, ``\\r\\n`` or a lone ``\\r`` (universal newlines, as in
+``Path.read_text``). Full reads split their text with ``split_lines``, so a
+line number means the same line in ranged and full reads. Unlike
+``str.splitlines``, form feeds, ``\\x1c``-``\\x1e``, ``\\x85`` and ``\\u2028``/``\\u2029``
+are ordinary characters.
+"""
+from __future__ import annotations
+
+import os
+import re
+import threading
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from .logging import log
+
+_CHUNK_BYTES = 1024 * 1024
+MAX_CACHED_FILES = 32
+
+LINE_END = re.compile(rb"\r\n|\r|\n")
+
+
+@dataclass
+class LineIndex:
+    """Byte offsets of each line start in one file version."""
+    size: int
+    mtime_ns: int
+    starts: array
+
+    @property
+    def line_count(self) -> int:
+        return len(self.starts)
+
+    def byte_range(self, start_line: int, end_line: int) -> Tuple[int, int]:
+        """Byte span of 1-based lines ``start_line..end_line`` (inclusive)."""
+        begin = self.starts[start_line - 1]
+        end = self.starts[end_line] if end_line < len(self.starts) else self.size
+        return begin, end
+
+
+def build_line_index(path: str | os.PathLike[str]) -> LineIndex:
+    """Scan ``path`` once and record where every line starts."""
+    st = os.stat(path)
+    starts = array("q")
+    with open(path, "rb") as f:
+        base = 0
+        split_cr = False  # the previous chunk ended in "\r"
+        while True:
+            chunk = f.read(_CHUNK_BYTES)
+            if not chunk:
+                break
+            if base == 0:
+                starts.append(0)
+            if split_cr and not chunk.startswith(b"\n"):
+                starts.append(base)  # that "\r" ended a line on its own
+            split_cr = chunk.endswith(b"\r")
+            body = chunk[:-1] if split_cr else chunk
+            if body.count(b"\r") == body.count(b"\r\n"):
+                # no lone "\r": every line ends with "\n"
+                pos = chunk.find(b"\n")
+                while pos >= 0:
+                    starts.append(base + pos + 1)
+                    pos = chunk.find(b"\n", pos + 1)
+            else:
+                starts.extend(base + m.end() for m in LINE_END.finditer(body))
+            base += len(chunk)
+        if split_cr:
+            starts.append(base)
+    # a final newline does not start another line
+    if starts and starts[-1] >= base:
+        starts.pop()
+    return LineIndex(base, st.st_mtime_ns, starts)
+
+
+_INDEXES: "OrderedDict[str, LineIndex]" = OrderedDict()
+_LOCK = threading.Lock()
+
+
+def get_line_index(path: str | os.PathLike[str]) -> LineIndex:
+    """Return the cached index for ``path``, rebuilding it if size or mtime changed."""
+    key = os.path.abspath(path)
+    st = os.stat(key)
+    with _LOCK:
+        index = _INDEXES.get(key)
+        if index is not None and index.size == st.st_size and index.mtime_ns == st.st_mtime_ns:
+            _INDEXES.move_to_end(key)
+            return index
+    index = build_line_index(key)
+    log(f"line_index: indexed {key} ({index.line_count} lines)")
+    with _LOCK:
+        _INDEXES[key] = index
+        _INDEXES.move_to_end(key)
+        while len(_INDEXES) > MAX_CACHED_FILES:
+            _INDEXES.popitem(last=False)
+    return index
+
+
+def read_lines(path: str | os.PathLike[str], start_line: Optional[int] = None, end_line: Optional[int] = None,
+               encoding: str = "utf-8", errors: str = "replace") -> Tuple[List[str], int]:
+    """Return ``(lines, total_lines)`` for 1-based inclusive ``start_line..end_line``.
+
+    Either bound may be None (file start / end). Only the requested byte
+    range is read and decoded.
+    """
+    index = get_line_index(path)
+    total = index.line_count
+    start = max(1, start_line or 1)
+    end = min(total, end_line) if end_line else total
+    if start > end:
+        return [], total
+    begin, stop = index.byte_range(start, end)
+    with open(path, "rb") as f:
+        f.seek(begin)
+        data = f.read(stop - begin)
+    text = data.decode(encoding, errors)
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return split_lines(text), total
+
+
+def split_lines(text: str) -> List[str]:
+    """Split text decoded with universal newlines into lines, numbered as ``read_lines`` does."""
+    lines = text.split("\n")
+    if lines and not lines[-1]:
+        lines.pop()
+    return lines
@@ -0,0 +1,248 @@
+"""
+Literal-prefiltered line matching for the search tools.
+
+``required_literals`` extracts the plain substrings every match of a regex
+must contain. ``LineMatcher`` uses the longest of them as an anchor: it runs
+a whole-buffer ``find`` (or a case-insensitive literal regex), and only the
+lines that contain the anchor are cut out and checked against the full
+regex. Files that do not contain the anchor are rejected without splitting
+a single line. Patterns with no usable literal fall back to per-line search.
+"""
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    from re import _parser as _sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover
+    import sre_parse as _sre_parse  # type: ignore[no-redef]
+
+_LITERAL = _sre_parse.LITERAL
+_AT = _sre_parse.AT
+_SUBPATTERN = _sre_parse.SUBPATTERN
+_REPEATS = {
+    op for op in (
+        _sre_parse.MAX_REPEAT,
+        _sre_parse.MIN_REPEAT,
+        getattr(_sre_parse, "POSSESSIVE_REPEAT", None),
+    ) if op is not None
+}
+_ATOMIC_GROUP = getattr(_sre_parse, "ATOMIC_GROUP", None)
+
+
+def _collect(seq, out: List[str], ignorecase: bool) -> None:
+    run: List[str] = []
+    for op, av in seq:
+        if op is _LITERAL:
+            run.append(chr(av))
+            continue
+        if op is _AT:
+            continue  # zero-width anchors do not split a literal run
+        if run:
+            out.append("".join(run))
+            run = []
+        if op is _SUBPATTERN:
+            _group, add_flags, _del_flags, sub = av
+            # a scoped (?i:...) makes its literals case-insensitive; skip them
+            if ignorecase or not add_flags & re.IGNORECASE:
+                _collect(sub, out, ignorecase)
+        elif op in _REPEATS and av[0] >= 1:
+            _collect(av[2], out, ignorecase)
+        elif op is _ATOMIC_GROUP:
+            _collect(av, out, ignorecase)
+    if run:
+        out.append("".join(run))
+
+
+def required_literals(pattern: str, flags: int = 0) -> List[str]:
+    """Return substrings that every match of ``pattern`` must contain.
+
+    Alternations, optional parts and character classes contribute nothing,
+    so the result may be empty. Invalid patterns also return an empty list.
+    """
+    try:
+        parsed = _sre_parse.parse(pattern, flags)
+    except (re.error, TypeError, ValueError):
+        return []
+    ignorecase = bool(parsed.state.flags & re.IGNORECASE)
+    out: List[str] = []
+    _collect(parsed, out, ignorecase)
+    return [lit for lit in out if lit]
+
+
+# switch to per-line scanning once more than 1 in _DENSE_RATIO lines holds the anchor
+_DENSE_MIN_LINES = 64
+_DENSE_RATIO = 4
+
+
+class LineMatcher:
+    """Find lines matching a regex, using the longest required literal as a prefilter."""
+
+    def __init__(self, pattern: str, flags: int = 0):
+        self.regex = re.compile(pattern, flags)
+        self.literals = required_literals(pattern, flags)
+        self.anchor: Optional[str] = max(self.literals, key=len) if self.literals else None
+        self._ignorecase = bool(self.regex.flags & re.IGNORECASE)
+        # ASCII literals against ASCII text can be matched with a lowercased str.find
+        self._ascii = all(lit.isascii() for lit in self.literals)
+        self._lower_literals = [lit.lower() for lit in self.literals]
+        self._literal_res = [re.compile(re.escape(lit), re.IGNORECASE) for lit in self.literals]
+        # byte-level prefilters for mmap scanning, built per file encoding
+        self._byte_literals: Dict[str, List[Tuple[bytes, Optional[re.Pattern]]]] = {}
+
+    def _byte_literals_for(self, encoding: str) -> List[Tuple[bytes, Optional[re.Pattern]]]:
+        """Literals encoded like the file, for ``may_match_bytes``.
+
+        Bytes regexes only fold ASCII case, so non-ASCII literals are left
+        out under IGNORECASE, as are literals the encoding cannot represent.
+        """
+        found = self._byte_literals.get(encoding)
+        if found is not None:
+            return found
+        codec = "utf-8" if encoding == "utf-8-sig" else encoding  # no BOM in front of literals
+        found = []
+        for lit in self.literals:
+            try:
+                raw = lit.encode(codec)
+            except UnicodeEncodeError:
+                continue
+            if not self._ignorecase:
+                found.append((raw, None))
+            elif lit.isascii():
+                found.append((raw, re.compile(re.escape(raw), re.IGNORECASE)))
+        self._byte_literals[encoding] = found
+        return found
+
+    def byte_anchor(self, encoding: str) -> Optional[Tuple[bytes, Optional[re.Pattern]]]:
+        """The longest literal usable on raw bytes, as ``(literal, case-insensitive regex or None)``.
+
+        None if no required literal survives encoding (see ``_byte_literals_for``).
+        """
+        found = self._byte_literals_for(encoding)
+        return max(found, key=lambda item: len(item[0])) if found else None
+
+    def _haystack(self, text: str) -> Tuple[Optional[str], List[str]]:
+        """Return the buffer and literals to use with ``str.find``.
+
+        The buffer is None when only a case-insensitive regex scan is exact
+        (non-ASCII text or literals under IGNORECASE).
+        """
+        if not self._ignorecase:
+            return text, self.literals
+        if self._ascii and text.isascii():
+            return text.lower(), self._lower_literals
+        return None, self.literals
+
+    def may_match(self, text: str) -> bool:
+        """Cheap whole-buffer check: False means no line can match."""
+        hay, literals = self._haystack(text)
+        if hay is None:
+            return all(r.search(text) for r in self._literal_res)
+        return all(lit in hay for lit in literals)
+
+    def may_match_bytes(self, buf, start: int, end: int, encoding: str = "utf-8") -> bool:
+        """Like ``may_match`` for ``buf[start:end]`` of a bytes-like buffer (e.g. mmap), without copying.
+
+        ``encoding`` must be ASCII-compatible (UTF-8 or a single-byte codec).
+        """
+        for raw, regex in self._byte_literals_for(encoding):
+            if regex is None:
+                if buf.find(raw, start, end) < 0:
+                    return False
+            elif regex.search(buf, start, end) is None:
+                return False
+        return True
+
+    def iter_lines(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """Yield ``(line_no, start, end)`` for each matching line of ``text``.
+
+        Lines are split on ``\\n`` only; ``end`` excludes the newline and any
+        trailing ``\\r``. Line numbers are 1-based.
+        """
+        if self.anchor is None:
+            yield from self._iter_split(text, 0, 1)
+            return
+        hay, literals = self._haystack(text)
+        if hay is None:
+            if not all(r.search(text) for r in self._literal_res):
+                return
+            anchor_search = self._literal_res[self.literals.index(self.anchor)].search
+        else:
+            if not all(lit in hay for lit in literals):
+                return
+            anchor = literals[self.literals.index(self.anchor)]
+            find = hay.find
+        search = self.regex.search
+        line_no, counted, pos, checked = 1, 0, 0, 0
+        while True:
+            if hay is None:
+                m = anchor_search(text, pos)
+                if m is None:
+                    return
+                found = m.start()
+            else:
+                found = find(anchor, pos)
+                if found < 0:
+                    return
+            start = text.rfind("\n", 0, found) + 1
+            end = text.find("\n", found)
+            if end < 0:
+                end = len(text)
+            stripped = end - 1 if end > start and text[end - 1] == "\r" else end
+            line_no += text.count("\n", counted, start)
+            counted = start
+            # search the slice so ^, $ and lookarounds see the line on its own
+            if search(text[start:stripped]):
+                yield line_no, start, stripped
+            pos = end + 1
+            checked += 1
+            if checked >= _DENSE_MIN_LINES and line_no < checked * _DENSE_RATIO:
+                # the anchor is on most lines; plain line scanning is cheaper
+                yield from self._iter_split(text, pos, line_no + 1)
+                return
+
+    def _iter_split(self, text: str, offset: int, line_no: int) -> Iterator[Tuple[int, int, int]]:
+        """Per-line regex search of ``text[offset:]`` (no prefilter)."""
+        search = self.regex.search
+        lines = text[offset:].split("\n")
+        if lines and not lines[-1]:
+            lines.pop()  # text ends with a newline
+        start = offset
+        for n, raw in enumerate(lines, line_no):
+            line = raw[:-1] if raw.endswith("\r") else raw
+            if search(line):
+                yield n, start, start + len(line)
+            start += len(raw) + 1
+
+
+def line_context(text: str, start: int, end: int, line_no: int, context_lines: int) -> List[Tuple[int, str]]:
+    """Return ``(line_no, line)`` pairs around the line spanning ``text[start:end]``."""
+    before: List[Tuple[int, str]] = []
+    pos = start
+    for n in range(1, context_lines + 1):
+        if pos == 0:
+            break
+        prev_start = text.rfind("\n", 0, pos - 1) + 1
+        before.append((line_no - n, text[prev_start:pos - 1].rstrip("\r")))
+        pos = prev_start
+    window = before[::-1]
+    window.append((line_no, text[start:end]))
+    pos = text.find("\n", end)
+    for n in range(1, context_lines + 1):
+        if pos < 0:
+            break
+        nxt = text.find("\n", pos + 1)
+        line = text[pos + 1:] if nxt < 0 else text[pos + 1:nxt]
+        if nxt < 0 and not line:
+            break  # trailing newline, no further line
+        window.append((line_no + n, line.rstrip("\r")))
+        pos = nxt
+    return window
+
+
+@lru_cache(maxsize=64)
+def get_matcher(pattern: str, flags: int = 0) -> LineMatcher:
+    """Return a cached matcher so workers do not re-parse the pattern per file."""
+    return LineMatcher(pattern, flags)
@@ -0,0 +1,179 @@
+"""
+Compact write proposals for the pending-write queue.
+
+A proposal keeps line hunks against its base file, not the full new
+content, plus the sha1 of the base file's bytes. Payloads (hunks and the
+diff preview) larger than ``SPILL_CHARS`` are written to
+``<root>/.deepagents/proposals/`` and only loaded when the proposal is shown
+or applied, so a large bulk edit holds little in memory.
+
+When a proposal is applied the base is read again and its hash compared.
+If the file was edited after the proposal was made, ``StaleProposalError``
+is raised instead of overwriting the newer content. Proposals created
+without a diff (bulk edits) render it from the base only when shown.
+"""
+from __future__ import annotations
+
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from . import config
+from .content_cache import content_cache
+from .diff_engine import opcodes, unified_diff
+from .journal import content_hash
+
+PROPOSALS_DIRNAME = os.path.join(config.STATE_DIRNAME, "proposals")
+SPILL_CHARS = 64 * 1024
+# spilled payloads older than this are left over from earlier sessions
+ORPHAN_AGE_SECONDS = 7 * 24 * 3600
+
+# (first base line, end base line, replacement lines), 0-based half-open
+Hunk = Tuple[int, int, List[str]]
+
+
+class StaleProposalError(RuntimeError):
+    """The proposal's base file changed after the proposal was made."""
+
+
+def make_hunks(old_lines: List[str], new_lines: List[str]) -> List[Hunk]:
+    """Line hunks turning ``old_lines`` into ``new_lines``."""
+    codes, _ = opcodes(old_lines, new_lines)
+    return [(i1, i2, new_lines[j1:j2]) for tag, i1, i2, j1, j2 in codes if tag != "equal"]
+
+
+def apply_hunks(old_lines: List[str], hunks: List[Hunk]) -> List[str]:
+    out: List[str] = []
+    pos = 0
+    for i1, i2, lines in hunks:
+        out.extend(old_lines[pos:i1])
+        out.extend(lines)
+        pos = i2
+    out.extend(old_lines[pos:])
+    return out
+
+
+def render_diff(path: str | os.PathLike[str], old_text: str, new_text: str) -> str:
+    """Unified diff preview of a proposed change to ``path`` (capped; see ``diff_engine``)."""
+    return unified_diff(
+        old_text.splitlines(keepends=True),
+        new_text.splitlines(keepends=True),
+        fromfile=str(path),
+        tofile=f"{path} (proposed)",
+    )
+
+
+def read_base(path: str | os.PathLike[str], populate: bool = True) -> Tuple[Optional[str], str]:
+    """Return ``(base_hash, text)`` for a proposal's base; ``(None, "")`` if it does not exist.
+
+    The text is decoded like the read tools do (UTF-8, replacement
+    characters, universal newlines).
+    """
+    try:
+        data = content_cache.read_bytes(path, populate=populate)
+        text = content_cache.read_text(path, errors="replace", populate=populate)
+    except FileNotFoundError:
+        return None, ""
+    return content_hash(data), text
+
+
+@dataclass
+class Proposal:
+    path: str
+    base_hash: Optional[str]  # None if the file did not exist
+    added: int = 0
+    removed: int = 0
+    _hunks: Optional[List[Hunk]] = field(default=None, repr=False)
+    _diff: Optional[str] = field(default=None, repr=False)
+    spill_path: Optional[str] = None
+
+    @classmethod
+    def create(cls, path: str, base_hash: Optional[str], old_text: str, new_text: str,
+               diff: Optional[str] = None, spill_dir: Optional[str | os.PathLike[str]] = None) -> "Proposal":
+        """Build a proposal; with ``diff=None`` the preview is rendered on demand."""
+        hunks = make_hunks(old_text.splitlines(keepends=True), new_text.splitlines(keepends=True))
+        proposal = cls(path, base_hash,
+                       added=sum(len(lines) for _, _, lines in hunks),
+                       removed=sum(i2 - i1 for i1, i2, _ in hunks))
+        size = len(diff or "") + sum(len(line) for _, _, lines in hunks for line in lines)
+        if spill_dir is not None and size > SPILL_CHARS:
+            proposal.spill_path = _spill(Path(spill_dir), {"hunks": hunks, "diff": diff})
+        else:
+            proposal._hunks, proposal._diff = hunks, diff
+        return proposal
+
+    def _payload(self) -> Tuple[List[Hunk], Optional[str]]:
+        if self.spill_path is None:
+            return self._hunks or [], self._diff
+        with open(self.spill_path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        return [(i1, i2, lines) for i1, i2, lines in payload["hunks"]], payload["diff"]
+
+    @property
+    def diff(self) -> str:
+        diff = self._payload()[1]
+        if diff is not None:
+            return diff
+        try:
+            old_text, new_text = self._rebuild()
+        except StaleProposalError as e:
+            return f"({e})"
+        return render_diff(self.path, old_text, new_text)
+
+    def _rebuild(self) -> Tuple[str, str]:
+        base_hash, old_text = read_base(self.path)
+        if base_hash != self.base_hash:
+            state = "was deleted" if base_hash is None else "was created" if self.base_hash is None \
+                else "changed"
+            raise StaleProposalError(f"{self.path} {state} since the proposal was made; propose again")
+        hunks, _ = self._payload()
+        return old_text, "".join(apply_hunks(old_text.splitlines(keepends=True), hunks))
+
+    def new_content(self) -> str:
+        """Rebuild the proposed content; raises StaleProposalError if the base changed."""
+        return self._rebuild()[1]
+
+    def discard(self) -> None:
+        """Remove the on-disk payload, if any."""
+        if self.spill_path is not None:
+            try:
+                os.unlink(self.spill_path)
+            except OSError:
+                pass
+            self.spill_path = None
+
+    def summary(self) -> dict:
+        return {"path": self.path, "base_hash": self.base_hash, "added": self.added, "removed": self.removed}
+
+
+def proposals_dir(root: str | os.PathLike[str]) -> Path:
+    return Path(root) / PROPOSALS_DIRNAME
+
+
+_PURGED = set()
+
+
+def _purge_orphans(directory: Path) -> None:
+    cutoff = time.time() - ORPHAN_AGE_SECONDS
+    for entry in os.scandir(directory):
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+        except OSError:
+            pass
+
+
+def _spill(directory: Path, payload: dict) -> str:
+    if not directory.exists():
+        config.make_state_dir(directory)
+    elif str(directory) not in _PURGED:
+        _purge_orphans(directory)
+    _PURGED.add(str(directory))
+    path = directory / f"{uuid.uuid4().hex}.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f)
+    return str(path)
@@ -0,0 +1,85 @@
+"""
+Session cache for repeated search queries.
+
+Formatted results are kept in a small LRU keyed by the tool name and its
+query arguments (query, globs, case flag, root). Each entry records what it
+depends on: ``(mtime_ns, size)`` fingerprints of files or directories, and
+optionally an opaque version. The search tools use the trigram index's
+change counter, checked after an incremental index refresh, so an edit to
+any file (including one that did not match before) invalidates their
+entries. A lookup re-stats the fingerprinted paths, which needs no directory
+walk, and drops the entry if anything changed. Writes made through
+``atomic_write`` clear the cache outright.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from .logging import log
+
+Fingerprint = Optional[Tuple[int, int]]
+
+
+def fingerprint(path: str | os.PathLike[str] | os.DirEntry) -> Fingerprint:
+    """Return ``(mtime_ns, size)`` for a path or DirEntry, or None if it is missing."""
+    try:
+        st = path.stat() if isinstance(path, os.DirEntry) else os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+@dataclass
+class _Entry:
+    result: str
+    fingerprints: Dict[str, Fingerprint] = field(default_factory=dict)
+    version: Any = None
+
+
+class QueryCache:
+    """LRU of formatted search results, validated against file fingerprints."""
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: Any = None) -> Optional[str]:
+        """Return the cached result for ``key`` if nothing it depends on changed."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry.version == version and all(
+                fingerprint(path) == fp for path, fp in entry.fingerprints.items()):
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                self.hits += 1
+            log(f"query_cache: hit {key!r}")
+            return entry.result
+        with self._lock:
+            if entry is not None:
+                self._entries.pop(key, None)
+            self.misses += 1
+        return None
+
+    def put(self, key: Hashable, result: str, fingerprints: Optional[Dict[str, Fingerprint]] = None,
+            version: Any = None) -> None:
+        """Store ``result``; ``fingerprints`` maps each path it depends on to ``fingerprint(path)``."""
+        with self._lock:
+            self._entries[key] = _Entry(result, dict(fingerprints or {}), version)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+query_cache = QueryCache()
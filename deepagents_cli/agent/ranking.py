@@ -0,0 +1,181 @@
+"""
+BM25 ranking over an inverted token index for the search tools.
+
+Files are split into lowercase identifier tokens. ``fooBar_baz`` yields
+``foobar_baz``, ``foo``, ``bar`` and ``baz``, so natural-language queries
+match code identifiers. The index follows the trigram index's file list, so
+it never walks the tree itself, and it re-tokenizes only files whose size
+or mtime changed. Scores are standard BM25 plus boosts for query terms that
+appear in the file's base name or in a name the file defines (``def``,
+``class``, ``function`` and so on).
+"""
+from __future__ import annotations
+
+import math
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, FrozenSet, List, Optional, Set
+
+from . import config
+from .content_cache import content_cache
+from .logging import log
+from .search_index import get_index
+
+# BM25 parameters (the usual defaults)
+K1 = 1.2
+B = 0.75
+# added per matching query term, scaled by the term's idf
+FILENAME_BOOST = 2.0
+SYMBOL_BOOST = 1.5
+
+_WORD_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|[0-9]+")
+_CAMEL_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+_DEFINITION_RE = re.compile(
+    r"\b(?:def|class|function|interface|type|struct|enum|fn|func|const|let|var)\s+\*?\s*([A-Za-z_$][\w$]*)"
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Split ``text`` into lowercase tokens, adding the parts of compound identifiers."""
+    out: List[str] = []
+    for word in _WORD_RE.findall(text):
+        out.append(word.lower())
+        parts = [p.lower() for chunk in word.split("_") for p in _CAMEL_RE.findall(chunk)]
+        if len(parts) > 1:
+            out.extend(parts)
+    return out
+
+
+@dataclass
+class _Doc:
+    size: int
+    mtime_ns: int
+    length: int
+    terms: FrozenSet[str]
+    name_terms: FrozenSet[str] = field(default_factory=frozenset)
+    symbol_terms: FrozenSet[str] = field(default_factory=frozenset)
+
+
+@dataclass
+class RankedFile:
+    path: Path
+    score: float
+
+
+class TokenIndex:
+    """In-memory inverted index (term -> {file: term frequency}) for one root."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root).resolve()
+        self._docs: Dict[str, _Doc] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def _drop(self, rel: str) -> None:
+        doc = self._docs.pop(rel, None)
+        if doc is None:
+            return
+        self._total_length -= doc.length
+        for term in doc.terms:
+            files = self._postings.get(term)
+            if files is not None:
+                files.pop(rel, None)
+                if not files:
+                    del self._postings[term]
+
+    def _add(self, rel: str, size: int, mtime_ns: int) -> None:
+        try:
+            # decoded with the sniffed encoding; a bulk pass does not populate the cache
+            text = content_cache.read_decoded(self.root / rel, errors="ignore", populate=False)
+        except (OSError, ValueError):
+            return
+        if text is None:
+            return
+        tokens = tokenize(text)
+        terms = Counter(tokens)
+        symbols = frozenset(t for name in _DEFINITION_RE.findall(text) for t in tokenize(name))
+        name_terms = frozenset(tokenize(os.path.basename(rel)))
+        doc = _Doc(size, mtime_ns, len(tokens), frozenset(terms), name_terms, symbols)
+        self._docs[rel] = doc
+        self._total_length += doc.length
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[rel] = tf
+
+    def sync(self, refresh: bool = True) -> None:
+        """Bring the token index in line with the trigram index's file list.
+
+        Pass refresh=False if the caller has just refreshed the trigram index.
+        """
+        files = get_index(self.root).text_files(refresh)
+        with self._lock:
+            changed = 0
+            for rel in [r for r in self._docs if r not in files]:
+                self._drop(rel)
+                changed += 1
+            for rel, (size, mtime_ns) in files.items():
+                doc = self._docs.get(rel)
+                if doc is not None and doc.size == size and doc.mtime_ns == mtime_ns:
+                    continue
+                self._drop(rel)
+                self._add(rel, size, mtime_ns)
+                changed += 1
+            if changed:
+                log(f"ranking: {len(self._docs)} files, {changed} re-tokenized")
+
+    def rank(self, query: str, top_k: int = 10,
+             accept: Optional[Callable[[str], bool]] = None, refresh: bool = True) -> List[RankedFile]:
+        """Return the ``top_k`` files by BM25 score for ``query``.
+
+        - accept: optional filter on the file's root-relative path
+        - refresh: False if the caller has just refreshed the trigram index
+        Only files containing at least one query term are scored.
+        """
+        self.sync(refresh)
+        terms: Set[str] = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._docs)
+            if not terms or not n_docs:
+                return []
+            avg_len = self._total_length / n_docs or 1.0
+            scores: Dict[str, float] = {}
+            for term in terms:
+                files = self._postings.get(term)
+                if not files:
+                    continue
+                idf = math.log(1 + (n_docs - len(files) + 0.5) / (len(files) + 0.5))
+                for rel, tf in files.items():
+                    doc = self._docs[rel]
+                    norm = tf * (K1 + 1) / (tf + K1 * (1 - B + B * doc.length / avg_len))
+                    score = idf * norm
+                    if term in doc.name_terms:
+                        score += FILENAME_BOOST * idf
+                    if term in doc.symbol_terms:
+                        score += SYMBOL_BOOST * idf
+                    scores[rel] = scores.get(rel, 0.0) + score
+        ranked = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))
+        out: List[RankedFile] = []
+        for rel, score in ranked:
+            if accept is None or accept(rel):
+                out.append(RankedFile(self.root / rel, score))
+                if len(out) >= top_k:
+                    break
+        return out
+
+
+_TOKEN_INDEXES: Dict[Path, TokenIndex] = {}
+_TOKEN_INDEXES_LOCK = threading.Lock()
+
+
+def get_token_index(root: Optional[Path] = None) -> TokenIndex:
+    """Return the shared token index for ``root`` (defaults to config.FS_ROOT)."""
+    root = Path(root or config.FS_ROOT).resolve()
+    with _TOKEN_INDEXES_LOCK:
+        index = _TOKEN_INDEXES.get(root)
+        if index is None:
+            index = _TOKEN_INDEXES[root] = TokenIndex(root)
+        return index
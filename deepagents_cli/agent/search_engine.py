@@ -0,0 +1,504 @@
+"""
+Shared parallel search engine for the grep-style tools.
+
+Candidate files are read and scanned on a thread pool shared by all
+searches while results are collected in submission order, so output is
+deterministic regardless of which worker finishes first. Threads overlap
+file I/O, but ``re`` holds the GIL while matching, so a scan that reaches
+``PROCESS_MIN_FILES`` files moves the rest to a shared process pool and
+matches on every core. The pool's workers are started with forkserver (or
+spawn), never forked from this threaded process, and a batch that does not
+come back within ``PROCESS_RESULT_TIMEOUT`` is rescanned on threads. Once
+``max_matches`` hits have been collected the remaining queued work is
+cancelled. ``SearchStream`` exposes the same scan incrementally, and
+``open_cursor`` parks one so the next page can be fetched later without
+rescanning.
+"""
+from __future__ import annotations
+
+import mmap
+import multiprocessing
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .content_cache import content_cache
+from .file_kind import file_kind
+from .logging import log
+from .matcher import LineMatcher, get_matcher, line_context
+
+# Files at least this large are scanned through mmap in newline-aligned chunks;
+# in chunks that pass the byte-level literal prefilter only the lines holding
+# the pattern's longest literal are decoded.
+MMAP_MIN_BYTES = 4 * 1024 * 1024
+_MMAP_CHUNK_BYTES = 1024 * 1024
+# once the literal has been on more than 1 in _MMAP_DENSE_RATIO of a chunk's
+# first lines, the rest of the chunk is decoded whole and split instead
+_MMAP_DENSE_LINES = 64
+_MMAP_DENSE_RATIO = 4
+# UTF-16/32 files cannot be chunked on newline bytes; larger ones are skipped
+# rather than decoded whole
+MAX_DECODED_BYTES = 64 * 1024 * 1024
+# by default a stream moves to the process pool after queueing this many files,
+# which outweighs the pool's one-time startup and per-task pickling
+PROCESS_MIN_FILES = 2000
+# files per process task
+_PROCESS_BATCH = 64
+# seconds to wait for one process task before rescanning its files on threads
+PROCESS_RESULT_TIMEOUT = 60.0
+
+# Per-file scan result: (hits, was_searched); each hit is (line_no, line, context)
+_Hit = Tuple[int, str, List[Tuple[int, str]]]
+_ScanResult = Tuple[List[_Hit], bool]
+
+
+@dataclass
+class SearchHit:
+    """One matching line, with its surrounding context lines."""
+    path: Path
+    line_no: int
+    line: str
+    context: List[Tuple[int, str]] = field(default_factory=list)
+
+
+@dataclass
+class SearchResult:
+    """Hits in input-file order plus the number of files actually scanned."""
+    hits: List[SearchHit]
+    files_searched: int
+    truncated: bool = False
+
+
+def default_workers() -> int:
+    """Worker count for I/O-bound scanning, matching ThreadPoolExecutor's default."""
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+class _LineCounter:
+    """Line numbers of increasing offsets into a buffer, counted only as far as asked."""
+
+    def __init__(self, buf):
+        self.buf = buf
+        self.offset = 0
+        self.line_no = 1
+
+    def at(self, offset: int) -> int:
+        # mmap has no count(), so newlines are counted in copies of at most one chunk
+        while self.offset < offset:
+            stop = min(self.offset + _MMAP_CHUNK_BYTES, offset)
+            self.line_no += self.buf[self.offset:stop].count(b"\n")
+            self.offset = stop
+        return self.line_no
+
+
+def _widen(buf, start: int, end: int, context_lines: int) -> Tuple[int, int]:
+    """Extend the whole lines ``buf[start:end]`` by ``context_lines`` lines on each side."""
+    size = len(buf)
+    for _ in range(context_lines):
+        if start > 0:
+            start = buf.rfind(b"\n", 0, start - 1) + 1
+        if end < size:
+            nl = buf.find(b"\n", end)
+            end = size if nl < 0 else nl + 1
+    return start, end
+
+
+def _decoded_hits(buf, matcher: LineMatcher, start: int, end: int, line_no: int,
+                  context_lines: int, errors: str, encoding: str) -> Iterator[_Hit]:
+    """Hits in the whole lines ``buf[start:end]``, which begin at ``line_no``, decoded in one piece."""
+    pre, post = _widen(buf, start, end, context_lines)
+    prefix = buf[pre:start].decode(encoding, errors)
+    core = buf[start:end].decode(encoding, errors)
+    text = prefix + core + buf[end:post].decode(encoding, errors)
+    first_line = line_no - prefix.count("\n")
+    lo, hi = len(prefix), len(prefix) + len(core)
+    for n, s, e in matcher.iter_lines(text):
+        if s < lo:
+            continue
+        if s >= hi:
+            break
+        context = [(first_line + k - 1, line) for k, line in line_context(text, s, e, n, context_lines)]
+        yield first_line + n - 1, text[s:e], context
+
+
+def _anchored_hits(buf, matcher: LineMatcher, anchor: Tuple[bytes, Optional[re.Pattern]],
+                   start: int, end: int, lines: _LineCounter, context_lines: int,
+                   errors: str, encoding: str) -> Iterator[_Hit]:
+    """Hits in the whole lines ``buf[start:end]``, decoding only the lines that hold ``anchor``."""
+    raw, regex = anchor
+    search = matcher.regex.search
+    first_line = lines.at(start)
+    pos, checked = start, 0
+    while pos < end:
+        if regex is None:
+            found = buf.find(raw, pos, end)
+        else:
+            m = regex.search(buf, pos, end)
+            found = -1 if m is None else m.start()
+        if found < 0:
+            return
+        nl = buf.rfind(b"\n", pos, found)
+        line_start = pos if nl < 0 else nl + 1
+        nl = buf.find(b"\n", found, end)
+        line_end = end if nl < 0 else nl + 1
+        decoded = buf[line_start:line_end].decode(encoding, errors)
+        line = decoded[:-1] if decoded.endswith("\n") else decoded
+        if line.endswith("\r"):
+            line = line[:-1]
+        # search the line on its own so ^, $ and lookarounds see only it
+        if search(line):
+            line_no = lines.at(line_start)
+            pre, post = _widen(buf, line_start, line_end, context_lines)
+            prefix = buf[pre:line_start].decode(encoding, errors)
+            text = prefix + decoded + buf[line_end:post].decode(encoding, errors)
+            yield line_no, line, line_context(text, len(prefix), len(prefix) + len(line), line_no, context_lines)
+        pos = line_end
+        checked += 1
+        if checked == _MMAP_DENSE_LINES and lines.at(pos) - first_line < checked * _MMAP_DENSE_RATIO:
+            yield from _decoded_hits(buf, matcher, pos, end, lines.at(pos), context_lines, errors, encoding)
+            return
+
+
+def _scan_mmap(path: str, matcher: LineMatcher, context_lines: int,
+               max_hits: Optional[int], errors: str, encoding: str = "utf-8") -> list:
+    """Scan a large file through mmap without decoding or copying it whole.
+
+    ``encoding`` must be ASCII-compatible (UTF-8 or a single-byte codec) so
+    lines can be cut at newline bytes and decoded independently. Without a
+    literal to anchor on, chunks that pass the prefilter are decoded whole.
+    """
+    hits: list = []
+    anchor = matcher.byte_anchor(encoding)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        size = len(buf)
+        lines = _LineCounter(buf)
+        pos = 0
+        while pos < size:
+            end = min(pos + _MMAP_CHUNK_BYTES, size)
+            if end < size:
+                nl = buf.rfind(b"\n", pos, end)
+                if nl < 0:  # a single line longer than the chunk
+                    nl = buf.find(b"\n", end)
+                end = size if nl < 0 else nl + 1
+            if matcher.may_match_bytes(buf, pos, end, encoding):
+                if anchor is None:
+                    found = _decoded_hits(buf, matcher, pos, end, lines.at(pos), context_lines, errors, encoding)
+                else:
+                    found = _anchored_hits(buf, matcher, anchor, pos, end, lines, context_lines, errors, encoding)
+                for hit in found:
+                    hits.append(hit)
+                    if max_hits is not None and len(hits) >= max_hits:
+                        return hits
+            pos = end
+    return hits
+
+
+def _scan_file(path: str, pattern: str, flags: int, context_lines: int,
+               max_hits: Optional[int], max_bytes: Optional[int], errors: str) -> _ScanResult:
+    """Scan one file. Top-level so it can run in a process pool."""
+    matcher = get_matcher(pattern, flags)
+    try:
+        st = os.stat(path)
+        if max_bytes is not None and st.st_size > max_bytes:
+            return [], False
+        if st.st_size >= MMAP_MIN_BYTES:
+            kind = file_kind(path, st=st)
+            if kind.binary:
+                return [], False
+            if kind.ascii_compatible:
+                return _scan_mmap(path, matcher, context_lines, max_hits, errors, kind.encoding), True
+            if st.st_size > MAX_DECODED_BYTES:
+                return [], False
+        # hot files come from the shared cache; a bulk scan does not populate it.
+        # Binaries are skipped and text is decoded once with its sniffed encoding.
+        text = content_cache.read_decoded(path, errors, populate=False)
+        if text is None:
+            return [], False
+    except (OSError, UnicodeDecodeError, ValueError):
+        return [], False
+    hits = []
+    # only lines around literal hits are ever cut out of the buffer
+    for line_no, start, end in matcher.iter_lines(text):
+        hits.append((line_no, text[start:end], line_context(text, start, end, line_no, context_lines)))
+        if max_hits is not None and len(hits) >= max_hits:
+            break
+    return hits, True
+
+
+def _scan_batch(paths: List[str], *args: Any) -> List[_ScanResult]:
+    return [_scan_file(path, *args) for path in paths]
+
+
+_SHARED_POOL: Optional[ThreadPoolExecutor] = None
+_PROCESS_POOL: Optional[ProcessPoolExecutor] = None
+_SHARED_POOL_LOCK = threading.Lock()
+
+
+def _shared_pool() -> ThreadPoolExecutor:
+    """One thread pool for every threaded stream, so open searches never multiply threads."""
+    global _SHARED_POOL
+    with _SHARED_POOL_LOCK:
+        if _SHARED_POOL is None:
+            _SHARED_POOL = ThreadPoolExecutor(max_workers=default_workers(), thread_name_prefix="search")
+        return _SHARED_POOL
+
+
+def _process_pool() -> ProcessPoolExecutor:
+    """One process pool, one worker per core, started by the first stream that needs it."""
+    global _PROCESS_POOL
+    with _SHARED_POOL_LOCK:
+        if _PROCESS_POOL is None:
+            # forking a process that runs other threads can copy their locks held into the child
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            _PROCESS_POOL = ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=context)
+        return _PROCESS_POOL
+
+
+def _drop_process_pool(pool: ProcessPoolExecutor) -> None:
+    """Forget a broken process pool so the next stream starts a new one."""
+    global _PROCESS_POOL
+    with _SHARED_POOL_LOCK:
+        if _PROCESS_POOL is pool:
+            _PROCESS_POOL = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+class SearchStream:
+    """Incremental parallel search yielding ``SearchHit`` objects in input-file order.
+
+    Files are scanned with bounded read-ahead, so the first hits are
+    available as soon as the first files are scanned and the scan can be
+    paused between pages without holding the full result set. Threaded
+    streams share one pool; ``park`` cancels queued read-ahead while a
+    stream waits for its next page. Call ``close`` (or use as a context
+    manager) to stop outstanding work.
+
+    ``use_processes``: None (default) switches to the shared process pool
+    once ``PROCESS_MIN_FILES`` files are queued on a multi-core machine,
+    True uses it from the start, False keeps to threads.
+    """
+
+    def __init__(self, files: Iterable[Path], pattern: str, flags: int = 0, context_lines: int = 0,
+                 max_per_file: Optional[int] = None, max_file_bytes: Optional[int] = None,
+                 errors: str = "ignore", workers: Optional[int] = None, use_processes: Optional[bool] = None):
+        re.compile(pattern, flags)  # surface re.error in the caller's thread
+        self.pattern = pattern
+        self.files_searched = 0
+        self._args = (pattern, flags, context_lines, max_per_file, max_file_bytes, errors)
+        self._workers = workers or default_workers()
+        # bounded read-ahead (in tasks) keeps memory flat and lets early exit skip most work
+        self._read_ahead = self._workers * 4
+        self._auto_processes = use_processes is None and (os.cpu_count() or 1) > 1
+        self._processes: Optional[ProcessPoolExecutor] = _process_pool() if use_processes else None
+        self._queued = 0
+        self._closed = False
+        # (paths, future, submitted to the process pool)
+        self._pending: Deque[Tuple[List[Path], Future, bool]] = deque()
+        self._ready: Deque[SearchHit] = deque()
+        self._files = iter(files)
+        self._peeked: Optional[Path] = None
+        self._parked = False
+        self._lock = threading.Lock()
+        self._top_up()
+
+    def _next_path(self) -> Optional[Path]:
+        if self._peeked is not None:
+            path, self._peeked = self._peeked, None
+            return path
+        for path in self._files:
+            return Path(path)
+        return None
+
+    def _submit(self, paths: List[Path]) -> Tuple[List[Path], Future, bool]:
+        names = [str(path) for path in paths]
+        if self._processes is not None:
+            try:
+                return paths, self._processes.submit(_scan_batch, names, *self._args), True
+            except BrokenProcessPool as e:
+                self._lose_processes(e)
+        return paths, _shared_pool().submit(_scan_batch, names, *self._args), False
+
+    def _lose_processes(self, error: BaseException) -> None:
+        log(f"search_engine: process pool failed, continuing on threads: {error}")
+        if self._processes is not None:
+            _drop_process_pool(self._processes)
+        self._processes = None
+        self._auto_processes = False
+
+    def _top_up(self) -> None:
+        """Queue files until the read-ahead window is full."""
+        if self._closed:
+            return
+        if self._parked:
+            # resubmit, in place, the scans park() cancelled
+            self._parked = False
+            for i in range(len(self._pending)):
+                paths, fut, _ = self._pending[i]
+                if fut.cancelled():
+                    self._pending[i] = self._submit(paths)
+        while len(self._pending) < self._read_ahead:
+            if self._auto_processes and self._queued >= PROCESS_MIN_FILES:
+                self._auto_processes = False
+                self._processes = _process_pool()
+            batch: List[Path] = []
+            while len(batch) < (_PROCESS_BATCH if self._processes is not None else 1):
+                path = self._next_path()
+                if path is None:
+                    break
+                batch.append(path)
+            if not batch:
+                break
+            self._queued += len(batch)
+            self._pending.append(self._submit(batch))
+
+    def _fill(self) -> bool:
+        """Collect the next task's hits into the ready queue; False when exhausted."""
+        while not self._ready:
+            self._top_up()
+            if not self._pending:
+                self.close()
+                return False
+            paths, fut, in_process = self._pending.popleft()
+            try:
+                results = fut.result(timeout=PROCESS_RESULT_TIMEOUT if in_process else None)
+            except BrokenProcessPool as e:
+                self._lose_processes(e)
+                results = _scan_batch([str(path) for path in paths], *self._args)
+            except FutureTimeout:
+                fut.cancel()
+                self._lose_processes(TimeoutError(f"no result within {PROCESS_RESULT_TIMEOUT}s"))
+                results = _scan_batch([str(path) for path in paths], *self._args)
+            except CancelledError:
+                # queued on a process pool that was dropped after another batch failed
+                results = _scan_batch([str(path) for path in paths], *self._args)
+            for path, (file_hits, was_searched) in zip(paths, results):
+                self.files_searched += was_searched
+                for line_no, line, context in file_hits:
+                    self._ready.append(SearchHit(path, line_no, line, context))
+        return True
+
+    def __iter__(self) -> "SearchStream":
+        return self
+
+    def __next__(self) -> SearchHit:
+        with self._lock:
+            if not self._fill():
+                raise StopIteration
+            return self._ready.popleft()
+
+    def take(self, limit: Optional[int] = None) -> List[SearchHit]:
+        """Return up to ``limit`` more hits (all remaining when None)."""
+        out: List[SearchHit] = []
+        with self._lock:
+            while (limit is None or len(out) < limit) and self._fill():
+                while self._ready and (limit is None or len(out) < limit):
+                    out.append(self._ready.popleft())
+        return out
+
+    def more(self) -> bool:
+        """True if hits may remain: buffered hits, queued files, or unread input.
+
+        Does not wait for queued scans, so it can be True for a search that
+        turns out to have no further hits.
+        """
+        with self._lock:
+            if self._ready or self._pending:
+                return True
+            if self._closed:
+                return False
+            self._peeked = self._next_path()
+            return self._peeked is not None
+
+    def park(self) -> None:
+        """Cancel queued scans that have not started; the next ``take`` requeues them.
+
+        Scans already running finish and keep their results, so a parked
+        stream holds at most one read-ahead window and uses no workers.
+        """
+        with self._lock:
+            for _, fut, _ in self._pending:
+                fut.cancel()
+            self._parked = True
+
+    def close(self) -> None:
+        if getattr(self, "_closed", True):  # unset if __init__ raised
+            return
+        self._closed = True
+        for _, fut, _ in self._pending:
+            fut.cancel()
+        self._pending.clear()
+
+    def __enter__(self) -> "SearchStream":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __del__(self) -> None:
+        self.close()
+
+
+def search_files(files: Iterable[Path], pattern: str, flags: int = 0, context_lines: int = 0,
+                 max_matches: Optional[int] = None, max_per_file: Optional[int] = None,
+                 max_file_bytes: Optional[int] = None, errors: str = "ignore",
+                 workers: Optional[int] = None, use_processes: Optional[bool] = None) -> SearchResult:
+    """Search ``files`` for the regex ``pattern`` in parallel.
+
+    - Results keep the order of ``files``; ``files`` may be a lazy iterator.
+    - max_matches: stop and cancel outstanding work once this many hits are found
+    - max_per_file: stop scanning a file after this many hits (1 = first hit only)
+    - max_file_bytes: skip larger files (they do not count as searched)
+    - use_processes: None moves large scans to the process pool, True always
+      uses it, False keeps to threads (see ``SearchStream``)
+    """
+    with SearchStream(files, pattern, flags, context_lines, max_per_file, max_file_bytes,
+                      errors, workers, use_processes) as stream:
+        hits = stream.take(max_matches)
+        truncated = max_matches is not None and stream.more()
+        searched = stream.files_searched
+    log(f"search_engine: pattern={pattern!r} hits={len(hits)} files_searched={searched} truncated={truncated}")
+    return SearchResult(hits, searched, truncated)
+
+
+# --- Resumable cursors ---
+# Paused searches are kept per session so a caller can fetch the next page
+# without rescanning; the least recently used ones are closed past the limit.
+MAX_OPEN_CURSORS = 16
+_CURSORS: "OrderedDict[str, Tuple[SearchStream, Dict[str, Any]]]" = OrderedDict()
+_CURSORS_LOCK = threading.Lock()
+
+
+def open_cursor(stream: SearchStream, **state: Any) -> str:
+    """Park ``stream`` (plus caller ``state`` such as formatting options) and return its token."""
+    token = uuid.uuid4().hex[:12]
+    with _CURSORS_LOCK:
+        _CURSORS[token] = (stream, state)
+        while len(_CURSORS) > MAX_OPEN_CURSORS:
+            _, (old, _) = _CURSORS.popitem(last=False)
+            old.close()
+    return token
+
+
+def resume_cursor(token: str) -> Optional[Tuple[SearchStream, Dict[str, Any]]]:
+    """Return the stream and state parked under ``token``, or None if unknown or evicted."""
+    with _CURSORS_LOCK:
+        entry = _CURSORS.get(token.strip())
+        if entry is not None:
+            _CURSORS.move_to_end(token.strip())
+        return entry
+
+
+def close_cursor(token: str) -> None:
+    with _CURSORS_LOCK:
+        entry = _CURSORS.pop(token.strip(), None)
+    if entry is not None:
+        entry[0].close()
@@ -0,0 +1,646 @@
+"""
+Persistent trigram index for the code search tools.
+
+Every file under the indexed root is tokenized into lowercase byte trigrams,
+each packed into an int. The index lives in ``<root>/.deepagents/trigram_index.db``:
+a ``files`` table (integer id, relative path, size, mtime and the file's
+sorted trigrams) and a ``postings`` table mapping each trigram to the sorted
+ids of the files containing it. Only the file table's path, size and mtime
+are kept in memory; a query loads the postings of its own trigrams and
+intersects them, so search tools only run regexes on files that can
+possibly match instead of on the whole tree.
+
+The first query in a process stats the whole tree. Later queries refresh
+incrementally: only directories whose mtime changed are re-listed, and files
+are re-checked when reported by ``invalidate()`` or, for files git tracks, by
+``git status``. Indexed files git does not track (untracked, ignored, or in a
+nested repository or submodule) are re-stat'ed on every refresh. When a file
+changes, only the postings of trigrams it gained or lost are rewritten.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+from array import array
+from collections import defaultdict
+from pathlib import Path
+from typing import DefaultDict, Dict, Iterable, List, Optional, Set, Tuple
+
+from . import config
+from .file_kind import SNIFF_BYTES, sniff_bytes
+from .fs_walk import IgnoreRules, scan_dir
+from .logging import log
+
+INDEX_DIRNAME = config.STATE_DIRNAME
+INDEX_FILENAME = "trigram_index.db"
+INDEX_VERSION = 3
+
+# Files above this size are not tokenized; they are always returned as
+# candidates and the calling tool applies its own size policy.
+MAX_INDEXED_BYTES = 2 * 1024 * 1024
+
+# file kinds: tokenized text, nothing to tokenize (binary or under three
+# bytes, never a candidate), or not tokenized (always a candidate)
+_TEXT, _NO_GRAMS, _UNTOKENIZED = 1, 2, 0
+
+# path -> (file id, size, mtime_ns, kind)
+_Entry = Tuple[int, int, int, int]
+
+# trigrams and file ids are stored as little-endian uint32 arrays
+_BIG_ENDIAN = sys.byteorder == "big"
+# postings are read from sqlite this many trigrams per query
+_IN_BATCH = 500
+
+
+def _pack(values: Iterable[int]) -> bytes:
+    packed = array("I", sorted(values))
+    if _BIG_ENDIAN:
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack(blob: Optional[bytes]) -> array:
+    values = array("I")
+    if blob:
+        values.frombytes(blob)
+        if _BIG_ENDIAN:
+            values.byteswap()
+    return values
+
+
+def file_trigrams(data: bytes) -> Set[int]:
+    """Return the lowercase byte trigrams in ``data`` as ints (``int.from_bytes(gram, "little")``).
+
+    Binary files yield an empty set so they are never offered as search
+    candidates. UTF-16/32 text is transcoded to UTF-8 first.
+    """
+    kind = sniff_bytes(data[:SNIFF_BYTES], complete=len(data) <= SNIFF_BYTES)
+    if kind.binary:
+        return set()
+    if not kind.ascii_compatible:
+        data = data.decode(kind.encoding, "ignore").encode("utf-8")
+    data = data.lower()
+    n = len(data) - 2
+    if n <= 0:
+        return set()
+    # the 4-byte word at offset p holds the trigram at p in its low three bytes;
+    # reading the words at p = k, k + 4, ... for k in 0..3 visits every offset
+    padded = data + b"\0"
+    words: Set[int] = set()
+    for k in range(4):
+        count = len(range(k, n, 4))
+        if count:
+            chunk = array("I", padded[k:k + 4 * count])
+            if _BIG_ENDIAN:
+                chunk.byteswap()
+            words.update(chunk)
+    return {w & 0xFFFFFF for w in words}
+
+
+def query_trigrams(literal: str) -> Set[int]:
+    """Return the trigrams a file must contain to possibly match ``literal``.
+
+    Only pure-ASCII trigrams are used: they are encoding- and case-stable,
+    so narrowing never drops a file the full scan would have matched.
+    """
+    data = literal.encode("utf-8", errors="ignore").lower()
+    grams = set()
+    for i in range(len(data) - 2):
+        gram = data[i:i + 3]
+        if max(gram) < 0x80:
+            grams.add(int.from_bytes(gram, "little"))
+    return grams
+
+
+class TrigramIndex:
+    """Trigram index over the files below ``root``."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root).resolve()
+        self.db_path = self.root / INDEX_DIRNAME / INDEX_FILENAME
+        self._files: Dict[str, _Entry] = {}
+        self._paths: Dict[int, str] = {}
+        # postings changes not yet written: trigram -> file ids gained / lost
+        self._adds: DefaultDict[int, List[int]] = defaultdict(list)
+        self._removes: DefaultDict[int, Set[int]] = defaultdict(set)
+        self._unmerged: Set[int] = set()
+        self._changes = 0
+        # rel dir -> mtime_ns, plus the tree shape needed to rescan one directory
+        self._dirs: Dict[str, int] = {}
+        self._subdirs: Dict[str, Set[str]] = {}
+        self._dir_files: Dict[str, Set[str]] = {}
+        # files reported changed since the last refresh
+        self._pending: Set[str] = set()
+        # git state seen at the last refresh; _git_top is "" outside a work tree
+        self._git_top: Optional[str] = None
+        self._git_head: Optional[str] = None
+        self._git_dirty: Set[str] = set()
+        # files git tracks below root, cached by the stat of git's index file
+        self._git_index: Optional[Tuple[Path, Tuple[int, int, int]]] = None
+        self._git_tracked: Set[str] = set()
+        # rebuilt on every pass so new or edited .gitignore files take effect
+        self._rules = IgnoreRules(self.root)
+        # bumped whenever an indexed file is added, changed or removed
+        self.version = 0
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._synced = False
+
+    # --- persistence ---
+
+    def _open(self, path: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if not row or int(row[0]) != INDEX_VERSION:
+            conn.execute("DROP TABLE IF EXISTS files")
+            conn.execute("DROP TABLE IF EXISTS postings")
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(INDEX_VERSION),))
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                path TEXT NOT NULL UNIQUE,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                kind INTEGER NOT NULL,
+                grams BLOB
+            )
+        """)
+        conn.execute("CREATE TABLE IF NOT EXISTS postings (gram INTEGER PRIMARY KEY, ids BLOB NOT NULL)")
+        conn.commit()
+        return conn
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the on-disk index, or an in-memory one if it cannot be used."""
+        if self._conn is not None:
+            return self._conn
+        try:
+            if not self.db_path.parent.exists():
+                config.make_state_dir(self.db_path.parent)
+            self._conn = self._open(str(self.db_path))
+        except (OSError, sqlite3.Error) as e:
+            log(f"search_index: using a memory-only index, cannot open {self.db_path}: {e}")
+            self._conn = self._open(":memory:")
+        return self._conn
+
+    def _load(self) -> None:
+        conn = self._connect()
+        for file_id, path, size, mtime_ns, kind in conn.execute(
+                "SELECT id, path, size, mtime_ns, kind FROM files"):
+            self._add(path, (file_id, size, mtime_ns, kind))
+
+    def _reset(self, error: Exception) -> None:
+        """Fall back to a fresh in-memory index after a database error."""
+        log(f"search_index: rebuilding in memory after an error in {self.db_path}: {error}")
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+        self._conn = self._open(":memory:")
+        self._files.clear()
+        self._paths.clear()
+        self._dir_files.clear()
+        self._dirs.clear()
+        self._subdirs.clear()
+        self._adds.clear()
+        self._removes.clear()
+        self._unmerged.clear()
+        self._changes = 0
+        self._synced = False
+        self.version += 1
+
+    def _merge_postings(self) -> None:
+        """Write the trigrams gained and lost by changed files into ``postings``."""
+        if not self._adds and not self._removes:
+            return
+        conn = self._connect()
+        grams = sorted(set(self._adds) | set(self._removes))
+        rows = []
+        for i in range(0, len(grams), _IN_BATCH):
+            batch = grams[i:i + _IN_BATCH]
+            current = dict(conn.execute(
+                f"SELECT gram, ids FROM postings WHERE gram IN ({','.join('?' * len(batch))})", batch))
+            for gram in batch:
+                ids = _unpack(current.get(gram))
+                lost = self._removes.get(gram)
+                if lost:
+                    ids = [file_id for file_id in ids if file_id not in lost]
+                gained = self._adds.get(gram)
+                if gained:
+                    if not ids or min(gained) > ids[-1]:
+                        ids = list(ids) + sorted(gained)
+                    else:
+                        ids = sorted(set(ids).union(gained))
+                rows.append((gram, _pack(ids) if len(ids) else None))
+        conn.executemany("DELETE FROM postings WHERE gram = ?", [(g,) for g, blob in rows if blob is None])
+        conn.executemany("INSERT OR REPLACE INTO postings VALUES (?, ?)", [r for r in rows if r[1] is not None])
+        self._adds.clear()
+        self._removes.clear()
+        self._unmerged.clear()
+
+    def save(self) -> None:
+        """Write pending changes to disk. A database error switches to a memory-only index."""
+        with self._lock:
+            if self._conn is None or (not self._changes and not self._adds and not self._removes):
+                return
+            try:
+                self._merge_postings()
+                self._conn.commit()
+            except sqlite3.Error as e:
+                self._reset(e)
+                return
+            self._changes = 0
+
+    # --- maintenance ---
+
+    @staticmethod
+    def _parent(rel: str) -> str:
+        return rel.rpartition("/")[0]
+
+    def _add(self, rel: str, entry: _Entry) -> None:
+        self._files[rel] = entry
+        self._paths[entry[0]] = rel
+        self._dir_files.setdefault(self._parent(rel), set()).add(rel)
+
+    def _drop(self, rel: str) -> None:
+        entry = self._files.pop(rel, None)
+        if entry is None:
+            return
+        if self._paths.get(entry[0]) == rel:
+            del self._paths[entry[0]]
+        self._dir_files.get(self._parent(rel), set()).discard(rel)
+
+    def _stage(self, file_id: int, old: Set[int], new: Set[int]) -> None:
+        # a file changed twice before a merge: flush first so gains and losses stay ordered
+        if file_id in self._unmerged:
+            self._merge_postings()
+        self._unmerged.add(file_id)
+        adds = self._adds
+        for gram in new - old if old else new:
+            adds[gram].append(file_id)
+        for gram in old - new:
+            self._removes[gram].add(file_id)
+
+    def _remove_file(self, rel: str) -> None:
+        if rel not in self._files:
+            return
+        self._drop(rel)
+        conn = self._connect()
+        row = conn.execute("SELECT id, grams FROM files WHERE path = ?", (rel,)).fetchone()
+        if row is not None:
+            self._stage(row[0], set(_unpack(row[1])), set())
+            conn.execute("DELETE FROM files WHERE id = ?", (row[0],))
+        self._changes += 1
+        self.version += 1
+
+    def _index_file(self, rel: str, st: os.stat_result) -> None:
+        """(Re)tokenize one file if its size or mtime changed."""
+        old = self._files.get(rel)
+        if old is not None and old[1] == st.st_size and old[2] == st.st_mtime_ns:
+            return
+        grams: Set[int] = set()
+        kind = _UNTOKENIZED
+        if st.st_size <= MAX_INDEXED_BYTES:
+            try:
+                grams = file_trigrams((self.root / rel).read_bytes())
+                kind = _TEXT if grams else _NO_GRAMS
+            except OSError:
+                pass
+        conn = self._connect()
+        blob = _pack(grams) if grams else None
+        # the stored row, not memory, holds the id and trigrams the postings reflect
+        row = conn.execute("SELECT id, grams FROM files WHERE path = ?", (rel,)).fetchone()
+        if row is None:
+            file_id = conn.execute(
+                "INSERT INTO files (path, size, mtime_ns, kind, grams) VALUES (?, ?, ?, ?, ?)",
+                (rel, st.st_size, st.st_mtime_ns, kind, blob)).lastrowid
+            old_grams: Set[int] = set()
+        else:
+            file_id, old_grams = row[0], set(_unpack(row[1]))
+            conn.execute("UPDATE files SET size = ?, mtime_ns = ?, kind = ?, grams = ? WHERE id = ?",
+                         (st.st_size, st.st_mtime_ns, kind, blob, file_id))
+        self._stage(file_id, old_grams, grams)
+        self._drop(rel)
+        self._add(rel, (file_id, st.st_size, st.st_mtime_ns, kind))
+        self._changes += 1
+        self.version += 1
+
+    def _restat(self, rel: str) -> None:
+        """Re-check one file reported as changed."""
+        if self._parent(rel) not in self._dirs:
+            return  # ignored directory, or a new one the directory pass picks up
+        try:
+            st = os.stat(self.root / rel)
+        except OSError:
+            self._remove_file(rel)
+            return
+        if os.path.isfile(self.root / rel):
+            self._index_file(rel, st)
+        else:
+            self._remove_file(rel)
+
+    def _forget_dir(self, rel_dir: str) -> None:
+        for rel in list(self._dir_files.pop(rel_dir, ())):
+            self._remove_file(rel)
+        for sub in self._subdirs.pop(rel_dir, ()):
+            self._forget_dir(sub)
+        self._dirs.pop(rel_dir, None)
+
+    def _scan_dir(self, rel_dir: str, recursive: bool) -> None:
+        """List one directory, index its files and forget entries that vanished.
+
+        New subdirectories are always scanned; known ones only when ``recursive``.
+        """
+        full = self.root / rel_dir
+        try:
+            # stat before listing so a concurrent change is seen on the next refresh
+            mtime_ns = os.stat(full).st_mtime_ns
+        except OSError:
+            self._forget_dir(rel_dir)
+            return
+        self._dirs[rel_dir] = mtime_ns
+        files: Set[str] = set()
+        subdirs: Set[str] = set()
+        # ignored entries (default dirs, .gitignore) are dropped by scan_dir
+        for entry in scan_dir(full, self._rules, rel_dir):
+            rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.add(rel)
+                elif entry.is_file():
+                    files.add(rel)
+                    self._index_file(rel, entry.stat())
+            except OSError:
+                continue
+        for rel in self._dir_files.get(rel_dir, set()) - files:
+            self._remove_file(rel)
+        for sub in self._subdirs.get(rel_dir, set()) - subdirs:
+            self._forget_dir(sub)
+        self._subdirs[rel_dir] = subdirs
+        for sub in sorted(subdirs):
+            if recursive or sub not in self._dirs:
+                self._scan_dir(sub, recursive)
+
+    def _git(self, args: List[str]) -> Optional[str]:
+        try:
+            res = subprocess.run(
+                ["git", *args],
+                cwd=str(self.root),
+                capture_output=True,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+            )
+        except OSError:
+            return None
+        return res.stdout if res.returncode == 0 else None
+
+    def _from_git(self, top: str, paths: Iterable[str]) -> Set[str]:
+        """Map git's top-level-relative paths to paths relative to root."""
+        out = set()
+        for p in paths:
+            if not p:
+                continue
+            rel = os.path.relpath(os.path.join(top, p), self.root)
+            if rel != ".." and not rel.startswith(".." + os.sep):
+                out.add(rel.replace(os.sep, "/"))
+        return out
+
+    def _git_changed_paths(self) -> Optional[Set[str]]:
+        """Return files git reports as changed since the last call.
+
+        That is files dirty now, files dirty last time (they may have been
+        reverted since), and files touched by commits if HEAD moved. Returns
+        None outside a git work tree or when git cannot answer.
+        """
+        if self._git_top is None:
+            top = self._git(["rev-parse", "--show-toplevel"])
+            self._git_top = top.strip() if top else ""
+        if not self._git_top:
+            return None
+        status = self._git(["status", "--porcelain", "-z", "--untracked-files=all"])
+        if status is None:
+            return None
+        paths: List[str] = []
+        records = status.split("\0")
+        i = 0
+        while i < len(records):
+            record = records[i]
+            i += 1
+            if len(record) < 4:
+                continue
+            paths.append(record[3:])
+            if record[0] in "RC" and i < len(records):
+                # renames and copies are followed by the source path
+                paths.append(records[i])
+                i += 1
+        dirty = self._from_git(self._git_top, paths)
+        changed = dirty | self._git_dirty
+        head = (self._git(["rev-parse", "-q", "--verify", "HEAD"]) or "").strip() or None
+        if head and self._git_head and head != self._git_head:
+            diff = self._git(["diff", "--name-only", "-z", self._git_head, head])
+            if diff is None:
+                return None
+            changed |= self._from_git(self._git_top, diff.split("\0"))
+        self._git_dirty = dirty
+        self._git_head = head
+        return changed
+
+    def _tracked_paths(self) -> Optional[Set[str]]:
+        """Return the root-relative files whose changes ``git status`` reports.
+
+        Only plainly tracked files qualify: entries marked assume-unchanged
+        or skip-worktree are left out, and so are files of nested
+        repositories and submodules, which this repository's status never
+        covers. Returns None when git cannot answer.
+        """
+        if self._git_index is None:
+            out = self._git(["rev-parse", "--git-path", "index"])
+            if not out:
+                return None
+            self._git_index = (self.root / out.strip(), (0, 0, 0))
+        index_path, seen = self._git_index
+        try:
+            st = os.stat(index_path)
+            key = (st.st_size, st.st_mtime_ns, st.st_ino)
+        except OSError:
+            key = (0, 0, 0)
+        if key != seen or not key[1]:
+            listing = self._git(["ls-files", "-v", "-z"])
+            if listing is None:
+                return None
+            # "H <path>" is a tracked file; ls-files paths are relative to cwd (root)
+            self._git_tracked = {rec[2:] for rec in listing.split("\0") if rec.startswith("H ")}
+            self._git_index = (index_path, key)
+        return self._git_tracked
+
+    def update(self, use_git: bool = True) -> None:
+        """Stat the whole tree, re-tokenizing files whose size or mtime changed."""
+        with self._lock:
+            try:
+                if self._conn is None:
+                    self._load()
+                self._rules = IgnoreRules(self.root)
+                if use_git:
+                    # baseline for later incremental refreshes
+                    self._git_changed_paths()
+                self._pending.clear()
+                changes = self._changes
+                self._scan_dir("", recursive=True)
+                for rel in [r for r in self._files if self._parent(r) not in self._dirs]:
+                    self._remove_file(rel)
+            except sqlite3.Error as e:
+                self._reset(e)
+                return self.update(use_git)
+            self._synced = True
+            log(f"search_index: {len(self._files)} files, {self._changes - changes} changed or removed")
+            self.save()
+
+    def refresh(self, use_git: bool = True) -> None:
+        """Incrementally bring the index up to date.
+
+        Directories are re-listed only when their mtime changed. Files are
+        re-stat'ed when passed to ``invalidate()``, when ``git status``
+        reports them, or when git does not track them; outside a git work
+        tree every indexed file is re-stat'ed. Unchanged files are never read.
+        """
+        with self._lock:
+            if not self._synced:
+                self.update(use_git)
+                return
+            changes = self._changes
+            try:
+                self._rules = IgnoreRules(self.root)
+                for rel_dir in list(self._dirs):
+                    mtime_ns = self._dirs.get(rel_dir)
+                    if mtime_ns is None:
+                        continue  # forgotten while rescanning its parent
+                    try:
+                        current = os.stat(self.root / rel_dir).st_mtime_ns
+                    except OSError:
+                        self._forget_dir(rel_dir)
+                        continue
+                    if current != mtime_ns:
+                        self._scan_dir(rel_dir, recursive=False)
+                changed, self._pending = self._pending, set()
+                git_changed = self._git_changed_paths() if use_git else None
+                tracked = self._tracked_paths() if git_changed is not None else None
+                if tracked is None:
+                    changed |= set(self._files)
+                else:
+                    # git status only speaks for the files git tracks
+                    changed |= git_changed
+                    changed.update(rel for rel in self._files if rel not in tracked)
+                for rel in changed:
+                    self._restat(rel)
+            except sqlite3.Error as e:
+                self._reset(e)
+                self.update(use_git)
+                return
+            if self._changes != changes:
+                log(f"search_index: refreshed {self._changes - changes} changed or removed")
+            self.save()
+
+    def invalidate(self, rel: str) -> None:
+        """Mark a file as changed so the next refresh re-reads it."""
+        with self._lock:
+            self._pending.add(rel)
+
+    # --- queries ---
+
+    def _postings(self, grams: List[int]) -> List[array]:
+        """Load the file ids of each trigram, one sorted array per trigram."""
+        conn = self._connect()
+        found: Dict[int, bytes] = {}
+        for i in range(0, len(grams), _IN_BATCH):
+            batch = grams[i:i + _IN_BATCH]
+            found.update(conn.execute(
+                f"SELECT gram, ids FROM postings WHERE gram IN ({','.join('?' * len(batch))})", batch))
+        return [_unpack(found.get(g)) for g in grams]
+
+    def candidates(self, literals: Iterable[str], prefix: str = "", refresh: bool = True) -> List[Path]:
+        """Return files under ``prefix`` that may contain all ``literals``.
+
+        Literals shorter than three characters do not narrow the result.
+        Files too large to tokenize are always included. Pass refresh=False
+        if the caller has just refreshed the index.
+        """
+        if refresh:
+            self.refresh()
+        grams: Set[int] = set()
+        for literal in literals:
+            grams |= query_trigrams(literal)
+        with self._lock:
+            if grams:
+                try:
+                    self._merge_postings()
+                    postings = sorted(self._postings(sorted(grams)), key=len)
+                except sqlite3.Error as e:
+                    self._reset(e)
+                    return self.candidates(literals, prefix, refresh=True)
+                ids = set(postings[0])
+                for other in postings[1:]:
+                    if not ids:
+                        break
+                    ids.intersection_update(other)
+                found = {self._paths[i] for i in ids if i in self._paths}
+                found.update(p for p, entry in self._files.items() if entry[3] == _UNTOKENIZED)
+            else:
+                found = set(self._files)
+        if prefix:
+            prefix = prefix.rstrip("/") + "/"
+            found = {p for p in found if p.startswith(prefix)}
+        return [self.root / p for p in sorted(found)]
+
+    def text_files(self, refresh: bool = True) -> Dict[str, Tuple[int, int]]:
+        """Return ``rel -> (size, mtime_ns)`` for the tokenized, non-binary files."""
+        if refresh:
+            self.refresh()
+        with self._lock:
+            return {rel: (entry[1], entry[2]) for rel, entry in self._files.items() if entry[3] == _TEXT}
+
+
+_INDEXES: Dict[Path, TrigramIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_index(root: Optional[Path] = None) -> TrigramIndex:
+    """Return the shared index for ``root`` (defaults to config.FS_ROOT)."""
+    root = Path(root or config.FS_ROOT).resolve()
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(root)
+        if index is None:
+            index = _INDEXES[root] = TrigramIndex(root)
+        return index
+
+
+def invalidate(path: str | os.PathLike[str]) -> None:
+    """Tell every loaded index that ``path`` was written."""
+    full = Path(path).resolve()
+    with _INDEXES_LOCK:
+        indexes = list(_INDEXES.values())
+    for index in indexes:
+        if index.root in full.parents:
+            index.invalidate(full.relative_to(index.root).as_posix())
+
+
+def index_prefix_for(directory: Path) -> Optional[str]:
+    """Return ``directory`` relative to FS_ROOT if the FS_ROOT index covers it.
+
+    Returns None when the directory lies outside FS_ROOT or inside an
+    ignored directory, in which case callers fall back to a plain walk.
+    """
+    root = config.FS_ROOT
+    directory = Path(directory).resolve()
+    if directory != root and root not in directory.parents:
+        return None
+    rel = directory.relative_to(root)
+    rules = IgnoreRules(root)
+    for i in range(1, len(rel.parts) + 1):
+        if rules.ignored("/".join(rel.parts[:i]), True):
+            return None
+    return "" if rel == Path(".") else rel.as_posix()
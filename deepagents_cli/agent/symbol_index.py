@@ -0,0 +1,319 @@
+"""
+Symbol index (definitions and references) for Python and JS/TS files.
+
+Python files are parsed with ``ast``. JavaScript and TypeScript files go
+through a small tokenizer that skips comments, string and regex literals and
+recognizes declarations by their keyword (``function``, ``class``,
+``interface``, ``const`` and so on) and class methods by position. Each
+file's symbols are cached by size and mtime, and the file list comes from
+the trigram index, so a lookup only re-parses files that changed. Name
+lookups are dictionary hits instead of a scan of the whole repository.
+"""
+from __future__ import annotations
+
+import ast
+import re
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from . import config
+from .content_cache import content_cache
+from .logging import log
+from .search_index import get_index
+
+PYTHON_EXTS = {".py", ".pyi"}
+JS_EXTS = {".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx", ".mts", ".cts"}
+
+
+@dataclass(frozen=True)
+class Symbol:
+    """A definition site; ``container`` is the enclosing class or function, if any."""
+    name: str
+    kind: str
+    path: str
+    line: int
+    container: Optional[str] = None
+
+
+# --- Python ---
+
+class _PythonVisitor(ast.NodeVisitor):
+    def __init__(self, rel: str):
+        self.rel = rel
+        self.defs: List[Symbol] = []
+        self.refs: Dict[str, List[int]] = {}
+        self._stack: List[Tuple[str, str]] = []  # (name, kind)
+
+    def _define(self, name: str, kind: str, line: int) -> None:
+        container = self._stack[-1][0] if self._stack else None
+        self.defs.append(Symbol(name, kind, self.rel, line, container))
+
+    def _ref(self, name: str, line: int) -> None:
+        self.refs.setdefault(name, []).append(line)
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        self._define(node.name, "class", node.lineno)
+        for child in node.bases + node.keywords + node.decorator_list:
+            self.visit(child)
+        self._stack.append((node.name, "class"))
+        for child in node.body:
+            self.visit(child)
+        self._stack.pop()
+
+    def _visit_function(self, node) -> None:
+        in_class = bool(self._stack) and self._stack[-1][1] == "class"
+        self._define(node.name, "method" if in_class else "function", node.lineno)
+        for child in node.decorator_list + [node.args] + ([node.returns] if node.returns else []):
+            self.visit(child)
+        self._stack.append((node.name, "function"))
+        for child in node.body:
+            self.visit(child)
+        self._stack.pop()
+
+    visit_FunctionDef = _visit_function
+    visit_AsyncFunctionDef = _visit_function
+
+    def _define_targets(self, targets, line: int) -> None:
+        # module and class level assignments only; locals are too noisy
+        if self._stack and self._stack[-1][1] == "function":
+            return
+        for target in targets:
+            for node in ast.walk(target):
+                if isinstance(node, ast.Name):
+                    self._define(node.id, "variable", line)
+
+    def visit_Assign(self, node: ast.Assign) -> None:
+        self._define_targets(node.targets, node.lineno)
+        self.generic_visit(node)
+
+    def visit_AnnAssign(self, node: ast.AnnAssign) -> None:
+        self._define_targets([node.target], node.lineno)
+        self.generic_visit(node)
+
+    def visit_Name(self, node: ast.Name) -> None:
+        if isinstance(node.ctx, ast.Load):
+            self._ref(node.id, node.lineno)
+
+    def visit_Attribute(self, node: ast.Attribute) -> None:
+        if isinstance(node.ctx, ast.Load):
+            self._ref(node.attr, node.lineno)
+        self.visit(node.value)
+
+
+def python_symbols(text: str, rel: str) -> Tuple[List[Symbol], Dict[str, List[int]]]:
+    """Return ``(definitions, references)`` for Python source; empty on syntax errors."""
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return [], {}
+    visitor = _PythonVisitor(rel)
+    visitor.visit(tree)
+    return visitor.defs, visitor.refs
+
+
+# --- JavaScript / TypeScript ---
+
+_JS_TOKEN_RE = re.compile(r"""
+    (?P<nl>\n)
+  | (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`)
+  | (?P<ident>[A-Za-z_$][\w$]*)
+  | (?P<punct>[{}()\[\];,.=<>*:]|=>)
+  | (?P<slash>/)
+""", re.VERBOSE | re.DOTALL)
+# a regex literal body may hold "/" and quotes inside a [...] class or after a backslash
+_JS_REGEX_RE = re.compile(r"/(?![*/])(?:\\.|\[(?:\\.|[^\]\\\n])*\]|[^/\\\n\[])+/[A-Za-z]*")
+# after these words a "/" starts a regex literal; after other names it divides
+_JS_REGEX_AFTER_WORDS = {"return", "typeof", "case", "do", "else", "in", "of", "new", "delete", "void",
+                         "throw", "yield", "await", "instanceof"}
+
+_JS_DECL_KINDS = {
+    "function": "function", "class": "class", "interface": "interface", "enum": "enum",
+    "type": "type", "namespace": "namespace", "const": "variable", "let": "variable", "var": "variable",
+}
+_JS_MODIFIERS = {"static", "async", "get", "set", "public", "private", "protected", "readonly", "abstract",
+                 "override", "declare", "export", "default"}
+_JS_KEYWORDS = set(_JS_DECL_KINDS) | _JS_MODIFIERS | {
+    "break", "case", "catch", "continue", "debugger", "delete", "do", "else", "extends", "finally", "for",
+    "from", "if", "implements", "import", "in", "instanceof", "new", "of", "return", "super", "switch",
+    "this", "throw", "try", "typeof", "void", "while", "with", "yield", "await", "as", "null", "true",
+    "false", "undefined",
+}
+
+
+def _js_regex_allowed(prev: str) -> bool:
+    """True if a "/" after the significant text ``prev`` starts a regex rather than dividing."""
+    if not prev:
+        return True
+    if prev[-1].isalnum() or prev[-1] in "_$)]\"'`":
+        return prev in _JS_REGEX_AFTER_WORDS
+    return True
+
+
+def js_symbols(text: str, rel: str) -> Tuple[List[Symbol], Dict[str, List[int]]]:
+    """Return ``(definitions, references)`` for JS/TS source using a lightweight tokenizer."""
+    tokens: List[Tuple[str, str, int]] = []  # (kind, value, line)
+    line = 1
+    pos = 0
+    # the last significant text before the current token, to tell a regex from a division
+    prev = ""
+    while True:
+        m = _JS_TOKEN_RE.search(text, pos)
+        if m is None:
+            break
+        gap = text[pos:m.start()].strip()  # operators and numbers the token regex skips
+        if gap:
+            prev = gap
+        kind = m.lastgroup
+        value = m.group()
+        pos = m.end()
+        if kind == "nl":
+            line += 1
+            continue
+        if kind == "comment":
+            line += value.count("\n")
+            continue
+        if kind == "slash":
+            literal = _JS_REGEX_RE.match(text, m.start()) if _js_regex_allowed(prev) else None
+            if literal is not None:
+                pos = literal.end()
+                prev = ")"  # a value: a "/" right after it divides
+            else:
+                prev = value
+            continue
+        prev = value
+        if kind == "string":
+            line += value.count("\n")
+            continue
+        tokens.append((kind, value, line))
+
+    defs: List[Symbol] = []
+    refs: Dict[str, List[int]] = {}
+    # brace stack entries: the class name for class bodies, else None
+    braces: List[Optional[str]] = []
+    pending_class: Optional[str] = None
+    for i, (kind, value, line) in enumerate(tokens):
+        if kind == "punct":
+            if value == "{":
+                braces.append(pending_class)
+                pending_class = None
+            elif value == "}" and braces:
+                braces.pop()
+            continue
+        prev = tokens[i - 1][1] if i else ""
+        if prev == "*" and i >= 2:
+            prev = tokens[i - 2][1]  # function* name
+        nxt = tokens[i + 1][1] if i + 1 < len(tokens) else ""
+        container = next((c for c in reversed(braces) if c), None)
+        if value in _JS_KEYWORDS:
+            continue
+        if prev in _JS_DECL_KINDS and (i < 2 or tokens[i - 2][1] != "."):
+            defs.append(Symbol(value, _JS_DECL_KINDS[prev], rel, line, container))
+            if prev == "class":
+                pending_class = value
+            continue
+        in_class_body = bool(braces) and braces[-1] is not None
+        if in_class_body and nxt in ("(", "<", "=") and (prev in ("{", "}", ";", "") or prev in _JS_MODIFIERS):
+            defs.append(Symbol(value, "method" if nxt != "=" else "property", rel, line, braces[-1]))
+            continue
+        refs.setdefault(value, []).append(line)
+    return defs, refs
+
+
+# --- index ---
+
+# rel -> (size, mtime_ns, definitions, references name -> lines)
+_FileSymbols = Tuple[int, int, List[Symbol], Dict[str, List[int]]]
+
+
+class SymbolIndex:
+    """Name -> definition/reference locations for the source files below ``root``."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root).resolve()
+        self._files: Dict[str, _FileSymbols] = {}
+        self._defs: Dict[str, Set[str]] = {}
+        self._refs: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def _drop(self, rel: str) -> None:
+        entry = self._files.pop(rel, None)
+        if entry is None:
+            return
+        for sym in entry[2]:
+            self._defs.get(sym.name, set()).discard(rel)
+        for name in entry[3]:
+            self._refs.get(name, set()).discard(rel)
+
+    def _add(self, rel: str, size: int, mtime_ns: int) -> None:
+        try:
+            # decoded with the sniffed encoding; a bulk pass does not populate the cache
+            text = content_cache.read_decoded(self.root / rel, errors="ignore", populate=False)
+        except (OSError, ValueError):
+            return
+        if text is None:
+            return
+        parse = python_symbols if Path(rel).suffix in PYTHON_EXTS else js_symbols
+        defs, refs = parse(text, rel)
+        self._files[rel] = (size, mtime_ns, defs, refs)
+        for sym in defs:
+            self._defs.setdefault(sym.name, set()).add(rel)
+        for name in refs:
+            self._refs.setdefault(name, set()).add(rel)
+
+    def sync(self) -> None:
+        """Re-parse source files whose size or mtime changed since the last lookup."""
+        files = {rel: st for rel, st in get_index(self.root).text_files().items()
+                 if Path(rel).suffix in PYTHON_EXTS or Path(rel).suffix in JS_EXTS}
+        with self._lock:
+            changed = 0
+            for rel in [r for r in self._files if r not in files]:
+                self._drop(rel)
+                changed += 1
+            for rel, (size, mtime_ns) in files.items():
+                entry = self._files.get(rel)
+                if entry is not None and entry[0] == size and entry[1] == mtime_ns:
+                    continue
+                self._drop(rel)
+                self._add(rel, size, mtime_ns)
+                changed += 1
+            if changed:
+                log(f"symbol_index: {len(self._files)} files, {changed} parsed")
+
+    def definitions(self, name: str, kind: Optional[str] = None) -> List[Symbol]:
+        """Return definitions of ``name`` (optionally only of ``kind``), sorted by path and line."""
+        self.sync()
+        with self._lock:
+            out = [sym for rel in self._defs.get(name, ()) for sym in self._files[rel][2]
+                   if sym.name == name and (kind is None or sym.kind == kind)]
+        return sorted(out, key=lambda s: (s.path, s.line))
+
+    def references(self, name: str) -> List[Tuple[str, int]]:
+        """Return ``(path, line)`` pairs where ``name`` is used, sorted."""
+        self.sync()
+        with self._lock:
+            out = [(rel, line) for rel in self._refs.get(name, ()) for line in self._files[rel][3][name]]
+        return sorted(set(out))
+
+    def file_symbols(self, rel: str) -> List[Symbol]:
+        """Return the definitions in one file, in line order."""
+        self.sync()
+        with self._lock:
+            entry = self._files.get(rel)
+        return sorted(entry[2], key=lambda s: s.line) if entry else []
+
+
+_SYMBOL_INDEXES: Dict[Path, SymbolIndex] = {}
+_SYMBOL_INDEXES_LOCK = threading.Lock()
+
+
+def get_symbol_index(root: Optional[Path] = None) -> SymbolIndex:
+    """Return the shared symbol index for ``root`` (defaults to config.FS_ROOT)."""
+    root = Path(root or config.FS_ROOT).resolve()
+    with _SYMBOL_INDEXES_LOCK:
+        index = _SYMBOL_INDEXES.get(root)
+        if index is None:
+            index = _SYMBOL_INDEXES[root] = SymbolIndex(root)
+        return index
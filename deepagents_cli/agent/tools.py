@@ -8,13 +8,25 @@ from __future__ import annotations
 
 from typing import Callable, List
 from pathlib import Path
-from difflib import unified_diff
 import subprocess
-import fnmatch
+import re
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 from . import config
+from .atomic_write import WriteBatch, atomic_write_text, recover_interrupted_writes
 
+from .content_cache import content_cache
+from .file_kind import file_kind
+from .fs_walk import DEFAULT_IGNORE_DIRS, compile_glob, iglob, scan_dir, walk
+from .line_index import split_lines
 from .logging import log
+from .matcher import required_literals
+from .proposals import Proposal, StaleProposalError, proposals_dir, read_base, render_diff
+from .query_cache import query_cache
+from .search_engine import SearchStream, close_cursor, default_workers, open_cursor, resume_cursor
+from .search_index import get_index
 from .state import vfs_ls, vfs_read, vfs_write
+from .symbol_index import get_symbol_index
 
 def echo(text: str) -> str:
     """Echo back the provided text (diagnostic example tool)."""
@@ -69,11 +81,13 @@ def fs_read(path: str, max_kb: int = 64) -> str:
     if not fp.is_file():
         raise FileNotFoundError(f"No such file: {fp}")
     max_bytes = max(1, int(max_kb)) * 1024
-    data = fp.read_bytes()
-    if len(data) > max_bytes:
-        snippet = data[:max_bytes].decode(errors="replace")
-        return f"[truncated {len(data)-max_bytes} bytes]\n" + snippet
-    return data.decode(errors="replace")
+    size = fp.stat().st_size
+    if size > max_bytes:
+        # read only the prefix we return; large files never enter memory whole
+        with open(fp, "rb") as f:
+            snippet = f.read(max_bytes).decode(errors="replace")
+        return f"[truncated {size-max_bytes} bytes]\n" + snippet
+    return content_cache.read_bytes(fp).decode(errors="replace")
 
 
 def fs_ls(path: str = ".", recursive: bool = False, max_items: int = 200) -> str:
@@ -92,31 +106,34 @@ def fs_ls(path: str = ".", recursive: bool = False, max_items: int = 200) -> str
         return f"FILE {base} ({base.stat().st_size} bytes)"
     if recursive:
         count = 0
-        for p in base.rglob("*"):
-            items.append(str(p.relative_to(config.FS_ROOT)))
+        for _, entry in walk(base, include_dirs=True):
+            items.append(str(Path(entry.path).relative_to(config.FS_ROOT)))
             count += 1
             if count >= max_items:
                 items.append(f"... [truncated at {max_items} items]")
                 break
     else:
-        for p in sorted(base.iterdir()):
-            items.append(str(p.relative_to(config.FS_ROOT)))
+        for entry in scan_dir(base):
+            items.append(str(Path(entry.path).relative_to(config.FS_ROOT)))
     return "\n".join(items) if items else "(empty)"
 
 
-def fs_glob(pattern: str) -> str:
+def fs_glob(pattern: str, max_results: int = 1000) -> str:
     """Glob under sandbox root using a pattern relative to root.
 
     Example: "**/*.py"
     """
-    log(f"tool:fs_glob pattern='{pattern}'")
+    log(f"tool:fs_glob pattern='{pattern}' max_results={max_results}")
     if not config.ALLOW_FS_READ:
         raise PermissionError("Filesystem read is disabled")
     root = config.FS_ROOT
-    matches = list(root.glob(pattern))
-    if not matches:
+    # matched while walking; directories that cannot match are never listed
+    matches = iglob(root, pattern)
+    lines = [str(Path(rel)) for rel, _ in islice(matches, max_results)]
+    if not lines:
         return "(no matches)"
-    lines = [str(p.relative_to(root)) for p in matches]
+    if next(matches, None) is not None:
+        lines.append(f"... [truncated at {max_results} matches]")
     return "\n".join(lines)
 
 
@@ -130,41 +147,24 @@ def fs_tree(path: str = ".", max_depth: int = 2, max_entries: int = 500) -> str:
     if not start.exists():
         raise FileNotFoundError(f"No such path: {start}")
 
-    lines: list[str] = []
-    count = 0
-
-    def walk(dir_path: Path, depth: int) -> None:
-        nonlocal count
-        if depth > max_depth:
-            return
-        prefix = "    " * depth
-        entries = sorted(dir_path.iterdir())
-        for entry in entries:
-            rel = entry.relative_to(root)
-            lines.append(f"{prefix}{rel}{'/' if entry.is_dir() else ''}")
-            count += 1
-            if count >= max_entries:
-                lines.append("... [tree truncated]")
-                return
-            if entry.is_dir():
-                walk(entry, depth + 1)
-
     if start.is_file():
         return str(start.relative_to(root))
-    lines.append(str(start.relative_to(root)) + "/")
-    walk(start, 0)
+    lines: list[str] = [str(start.relative_to(root)) + "/"]
+    count = 0
+    # unchanged directories are served from the listing cache (one stat each)
+    for rel, entry in walk(start, include_dirs=True, max_depth=max_depth, cached=True):
+        prefix = "    " * rel.count("/")
+        lines.append(f"{prefix}{Path(entry.path).relative_to(root)}{'/' if entry.is_dir() else ''}")
+        count += 1
+        if count >= max_entries:
+            lines.append("... [tree truncated]")
+            break
     return "\n".join(lines)
 
 
 # --- Pending write queue (CLI-gated) ---
-PENDING_WRITES: list[dict] = []
-
-
-def _read_text(fp: Path) -> str:
-    try:
-        return fp.read_text(errors="replace") if fp.exists() else ""
-    except Exception:
-        return ""
+# proposals hold hunks against a hashed base; large payloads live on disk
+PENDING_WRITES: list[Proposal] = []
 
 
 def propose_write(path: str, content: str, create: bool = True) -> str:
@@ -179,26 +179,15 @@ def propose_write(path: str, content: str, create: bool = True) -> str:
         raise IsADirectoryError(f"Target is not a file: {target}")
     if not target.exists() and not create:
         raise FileNotFoundError(f"File does not exist: {target}")
-    old = _read_text(target)
+    base_hash, old = read_base(target)
     new = content
-    diff = "".join(
-        unified_diff(
-            old.splitlines(keepends=True),
-            new.splitlines(keepends=True),
-            fromfile=str(target),
-            tofile=f"{target} (proposed)",
-        )
-    )
-    proposal = {"path": str(target), "content": content, "diff": diff}
+    diff = render_diff(target, old, new)
     # Auto-apply if policy allows
     if config.ALLOW_FS_WRITE and config.ALLOW_AUTO_APPLY:
-        fp = Path(proposal["path"]) \
-            if Path(proposal["path"]).is_absolute() else (config.FS_ROOT / proposal["path"]).resolve()
-        fp.parent.mkdir(parents=True, exist_ok=True)
-        fp.write_text(proposal["content"])
-        return f"auto-applied to {fp}\n" + (diff or "(no changes)")
+        atomic_write_text(target, content)
+        return f"auto-applied to {target}\n" + (diff or "(no changes)")
     # Otherwise queue proposal
-    PENDING_WRITES.append(proposal)
+    PENDING_WRITES.append(Proposal.create(str(target), base_hash, old, new, diff, proposals_dir(config.FS_ROOT)))
     pid = len(PENDING_WRITES) - 1
     return f"proposal #{pid}\n" + (diff or "(no changes)")
 
@@ -206,6 +195,8 @@ def propose_write(path: str, content: str, create: bool = True) -> str:
 def fs_set_root(path: str) -> str:
     """Set the sandbox root to a new path. Returns the resolved root.
 
+    If writes are allowed, transactions a crash left unfinished under the new
+    root are rolled back and the restored files are listed after the root.
     This enables natural language workflows where the agent changes working directory.
     """
     log(f"tool:fs_set_root path='{path}'")
@@ -215,12 +206,13 @@ def fs_set_root(path: str) -> str:
     if not p.is_dir():
         raise NotADirectoryError(f"Not a directory: {p}")
     config.set_fs_root(str(p))
-    return str(config.FS_ROOT)
+    notice = recover_interrupted_writes()
+    return f"{config.FS_ROOT}\n{notice}" if notice else str(config.FS_ROOT)
 
 
 def list_pending_writes() -> list[dict]:
     """Return pending write proposals for the CLI to render."""
-    return [{"id": i, **p} for i, p in enumerate(PENDING_WRITES)]
+    return [{"id": i, **p.summary(), "diff": p.diff} for i, p in enumerate(PENDING_WRITES)]
 
 
 def apply_pending_write(idx: int) -> str:
@@ -230,30 +222,78 @@ def apply_pending_write(idx: int) -> str:
     if idx < 0 or idx >= len(PENDING_WRITES):
         raise IndexError("Invalid proposal index")
     p = PENDING_WRITES[idx]
-    fp = Path(p["path"])
-    fp.parent.mkdir(parents=True, exist_ok=True)
-    fp.write_text(p["content"])
+    fp = Path(p.path)
+    # raises StaleProposalError if the file changed since it was proposed
+    atomic_write_text(fp, p.new_content())
     return f"applied proposal #{idx} to {fp}"
 
 
+def apply_pending_writes(ids: list[int] | None = None) -> str:
+    """Apply several pending proposals (all if ids is None) as one transaction.
+
+    Every proposal is validated before anything is written: if any base file
+    changed since it was proposed, nothing is applied and the stale ids are
+    reported. When several proposals target one file the latest wins. Files
+    are written concurrently and committed together under a write-ahead
+    journal; the applied proposals are removed from the queue.
+    """
+    global PENDING_WRITES
+    if not config.ALLOW_FS_WRITE:
+        raise PermissionError("Filesystem write is disabled; run with --allow-write")
+    selected = sorted(set(range(len(PENDING_WRITES)) if ids is None else ids))
+    for idx in selected:
+        if idx < 0 or idx >= len(PENDING_WRITES):
+            raise IndexError(f"Invalid proposal index {idx}")
+    if not selected:
+        return "applied 0 proposals"
+    latest: dict[str, int] = {}
+    for idx in selected:
+        latest[PENDING_WRITES[idx].path] = idx
+    winners = sorted(latest.values())
+
+    def build(idx: int):
+        try:
+            return PENDING_WRITES[idx].new_content()
+        except StaleProposalError as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=min(8, len(winners))) as pool:
+        contents = list(pool.map(build, winners))
+    stale = [idx for idx, c in zip(winners, contents) if isinstance(c, StaleProposalError)]
+    if stale:
+        raise StaleProposalError(
+            f"proposals {', '.join(f'#{i}' for i in stale)} are stale (their files changed); nothing was applied")
+    batch = WriteBatch(journal=True)
+    for idx, content in zip(winners, contents):
+        batch.add_text(PENDING_WRITES[idx].path, content)
+    batch.commit()
+    done = set(selected)
+    for idx in selected:
+        PENDING_WRITES[idx].discard()
+    PENDING_WRITES = [p for i, p in enumerate(PENDING_WRITES) if i not in done]
+    superseded = len(selected) - len(winners)
+    note = f" ({superseded} superseded by later proposals for the same file)" if superseded else ""
+    return f"applied {len(selected)} proposals to {len(winners)} files{note}"
+
+
 def clear_pending_write(idx: int | None = None) -> str:
     """Clear one proposal or all if idx is None."""
     global PENDING_WRITES
     if idx is None:
         n = len(PENDING_WRITES)
+        for p in PENDING_WRITES:
+            p.discard()
         PENDING_WRITES = []
         return f"cleared {n} proposals"
     if idx < 0 or idx >= len(PENDING_WRITES):
         raise IndexError("Invalid proposal index")
-    PENDING_WRITES.pop(idx)
+    PENDING_WRITES.pop(idx).discard()
     return f"cleared proposal #{idx}"
 
 
 # --- Repo-aware utilities ---
 
-_DEFAULT_IGNORE_DIRS = {
-    ".git", "node_modules", "dist", "build", "__pycache__", ".venv", "venv",
-}
+_DEFAULT_IGNORE_DIRS = DEFAULT_IGNORE_DIRS
 
 
 def _run_git(args: list[str], max_kb: int = 256) -> str:
@@ -346,61 +386,132 @@ def git_restore(path: str | None = None, staged: bool = False, worktree: bool =
 
 
 def code_search(query: str, file_glob: str = "**/*", max_matches: int = 200, case_sensitive: bool = False,
-                include_ext: str | None = None) -> str:
+                include_ext: str | None = None, cursor: str | None = None) -> str:
     """Search code under the sandbox root without external tools.
 
     - query: text to search
     - file_glob: pattern like **/*.py
     - include_ext: comma-separated list like "py,ts,js,md"
+    - max_matches: page size; when more matches exist a cursor is returned
+    - cursor: token from a previous call to fetch the next page (other filters are ignored)
     """
-    log(f"tool:code_search query='{query}' glob='{file_glob}' max_matches={max_matches} case={case_sensitive} ext={include_ext}")
+    log(f"tool:code_search query='{query}' glob='{file_glob}' max_matches={max_matches} case={case_sensitive} ext={include_ext} cursor={cursor}")
+    if cursor:
+        parked = resume_cursor(cursor)
+        if parked is None:
+            return f"(cursor {cursor} expired; run the search again)"
+        stream, state = parked
+        return _code_search_page(stream, cursor, state["root"], max_matches)
     root = config.FS_ROOT
     if not query:
         return "(empty query)"
-    patterns = [p.strip() for p in file_glob.split() if p.strip()] or ["**/*"]
+    patterns = [compile_glob(p.strip()) for p in file_glob.split() if p.strip()] or [compile_glob("**/*")]
     allow_ext: set[str] | None = None
     if include_ext:
         allow_ext = {"." + e.strip().lstrip(".") for e in include_ext.split(",") if e.strip()}
-    matches: list[str] = []
-    q = query if case_sensitive else query.lower()
 
-    for path in root.rglob("*"):
-        try:
-            if path.is_dir():
-                if path.name in _DEFAULT_IGNORE_DIRS:
-                    continue
-                else:
-                    pass
-            if not path.is_file():
-                continue
+    # repeat queries are answered from the session cache while the index is unchanged
+    index = get_index(root)
+    index.refresh()
+    key = ("code_search", query, file_glob, max_matches, case_sensitive, include_ext, str(root))
+    version = index.version
+    cached = query_cache.get(key, version)
+    if cached is not None:
+        return cached
+
+    def files_to_search():
+        # the trigram index narrows the walk to files that contain the query text
+        for path in index.candidates([query], refresh=False):
             if allow_ext and path.suffix not in allow_ext:
                 continue
             # glob filtering: require file to match at least one pattern relative to root
-            rel = str(path.relative_to(root))
-            if not any(fnmatch.fnmatch(rel, pat) for pat in patterns):
-                continue
-            # read smallish files only (cap at ~1MB)
-            if path.stat().st_size > 1_000_000:
-                continue
-            text = path.read_text(errors="ignore")
-            hay = text if case_sensitive else text.lower()
-            if q in hay:
-                # capture first line number occurrence
-                line_no = 0
-                for i, line in enumerate(text.splitlines(), 1):
-                    tgt = line if case_sensitive else line.lower()
-                    if q in tgt:
-                        line_no = i
-                        snippet = line.strip()
-                        break
-                matches.append(f"{rel}:{line_no}: {snippet}")
-                if len(matches) >= max_matches:
-                    break
-        except Exception:
-            continue
+            rel = path.relative_to(root).as_posix()
+            if any(pat.fullmatch(rel) for pat in patterns):
+                yield path
+
+    # first matching line per file; large files are scanned through mmap
+    stream = SearchStream(files_to_search(), re.escape(query), 0 if case_sensitive else re.IGNORECASE,
+                          max_per_file=1)
+    result = _code_search_page(stream, None, root, max_matches)
+    if not stream.more():  # only complete, cursor-free results are cached
+        query_cache.put(key, result, version=version)
+    return result
+
+
+def _code_search_page(stream: SearchStream, token: str | None, root: Path, page_size: int) -> str:
+    """Format the next page of a code_search stream, parking it under a cursor if more remain."""
+    hits = stream.take(max(1, page_size))
+    matches = [f"{hit.path.relative_to(root)}:{hit.line_no}: {hit.line.strip()}" for hit in hits]
+    if stream.more():
+        # pause read-ahead until the next page is asked for
+        stream.park()
+        token = token or open_cursor(stream, root=root)
+        matches.append(f"(more matches; call code_search with cursor='{token}' for the next page)")
+    else:
+        stream.close()
+        if token:
+            close_cursor(token)
     return "\n".join(matches) if matches else "(no matches)"
 
 
+# --- Symbol lookups (Python, JS/TS) ---
+def find_definition(name: str, kind: str | None = None) -> str:
+    """Find where a function, class, method or variable is defined under the sandbox root.
+
+    - name: exact symbol name
+    - kind: optional filter: function, method, class, variable, interface, type, enum
+    """
+    log(f"tool:find_definition name='{name}' kind={kind}")
+    if not config.ALLOW_FS_READ:
+        raise PermissionError("Filesystem read is disabled")
+    found = get_symbol_index(config.FS_ROOT).definitions(name.strip(), kind)
+    if not found:
+        return f"(no definition of '{name}' found)"
+    return "\n".join(
+        f"{sym.path}:{sym.line}: {sym.kind} {sym.name}" + (f" (in {sym.container})" if sym.container else "")
+        for sym in found
+    )
+
+
+def find_references(name: str, max_results: int = 100) -> str:
+    """List lines that use a symbol name (calls, reads, attribute access) under the sandbox root."""
+    log(f"tool:find_references name='{name}' max_results={max_results}")
+    if not config.ALLOW_FS_READ:
+        raise PermissionError("Filesystem read is disabled")
+    root = config.FS_ROOT
+    refs = get_symbol_index(root).references(name.strip())
+    if not refs:
+        return f"(no references to '{name}' found)"
+    out: list[str] = []
+    lines_by_file: dict[str, list[str]] = {}
+    for rel, line_no in refs[:max(1, max_results)]:
+        if rel not in lines_by_file:
+            try:
+                lines_by_file[rel] = split_lines(content_cache.read_decoded(root / rel, errors="ignore") or "")
+            except OSError:
+                lines_by_file[rel] = []
+        lines = lines_by_file[rel]
+        text = lines[line_no - 1].strip() if line_no <= len(lines) else ""
+        out.append(f"{rel}:{line_no}: {text}")
+    if len(refs) > max_results:
+        out.append(f"... ({len(refs) - max_results} more)")
+    return "\n".join(out)
+
+
+def list_symbols(path: str) -> str:
+    """Outline the definitions in one Python or JS/TS file under the sandbox root."""
+    log(f"tool:list_symbols path='{path}'")
+    if not config.ALLOW_FS_READ:
+        raise PermissionError("Filesystem read is disabled")
+    fp = _resolve_under_root(path)
+    if not fp.is_file():
+        raise FileNotFoundError(f"No such file: {fp}")
+    symbols = get_symbol_index(config.FS_ROOT).file_symbols(fp.relative_to(config.FS_ROOT).as_posix())
+    if not symbols:
+        return "(no symbols)"
+    return "\n".join(f"{sym.line:5}: {'    ' if sym.container else ''}{sym.kind} {sym.name}" for sym in symbols)
+
+
 # --- Simple task tracker (session-scoped) ---
 TASKS: list[dict] = []
 
@@ -448,51 +559,124 @@ def tasks_clear(done_only: bool = False) -> str:
 
 
 # --- Bulk replace tool ---
+_MAX_REPLACE_BYTES = 1_000_000
+_REPLACE_PREVIEWS = 10
+
+
+def _compile_replacer(query: str, replacement: str, regex: bool, replacements: dict[str, str] | None):
+    """Return ``(replace, literal_groups)`` for replace_in_files.
+
+    ``replace(text) -> (new_text, count)``. A file can only change if it
+    contains every literal of at least one group, which is what the trigram
+    index is asked for.
+    """
+    if replacements:
+        table = {k: v for k, v in replacements.items() if k}
+        if query and query not in table:
+            table[query] = replacement
+        # one alternation, longest keys first so overlapping keys prefer the longer match
+        combined = re.compile("|".join(re.escape(k) for k in sorted(table, key=len, reverse=True)))
+        return (lambda text: combined.subn(lambda m: table[m.group(0)], text)), [[k] for k in table]
+    if regex:
+        compiled = re.compile(query, re.MULTILINE)
+        return (lambda text: compiled.subn(replacement, text)), [required_literals(query, re.MULTILINE)]
+
+    def replace_literal(text: str):
+        n = text.count(query)
+        return (text.replace(query, replacement) if n else text), n
+    return replace_literal, [[query]]
+
+
+def _replace_one(path: Path, replace):
+    """Return ``(path, base_hash, old, new, count)`` if replacing changes ``path``."""
+    st = path.stat()
+    if st.st_size > _MAX_REPLACE_BYTES:
+        return None
+    kind = file_kind(path, st=st)
+    # files are rewritten as UTF-8, so only touch files that already are
+    if kind.binary or kind.encoding not in ("utf-8", "utf-8-sig"):
+        return None
+    base_hash, text = read_base(path, populate=False)
+    new_text, count = replace(text)
+    if not count or new_text == text:
+        return None
+    return path, base_hash, text, new_text, count
+
+
 def replace_in_files(query: str, replacement: str, file_glob: str = "**/*", include_ext: str | None = None,
-                     max_files: int = 100, dry_run: bool = True) -> str:
+                     max_files: int = 100, dry_run: bool = True, regex: bool = False,
+                     replacements: dict[str, str] | None = None) -> str:
     """Find and replace across multiple files.
 
     - If dry_run=True, only preview diffs (queued as proposals if writes allowed later).
     - When dry_run=False, applies via propose_write (auto-applies if policy permits).
     - include_ext: comma-separated extensions to limit search (e.g., "py,ts,tsx,md").
+    - regex: treat query as a regular expression; replacement may use \\1 or \\g<name>
+    - replacements: several {old: new} literal pairs applied in one pass, together with
+      query -> replacement if a query is given; cannot be combined with regex
     """
-    log(f"tool:replace_in_files query='{query}' -> '{replacement}' glob='{file_glob}' max_files={max_files} dry_run={dry_run} ext={include_ext}")
+    log(f"tool:replace_in_files query='{query}' -> '{replacement}' glob='{file_glob}' max_files={max_files} dry_run={dry_run} ext={include_ext} regex={regex} pairs={len(replacements or {})}")
     root = config.FS_ROOT
+    if not query and not replacements:
+        return "(empty query)"
+    if regex and replacements:
+        return "(regex=True cannot be combined with replacements; the pairs are literal strings)"
+    try:
+        replace, literal_groups = _compile_replacer(query, replacement, regex, replacements)
+    except re.error as e:
+        return f"(invalid regex: {e})"
     allow_ext: set[str] | None = None
     if include_ext:
         allow_ext = {"." + e.strip().lstrip(".") for e in include_ext.split(",") if e.strip()}
-    changed = 0
-    previews: list[str] = []
-    for path in root.glob(file_glob):
+    glob_regex = compile_glob(file_glob)
+
+    # the trigram index narrows the tree to files that can contain a match
+    index = get_index(root)
+    index.refresh()
+    candidates: set[Path] = set()
+    for literals in literal_groups:
+        candidates.update(index.candidates(literals, refresh=False))
+    files = sorted(
+        p for p in candidates
+        if glob_regex.fullmatch(p.relative_to(root).as_posix()) and not (allow_ext and p.suffix not in allow_ext)
+    )
+
+    def work(path: Path):
         try:
-            if path.is_dir() or path.name in _DEFAULT_IGNORE_DIRS:
-                continue
-            if allow_ext and path.suffix not in allow_ext:
-                continue
-            # size cap
-            if path.stat().st_size > 1_000_000:
-                continue
-            text = path.read_text(errors="ignore")
-            if query not in text:
-                continue
-            new_text = text.replace(query, replacement)
-            if new_text == text:
-                continue
-            # diff preview
-            diff = "".join(unified_diff(text.splitlines(keepends=True), new_text.splitlines(keepends=True), fromfile=str(path), tofile=f"{path} (proposed)"))
-            previews.append(diff or f"(changes in {path})")
-            changed += 1
-            # apply or queue via propose_write
-            if not dry_run:
-                _ = propose_write(str(path), new_text, create=True)
-            if changed >= max_files:
-                break
+            return _replace_one(path, replace)
         except Exception:
-            continue
-    if not changed:
+            return None
+
+    changes = []
+    pool = ThreadPoolExecutor(max_workers=default_workers(), thread_name_prefix="replace")
+    try:
+        for result in pool.map(work, files):
+            if result is not None:
+                changes.append(result)
+                if len(changes) >= max_files:
+                    break
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    if not changes:
         return "(no changes)"
-    header = f"affected files: {changed}{' (preview only)' if dry_run else ''}"
-    return header + "\n\n" + ("\n\n".join(previews[:10]) + ("\n... [more diffs omitted]" if len(previews) > 10 else ""))
+
+    # diffs are rendered only for the previews that are shown
+    previews = [render_diff(path, old, new) or f"(changes in {path})"
+                for path, _, old, new, _ in changes[:_REPLACE_PREVIEWS]]
+    if not dry_run:
+        if config.ALLOW_FS_WRITE and config.ALLOW_AUTO_APPLY:
+            batch = WriteBatch(journal=True)
+            for path, _, _, new, _ in changes:
+                batch.add_text(path, new)
+            batch.commit()
+        else:
+            spill_dir = proposals_dir(root)
+            for i, (path, base_hash, old, new, _) in enumerate(changes):
+                diff = previews[i] if i < len(previews) else None
+                PENDING_WRITES.append(Proposal.create(str(path), base_hash, old, new, diff, spill_dir))
+    total = sum(c[4] for c in changes)
+    header = f"affected files: {len(changes)}, replacements: {total}{' (preview only)' if dry_run else ''}"
+    return header + "\n\n" + ("\n\n".join(previews) + ("\n... [more diffs omitted]" if len(changes) > len(previews) else ""))
 
 def get_default_tools() -> List[Callable]:
     """Return a minimal default toolset."""
@@ -521,4 +705,7 @@ def get_default_tools() -> List[Callable]:
         tasks_clear,
         replace_in_files,
         code_search,
+        find_definition,
+        find_references,
+        list_symbols,
     ]
@@ -16,6 +16,7 @@ from pathlib import Path
 from typing import Any, List
 from datetime import datetime
 
+from deepagents_cli.agent.atomic_write import recover_interrupted_writes
 from deepagents_cli.agent.factory import create_agent
 from deepagents_cli.agent import config as cfg
 from deepagents_cli.agent.status_line import get_status_line
@@ -152,6 +153,7 @@ def main(argv: List[str]) -> int:
             return 1
     cfg.set_allow_fs_write(bool(args.allow_write))
     cfg.set_allow_auto_apply(bool(args.auto_apply))
+    recovered = recover_interrupted_writes()
 
     # Initialize UI
     ui = ClaudeCodeUI()
@@ -159,6 +161,8 @@ def main(argv: List[str]) -> int:
     
     # Print header
     ui.print_header()
+    if recovered:
+        console.print(f"[dim][sandbox][/dim] {recovered}")
     
     # Create agent
     try:
@@ -13,6 +13,7 @@ import signal
 from pathlib import Path
 from typing import Any
 
+from deepagents_cli.agent.atomic_write import recover_interrupted_writes
 from deepagents_cli.agent.factory import create_agent
 from deepagents_cli.agent import config as cfg
 from deepagents_cli.terminal_ui import TerminalUI
@@ -72,6 +73,7 @@ def main(argv: list[str]) -> int:
             return 1
     cfg.set_allow_fs_write(bool(args.allow_write))
     cfg.set_allow_auto_apply(bool(args.auto_apply))
+    recovered = recover_interrupted_writes()
 
     # Create agent
     try:
@@ -87,6 +89,8 @@ def main(argv: list[str]) -> int:
     ui.add_conversation_line(f"Sandbox root: {cfg.FS_ROOT}", "system")
     ui.add_conversation_line(f"Write enabled: {cfg.ALLOW_FS_WRITE}", "system")
     ui.add_conversation_line(f"Auto-apply: {cfg.ALLOW_AUTO_APPLY}", "system")
+    if recovered:
+        ui.add_conversation_line(recovered, "system")
     ui.add_conversation_line("", "system")  # Empty line
     
     # Handle Ctrl+C gracefully
@@ -20,6 +20,7 @@ from deepagents_cli.agent.logging import set_verbose, is_verbose
 from deepagents_cli.agent.state import save_vfs, load_vfs
 from deepagents_cli.agent.factory import get_last_selection
 from deepagents_cli.agent import config as cfg
+from deepagents_cli.agent.atomic_write import recover_interrupted_writes
 from rich.console import Console
 from rich.markdown import Markdown
 from rich.panel import Panel
@@ -31,6 +32,7 @@ from deepagents_cli.agent.tools import (
     fs_glob as _tool_fs_glob,
     list_pending_writes as _list_pending_writes,
     apply_pending_write as _apply_pending_write,
+    apply_pending_writes as _apply_pending_writes,
     clear_pending_write as _clear_pending_write,
 )
 try:
@@ -107,6 +109,7 @@ Commands:
   :model          Show provider/model selection and env-based priority
   :model!         Force model initialization, then show selection
   :safety         Show safety settings and conversation stats
+  :cache          Show file content cache hit/miss statistics
   :log on|off     Toggle trace logging for tool calls
   :debug on|off   Toggle raw result debug printing
   :stream on|off  Toggle streaming output (if supported)
@@ -201,6 +204,7 @@ def main(argv: List[str]) -> int:
     parser.add_argument("--cwd", type=str, default=None, help="Set working directory/sandbox root")
     parser.add_argument("--allow-write", action="store_true", help="Allow host filesystem writes (default off)")
     parser.add_argument("--auto-apply", action="store_true", help="Auto-apply write proposals (requires --allow-write)")
+    parser.add_argument("--no-fsync", action="store_true", help="Skip fsync on file writes (faster, less crash-safe)")
     args = parser.parse_args(argv)
 
     # Configure sandbox root and write policy
@@ -215,12 +219,16 @@ def main(argv: List[str]) -> int:
         pass
     cfg.set_allow_fs_write(bool(args.allow_write))
     cfg.set_allow_auto_apply(bool(args.auto_apply))
+    cfg.set_fsync_writes(not args.no_fsync)
+    recovered = recover_interrupted_writes()
 
     console.print("🧠 [bold]DeepAgents CLI[/bold] — type [cyan]:help[/cyan] for commands.")
     console.print("[dim]([yellow]Your text[/yellow] is yellow, [white]DeepAgents responses[/white] are white)[/dim]\n")
     console.print(f"[dim][sandbox][/dim] root: [bold]{cfg.FS_ROOT}[/bold]")
     console.print(f"[dim][sandbox][/dim] write-enabled: [bold]{cfg.ALLOW_FS_WRITE}[/bold]")
     console.print(f"[dim][sandbox][/dim] auto-apply: [bold]{cfg.ALLOW_AUTO_APPLY}[/bold]")
+    if recovered:
+        console.print(f"[dim][sandbox][/dim] {recovered}")
     
     # Show initial status line
     try:
@@ -257,6 +265,9 @@ def main(argv: List[str]) -> int:
             try:
                 cfg.set_fs_root(bare_path)
                 console.print(f"[sandbox] root: [bold]{cfg.FS_ROOT}[/bold]")
+                recovered = recover_interrupted_writes()
+                if recovered:
+                    console.print(f"[sandbox] {recovered}")
                 continue
             except Exception as e:
                 console.print(Panel.fit(str(e), title=":cd error", border_style="red"))
@@ -283,6 +294,9 @@ def main(argv: List[str]) -> int:
                 try:
                     cfg.set_fs_root(parts[1].strip())
                     console.print(f"[sandbox] root: [bold]{cfg.FS_ROOT}[/bold]")
+                    recovered = recover_interrupted_writes()
+                    if recovered:
+                        console.print(f"[sandbox] {recovered}")
                 except Exception as e:
                     console.print(Panel.fit(str(e), title=":cd error", border_style="red"))
             else:
@@ -335,15 +349,8 @@ def main(argv: List[str]) -> int:
                 target = parts[1].strip().lower()
                 try:
                     if target == "all":
-                        applied = 0
-                        while True:
-                            proposals = _list_pending_writes()
-                            if not proposals:
-                                break
-                            _apply_pending_write(0)
-                            _clear_pending_write(0)
-                            applied += 1
-                        console.print(f"applied {applied} proposals")
+                        # validated up front, written concurrently, committed as one transaction
+                        console.print(_apply_pending_writes())
                     else:
                         idx = int(target)
                         msg = _apply_pending_write(idx)
@@ -400,6 +407,19 @@ def main(argv: List[str]) -> int:
                 title="Safety Controls", border_style="green"
             ))
             continue
+        if user == ":cache":
+            from deepagents_cli.agent.content_cache import content_cache
+            stats = content_cache.stats()
+            lookups = stats["hits"] + stats["misses"]
+            rate = f"{100 * stats['hits'] / lookups:.0f}%" if lookups else "n/a"
+            console.print(Panel.fit(
+                f"File Content Cache:\n"
+                f"• Hits: {stats['hits']}  Misses: {stats['misses']}  (hit rate {rate})\n"
+                f"• Entries: {stats['entries']}  Evictions: {stats['evictions']}\n"
+                f"• Size: {stats['bytes'] / 1024 / 1024:.1f} / {stats['max_bytes'] / 1024 / 1024:.0f} MB",
+                title="Cache", border_style="green"
+            ))
+            continue
         if user.startswith(":log"):
             parts = user.split()
             if len(parts) == 2 and parts[1].lower() in ("on", "off"):
@@ -18,6 +18,7 @@ from typing import Any, List
 from datetime import datetime
 
 # Import DeepAgents components
+from deepagents_cli.agent.atomic_write import recover_interrupted_writes
 from deepagents_cli.agent.factory import create_agent
 from deepagents_cli.agent.tools import get_default_tools
 from deepagents_cli.agent.logging import set_verbose, is_verbose
@@ -203,11 +204,14 @@ def main(argv: List[str]) -> int:
             return 1
     cfg.set_allow_fs_write(bool(args.allow_write))
     cfg.set_allow_auto_apply(bool(args.auto_apply))
+    recovered = recover_interrupted_writes()
 
     # Create UI
     ui = ClaudeCodeStyleUI()
     ui.running = True
     ui.start_live_display()
+    if recovered:
+        ui.add_message(recovered, "system")
     
     # Create agent
     try:
@@ -13,6 +13,7 @@ import threading
 import time
 from typing import Any, List, Optional
 
+from deepagents_cli.agent.atomic_write import recover_interrupted_writes
 from deepagents_cli.agent.factory import create_agent
 from deepagents_cli.agent import config as cfg
 from deepagents_cli.agent.status_line import get_status_line
@@ -240,6 +241,7 @@ def main(argv: List[str]) -> int:
             return 1
     cfg.set_allow_fs_write(bool(args.allow_write))
     cfg.set_allow_auto_apply(bool(args.auto_apply))
+    recovered = recover_interrupted_writes()
     
     # Create components
     try:
@@ -255,6 +257,8 @@ def main(argv: List[str]) -> int:
     ui.add_message("🧠 DeepAgents CLI — type :help for commands.", "system")
     ui.add_message("(Your text is yellow, DeepAgents responses are white)", "system")
     ui.add_message(f"Sandbox: {cfg.FS_ROOT} | Write: {cfg.ALLOW_FS_WRITE}", "system")
+    if recovered:
+        ui.add_message(recovered, "system")
     ui.add_message("", "system")  # Empty line
     
     layout = ui.create_layout()
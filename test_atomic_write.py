@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Test atomic writes:
+- permission bits are kept and a symlink's target is written through
+- a new file's mode follows the umask current at the time of the write
+- a read-only target is refused with PermissionError and nothing in the batch is written
+- fsync is skipped when set_fsync_writes(False) (--no-fsync)
+- a failed rename leaves the target untouched and no temp file behind
+- a journaled batch whose rename fails is rolled back to the old contents
+- a journal left by a crash is rolled back when a session that may write opens the root,
+  and the restored files are reported; set_fs_root alone touches nothing
+- the .deepagents state dir is created git-ignored
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from deepagents_cli.agent import atomic_write, config, tools
+from deepagents_cli.agent.atomic_write import WriteBatch, atomic_write_text, recover_interrupted_writes
+from deepagents_cli.agent.journal import JournalEntry, journal_dir, pending_journals, write_journal
+
+
+def test_permissions_kept_and_symlinks_written_through():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        path = root / "script.sh"
+        path.write_text("old\n")
+        path.chmod(0o750)
+        atomic_write_text(path, "new\n", fsync=False)
+        assert path.read_text() == "new\n"
+        assert path.stat().st_mode & 0o7777 == 0o750
+        link = root / "link.sh"
+        link.symlink_to(path)
+        atomic_write_text(link, "through the link\n", fsync=False)
+        assert link.is_symlink()
+        assert path.read_text() == "through the link\n"
+        assert path.stat().st_mode & 0o7777 == 0o750
+
+
+def test_new_file_mode_follows_current_umask():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "new.txt"
+        saved = os.umask(0o077)
+        try:
+            atomic_write_text(path, "private\n", fsync=False)
+        finally:
+            os.umask(saved)
+        assert path.stat().st_mode & 0o7777 == 0o600
+        atomic_write_text(Path(tmp) / "other.txt", "default\n", fsync=False)
+        assert (Path(tmp) / "other.txt").stat().st_mode & 0o7777 == 0o666 & ~saved
+
+
+def test_read_only_target_is_refused():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        locked, free = root / "locked.txt", root / "free.txt"
+        locked.write_text("old\n")
+        locked.chmod(0o444)
+        free.write_text("old\n")
+        real_access = os.access
+
+        def access(path, mode):
+            # root may write any file, so deny the write explicitly
+            if os.path.samefile(path, locked) and mode & os.W_OK:
+                return False
+            return real_access(path, mode)
+
+        atomic_write.os.access = access
+        try:
+            batch = WriteBatch(fsync=False)
+            batch.add_text(free, "new\n")
+            batch.add_text(locked, "new\n")
+            try:
+                batch.commit()
+                assert False, "writing a read-only file should fail"
+            except PermissionError as e:
+                assert e.filename == str(locked)
+        finally:
+            atomic_write.os.access = real_access
+            locked.chmod(0o644)
+        assert locked.read_text() == "old\n" and free.read_text() == "old\n"
+        assert sorted(p.name for p in root.iterdir()) == ["free.txt", "locked.txt"]
+
+
+def test_fsync_follows_config():
+    saved = config.FSYNC_WRITES
+    real_fsync = os.fsync
+    calls = []
+    atomic_write.os.fsync = lambda fd: (calls.append(fd), real_fsync(fd))[1]
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "a.txt"
+            config.set_fsync_writes(True)
+            atomic_write_text(path, "synced\n")
+            assert len(calls) >= 1
+            calls.clear()
+            config.set_fsync_writes(False)
+            atomic_write_text(path, "not synced\n")
+            assert calls == []
+            assert path.read_text() == "not synced\n"
+    finally:
+        atomic_write.os.fsync = real_fsync
+        config.set_fsync_writes(saved)
+
+
+def test_failed_rename_leaves_no_temp_file():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        path = root / "a.txt"
+        path.write_text("old\n")
+        real_replace = os.replace
+
+        def failing_replace(src, dst):
+            raise OSError("disk full")
+
+        atomic_write.os.replace = failing_replace
+        try:
+            atomic_write_text(path, "new\n", fsync=False)
+            assert False, "the failed rename should propagate"
+        except OSError:
+            pass
+        finally:
+            atomic_write.os.replace = real_replace
+        assert path.read_text() == "old\n"
+        assert [p.name for p in root.iterdir()] == ["a.txt"]
+
+
+def test_failed_rename_rolls_back_journaled_batch():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        first, second, created = root / "a.txt", root / "b.txt", root / "new.txt"
+        first.write_text("old a\n")
+        second.write_text("old b\n")
+        batch = WriteBatch(fsync=False, journal=True, root=root, workers=1)
+        batch.add_text(first, "new a\n")
+        batch.add_text(created, "created\n")
+        batch.add_text(second, "new b\n")
+        real_replace = os.replace
+
+        def failing_replace(src, dst):
+            if str(dst) == os.path.realpath(second):
+                raise OSError("disk full")
+            return real_replace(src, dst)
+
+        atomic_write.os.replace = failing_replace
+        try:
+            batch.commit()
+            assert False, "the failed rename should propagate"
+        except OSError:
+            pass
+        finally:
+            atomic_write.os.replace = real_replace
+        assert first.read_text() == "old a\n"
+        assert second.read_text() == "old b\n"
+        assert not created.exists()
+        assert pending_journals(root) == []
+        assert not any(p.suffix == ".tmp" for p in root.iterdir())
+
+
+def interrupted_batch(root: Path) -> Path:
+    """Leave a journaled write to ``root/a.txt`` as a crash after the rename would."""
+    path = root / "a.txt"
+    path.write_bytes(b"before\n")
+    entry = JournalEntry.diff(str(path), b"before\n", b"after\n")
+    lock = write_journal(journal_dir(root), [entry], fsync=False)
+    path.write_bytes(b"after\n")
+    lock.release(delete_journal=False)  # the journal outlives its lock
+    return path
+
+
+def test_interrupted_batch_recovered_only_with_writes_allowed():
+    saved = config.FS_ROOT, config.ALLOW_FS_WRITE
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp).resolve()
+        path = interrupted_batch(root)
+        try:
+            config.set_fs_root(root)
+            config.set_allow_fs_write(False)
+            assert recover_interrupted_writes() == ""
+            assert path.read_bytes() == b"after\n" and len(pending_journals(root)) == 1
+            config.set_allow_fs_write(True)
+            notice = recover_interrupted_writes()
+            assert notice.startswith("Rolled back 1 file(s)") and notice.endswith(": a.txt")
+            assert path.read_bytes() == b"before\n"
+            assert pending_journals(root) == []
+            assert recover_interrupted_writes() == ""  # once per root
+        finally:
+            config.set_fs_root(saved[0])
+            config.set_allow_fs_write(saved[1])
+
+
+def test_fs_set_root_reports_restored_files():
+    saved = config.FS_ROOT, config.ALLOW_FS_WRITE
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp).resolve()
+        path = interrupted_batch(root)
+        try:
+            config.set_allow_fs_write(True)
+            out = tools.fs_set_root(str(root))
+            assert out.splitlines()[0] == str(root)
+            assert out.splitlines()[1].endswith(": a.txt")
+            assert path.read_bytes() == b"before\n"
+        finally:
+            config.set_fs_root(saved[0])
+            config.set_allow_fs_write(saved[1])
+
+
+def test_state_dir_is_git_ignored():
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = journal_dir(tmp)
+        write_journal(directory, [], fsync=False).release()
+        state = Path(tmp) / config.STATE_DIRNAME
+        assert directory.parent == state and directory.is_dir()
+        assert (state / ".gitignore").read_text() == "*\n"
+
+
+if __name__ == "__main__":
+    print("🧪 Testing atomic writes...\n")
+    tests = [(name, fn) for name, fn in list(globals().items()) if name.startswith("test_")]
+    for name, fn in tests:
+        fn()
+        print(f"  ✓ {name}")
+    print(f"\n✅ {len(tests)} tests passed!")
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test the content-addressed backup store:
+- identical content is stored once
+- repeated undo steps back through history, and the undone content can be restored
+- eviction keeps the version just added even when it alone exceeds the cap
+- eviction drops undo cursors that point at evicted versions
+- no sqlite connection is left open
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+from contextlib import closing
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from deepagents_cli.agent import backup_store
+from deepagents_cli.agent.backup_store import BackupStore
+
+
+def objects(store):
+    return [p for p in store.objects_dir.rglob("*") if p.is_file()]
+
+
+def test_identical_content_is_stored_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        store = BackupStore(root / "store")
+        first, second = root / "a.txt", root / "b.txt"
+        first.write_text("same\n")
+        second.write_text("same\n")
+        store.backup(first)
+        store.backup(first)  # unchanged since the last backup: no new version
+        store.backup(second)
+        assert len(objects(store)) == 1
+        assert [len(store.versions(p)) for p in (first, second)] == [1, 1]
+        assert store.backup(root / "missing.txt") is None
+
+
+def test_repeated_undo_walks_back():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        store = BackupStore(root / "store")
+        path = root / "a.txt"
+        for k in range(3):
+            path.write_text(f"v{k}\n")
+            store.backup(path)
+        path.write_text("v3\n")
+        assert [step for step, _ in store.undo_steps(path)] == [1, 2, 3]
+        store.restore(path)
+        assert path.read_text() == "v2\n"
+        store.restore(path)
+        assert path.read_text() == "v1\n"
+        undone = [v for v in store.versions(path) if v.undo]
+        assert len(undone) == 1
+        store.restore(path, version_id=undone[0].id)
+        assert path.read_text() == "v3\n"
+        try:
+            store.restore(path, steps=10)
+            assert False, "restoring past the history should fail"
+        except LookupError:
+            pass
+
+
+def test_eviction_keeps_the_new_version():
+    saved = backup_store.MAX_VERSIONS_PER_PATH
+    backup_store.MAX_VERSIONS_PER_PATH = 3
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            path = root / "a.bin"
+            capped = BackupStore(root / "capped", max_bytes=1)
+            for _ in range(2):
+                path.write_bytes(os.urandom(1000))
+                version = capped.backup(path)
+                assert version is not None
+                assert [v.id for v in capped.versions(path)] == [version.id]
+                assert capped.read(version) == path.read_bytes()
+            assert len(objects(capped)) == 1
+
+            store = BackupStore(root / "store")
+            for k in range(6):
+                path.write_text(f"w{k}")
+                store.backup(path)
+            assert [store.read(v) for v in store.versions(path)] == [b"w5", b"w4", b"w3"]
+    finally:
+        backup_store.MAX_VERSIONS_PER_PATH = saved
+
+
+def test_eviction_drops_dangling_cursors():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        store = BackupStore(root / "store")
+        path, other = root / "a.txt", root / "b.txt"
+        for k in range(3):
+            path.write_text(f"v{k}\n")
+            store.backup(path)
+        store.restore(path)
+        assert path.read_text() == "v2\n"
+        store.max_bytes = 1
+        other.write_text("evicts everything else\n")
+        store.backup(other)
+        with closing(sqlite3.connect(store.db_path)) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM cursors").fetchone()[0] == 0
+        assert store.undo_steps(path) == []
+        try:
+            store.restore(path)
+            assert False, "every version of a.txt was evicted"
+        except LookupError:
+            pass
+
+
+def test_connections_are_closed():
+    if not os.path.isdir("/proc/self/fd"):
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        store = BackupStore(root / "store")
+        path = root / "a.txt"
+        before = len(os.listdir("/proc/self/fd"))
+        for k in range(20):
+            path.write_text(f"v{k}\n")
+            store.backup(path)
+            store.versions(path)
+        store.restore(path)
+        assert len(os.listdir("/proc/self/fd")) <= before
+
+
+if __name__ == "__main__":
+    print("🧪 Testing the backup store...\n")
+    tests = [(name, fn) for name, fn in list(globals().items()) if name.startswith("test_")]
+    for name, fn in tests:
+        fn()
+        print(f"  ✓ {name}")
+    print(f"\n✅ {len(tests)} tests passed!")
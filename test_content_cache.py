@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test the shared file content cache:
+- repeat reads are hits; any size, mtime or inode change is a miss
+- eviction is least recently used, bounded by bytes
+- oversized files and populate=False reads are never stored
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from deepagents_cli.agent.content_cache import ContentCache
+
+
+def test_hits_and_stat_invalidation():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "a.txt"
+        path.write_bytes(b"one\r\ntwo\n")
+        cache = ContentCache()
+        assert cache.read_text(path) == "one\ntwo\n"
+        assert cache.read_bytes(path) == b"one\r\ntwo\n"
+        assert (cache.hits, cache.misses) == (1, 1)
+        # same size, new mtime
+        path.write_bytes(b"ONE\r\ntwo\n")
+        st = path.stat()
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+        assert cache.read_text(path) == "ONE\ntwo\n"
+        # replaced by another file (new inode) with the same size and mtime
+        other = Path(tmp) / "b.txt"
+        other.write_bytes(b"one\r\nTWO\n")
+        os.utime(other, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+        os.replace(other, path)
+        assert cache.read_text(path) == "one\nTWO\n"
+        assert cache.misses == 3
+        cache.invalidate(path)
+        cache.read_bytes(path)
+        assert cache.misses == 4
+
+
+def test_lru_eviction_by_bytes():
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for name in "abc":
+            path = Path(tmp) / name
+            path.write_bytes(name.encode() * 40)
+            paths.append(path)
+        cache = ContentCache(max_bytes=100, max_entry_bytes=100)
+        cache.read_bytes(paths[0])
+        cache.read_bytes(paths[1])
+        cache.read_bytes(paths[0])  # b is now the least recently used
+        cache.read_bytes(paths[2])
+        assert cache.stats()["entries"] == 2 and cache.evictions == 1
+        hits = cache.hits
+        cache.read_bytes(paths[0])
+        cache.read_bytes(paths[2])
+        assert cache.hits == hits + 2
+        cache.read_bytes(paths[1])
+        assert cache.hits == hits + 2
+
+
+def test_oversized_and_bulk_reads_are_not_stored():
+    with tempfile.TemporaryDirectory() as tmp:
+        big, small = Path(tmp) / "big", Path(tmp) / "small"
+        big.write_bytes(b"x" * 50)
+        small.write_bytes(b"y" * 10)
+        cache = ContentCache(max_bytes=1000, max_entry_bytes=20)
+        assert cache.read_bytes(big) == b"x" * 50
+        assert cache.read_bytes(small, populate=False) == b"y" * 10
+        assert cache.stats()["entries"] == 0
+        cache.read_bytes(small)
+        assert cache.read_bytes(small, populate=False) == b"y" * 10
+        assert cache.hits == 1  # bulk reads still use entries that are already cached
+
+
+if __name__ == "__main__":
+    print("🧪 Testing the content cache...\n")
+    tests = [(name, fn) for name, fn in list(globals().items()) if name.startswith("test_")]
+    for name, fn in tests:
+        fn()
+        print(f"  ✓ {name}")
+    print(f"\n✅ {len(tests)} tests passed!")
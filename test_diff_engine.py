@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test the proposal diff engine:
+- opcodes always rebuild the new side, and hunks group like difflib's
+- large files split on unique lines to the minimal change
+- an exhausted time budget or preview cap is reported, never hidden
+- a hunk cut short by the preview cap has header counts matching its lines
+"""
+import difflib
+import random
+import re
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from deepagents_cli.agent import diff_engine
+
+
+def rebuild(a, b, codes):
+    out, i, j = [], 0, 0
+    for tag, i1, i2, j1, j2 in codes:
+        assert (i1, j1) == (i, j), codes
+        if tag == "equal":
+            assert a[i1:i2] == b[j1:j2]
+        out.extend(a[i1:i2] if tag == "equal" else b[j1:j2])
+        i, j = i2, j2
+    assert (i, j) == (len(a), len(b))
+    return out
+
+
+def test_opcodes_rebuild_and_group_like_difflib():
+    rng = random.Random(24)
+    words = [f"{c}\n" for c in "abcdefg"]
+    for _ in range(500):
+        a = [rng.choice(words) for _ in range(rng.randint(0, 40))]
+        b = list(a)
+        for _ in range(rng.randint(0, 6)):
+            k = rng.randint(0, len(b))
+            b[k:k + rng.randint(0, 3)] = [rng.choice(words) for _ in range(rng.randint(0, 3))]
+        codes, exact = diff_engine.opcodes(a, b)
+        assert exact and rebuild(a, b, codes) == b
+        matcher = difflib.SequenceMatcher(None, a, b)
+        matcher.get_opcodes = lambda codes=codes: list(codes)
+        assert list(diff_engine.group_opcodes(codes)) == list(matcher.get_grouped_opcodes(3))
+
+
+def test_large_file_small_edit():
+    a = [f"line {i}\n" for i in range(3000)]
+    b = list(a)
+    b[100:110] = ["x\n"] * 5
+    b.insert(2000, "y\n")
+    codes, exact = diff_engine.opcodes(a, b)
+    assert exact
+    assert [c for c in codes if c[0] != "equal"] == [
+        ("replace", 100, 110, 100, 105), ("insert", 2005, 2005, 2000, 2001)]
+    text = diff_engine.unified_diff(a, b, "a", "b")
+    assert text.startswith("--- a\n+++ b\n@@ -98,16 +98,11 @@\n")
+    assert text.count("@@ -") == 2
+
+
+def test_budget_and_preview_cap_are_reported():
+    a = [f"l{i}\n" for i in range(100)]
+    b = [f"m{i}\n" if i % 2 else line for i, line in enumerate(a)]
+    codes, exact = diff_engine.opcodes(a, b, budget=0)
+    assert not exact and rebuild(a, b, codes) == b
+    assert diff_engine.unified_diff(a, b, budget=0).endswith("[diff is approximate: time budget exceeded]\n")
+    text = diff_engine.unified_diff(a, b, max_lines=6)
+    assert text.endswith("[diff truncated after 6 lines: +48 -48 more lines]\n")
+    assert diff_engine.unified_diff(a, a) == ""
+
+
+def check_hunks(text: str) -> list:
+    """Assert every hunk's header counts match its body; return the body line prefixes."""
+    lines = text.splitlines(keepends=True)
+    prefixes = []
+    k = 0
+    while k < len(lines):
+        match = re.match(r"@@ -\d+(?:,(\d+))? \+\d+(?:,(\d+))? @@", lines[k])
+        k += 1
+        if not match:
+            continue
+        old = int(match.group(1) or 1)
+        new = int(match.group(2) or 1)
+        while k < len(lines) and lines[k][:1] in (" ", "-", "+") and not lines[k].startswith(("---", "+++")):
+            old -= lines[k][0] in " -"
+            new -= lines[k][0] in " +"
+            prefixes.append(lines[k][0])
+            k += 1
+        assert (old, new) == (0, 0), text
+    return prefixes
+
+
+def test_truncated_hunk_headers_match_body():
+    a = [f"l{i}\n" for i in range(60)]
+    b = list(a)
+    b[10:30] = [f"new {i}\n" for i in range(25)]
+    b[50:52] = []
+    full = diff_engine.unified_diff(a, b, "a", "b", max_lines=None)
+    assert full == "".join(difflib.unified_diff(a, b, "a", "b"))
+    for max_lines in range(0, 60):
+        text = diff_engine.unified_diff(a, b, "a", "b", max_lines=max_lines)
+        prefixes = check_hunks(text)
+        assert len(prefixes) <= max_lines
+        shown_removed, shown_added = prefixes.count("-"), prefixes.count("+")
+        match = re.search(r"\+(\d+) -(\d+) more lines", text)
+        hidden_added, hidden_removed = map(int, match.groups()) if match else (0, 0)
+        assert (shown_added + hidden_added, shown_removed + hidden_removed) == (25, 22)
+
+
+if __name__ == "__main__":
+    print("🧪 Testing the diff engine...\n")
+    tests = [(name, fn) for name, fn in list(globals().items()) if name.startswith("test_")]
+    for name, fn in tests:
+        fn()
+        print(f"  ✓ {name}")
+    print(f"\n✅ {len(tests)} tests passed!")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test the directory listing cache behind fs_tree and project_structure:
+- cached entries keep the real file type: broken symlinks and FIFOs are not files
+- a listing is reused while the directory's mtime is unchanged
+- a listing taken within the mtime-granularity window is not trusted,
+  so a file created in the same timestamp tick still shows up
+- fs_tree and project_structure pick up added and removed files
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from deepagents_cli.agent import config
+from deepagents_cli.agent.claude_tools import project_structure
+from deepagents_cli.agent.fs_walk import DirCache, scan_dir
+from deepagents_cli.agent.tools import fs_tree
+
+
+def age(path: Path, seconds: int = 60) -> None:
+    """Move a directory's mtime out of the racy window so its listing is cached."""
+    past = time.time_ns() - seconds * 1_000_000_000
+    os.utime(path, ns=(past, past))
+
+
+def test_cached_entry_types():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        (root / "file.txt").write_text("x")
+        (root / "dir").mkdir()
+        (root / "link.txt").symlink_to(root / "file.txt")
+        (root / "broken").symlink_to(root / "missing")
+        os.mkfifo(root / "fifo")
+        age(root)
+        kinds = {e.name: (e.is_dir(), e.is_file(), e.is_symlink()) for e in scan_dir(root, cached=True)}
+        assert kinds == {
+            "broken": (False, False, True),
+            "dir": (True, False, False),
+            "fifo": (False, False, False),
+            "file.txt": (False, True, False),
+            "link.txt": (False, True, True),
+        }
+        tree = project_structure(str(root))
+        assert "file.txt (1 bytes)" in tree and "link.txt (1 bytes)" in tree
+        assert "broken" not in tree and "fifo" not in tree
+
+
+def test_listing_reused_until_mtime_changes():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        (root / "a.txt").touch()
+        age(root)
+        cache = DirCache()
+        first = cache.entries(root)
+        assert cache.entries(root) is first
+        (root / "b.txt").touch()
+        assert [e.name for e in cache.entries(root)] == ["a.txt", "b.txt"]
+
+
+def test_racy_listing_is_not_trusted():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        (root / "a.txt").touch()
+        cache = DirCache()
+        st = root.stat()
+        assert [e.name for e in cache.entries(root)] == ["a.txt"]
+        # a file created in the same timestamp tick leaves the directory's mtime unchanged
+        (root / "b.txt").touch()
+        os.utime(root, ns=(st.st_atime_ns, st.st_mtime_ns))
+        assert [e.name for e in cache.entries(root)] == ["a.txt", "b.txt"]
+
+
+def test_tree_tools_follow_changes():
+    saved = config.FS_ROOT, config.ALLOW_FS_READ
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp).resolve()
+        (root / "src").mkdir()
+        (root / "src" / "main.py").write_text("print()\n")
+        age(root / "src")
+        age(root)
+        config.set_fs_root(root)
+        config.ALLOW_FS_READ = True
+        try:
+            assert fs_tree() == "./\nsrc/\n    src/main.py"
+            assert fs_tree() == "./\nsrc/\n    src/main.py"
+            (root / "src" / "util.py").write_text("")
+            (root / "src" / "main.py").unlink()
+            assert fs_tree() == "./\nsrc/\n    src/util.py"
+            structure = project_structure()
+            assert "util.py (0 bytes)" in structure and "main.py" not in structure
+        finally:
+            config.set_fs_root(saved[0])
+            config.ALLOW_FS_READ = saved[1]
+
+
+if __name__ == "__main__":
+    print("🧪 Testing the directory cache...\n")
+    tests = [(name, fn) for name, fn in list(globals().items()) if name.startswith("test_")]
+    for name, fn in tests:
+        fn()
+        print(f"  ✓ {name}")
+    print(f"\n✅ {len(tests)} tests passed!")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test encoding and binary detection:
+- each byte-order mark selects its encoding, even with NUL bytes after it
+- a NUL byte anywhere in the sniffed head means binary
+- a multibyte UTF-8 character cut off at SNIFF_BYTES still reads as UTF-8
+- cp1252 is preferred, latin-1 is the fallback
+- the cached kind is re-sniffed when the file's mtime or size changes
+"""
+import codecs
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from deepagents_cli.agent.file_kind import BINARY, SNIFF_BYTES, UTF8, FileKind, file_kind, sniff_bytes
+
+
+def test_boms():
+    cases = [
+        (codecs.BOM_UTF8 + "héllo".encode("utf-8"), "utf-8-sig"),
+        ("héllo".encode("utf-16"), "utf-16"),
+        (codecs.BOM_UTF16_BE + "hi".encode("utf-16-be"), "utf-16"),
+        ("héllo".encode("utf-32"), "utf-32"),
+        (codecs.BOM_UTF32_BE + "hi".encode("utf-32-be"), "utf-32"),
+    ]
+    for head, encoding in cases:
+        kind = sniff_bytes(head, complete=True)
+        assert kind == FileKind(False, encoding), (head, kind)
+    # UTF-32-LE starts with the UTF-16-LE mark, so the longer mark must win
+    assert sniff_bytes(codecs.BOM_UTF32_LE, complete=True).encoding == "utf-32"
+    assert not sniff_bytes("a".encode("utf-16"), complete=True).ascii_compatible
+
+
+def test_nul_byte_means_binary():
+    assert sniff_bytes(b"plain text\n" * 100 + b"\0tail") is BINARY
+    assert sniff_bytes(b"\0") is BINARY
+    assert sniff_bytes(b"no nul here\n", complete=True) is UTF8
+
+
+def test_utf8_cut_at_sniff_limit():
+    char = "€".encode("utf-8")  # three bytes
+    head = b"a" * (SNIFF_BYTES - 1) + char
+    assert sniff_bytes(head[:SNIFF_BYTES]) is UTF8
+    # a whole file ending mid-character is not UTF-8
+    assert sniff_bytes(head[:SNIFF_BYTES], complete=True).encoding == "cp1252"
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "long.txt"
+        path.write_bytes(head + b"\n")
+        assert file_kind(path) is UTF8
+
+
+def test_cp1252_versus_latin1():
+    assert sniff_bytes("café €5".encode("cp1252"), complete=True).encoding == "cp1252"
+    # 0x81 is unassigned in cp1252, so only latin-1 decodes it
+    assert sniff_bytes(b"caf\xe9 \x81", complete=True).encoding == "latin-1"
+
+
+def test_cached_kind_follows_mtime_and_size():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "a.dat"
+        path.write_bytes(b"text\n")
+        assert file_kind(path) is UTF8
+        st = path.stat()
+        # same size, restored mtime: the cached kind is reused without reading
+        path.write_bytes(b"te\0t\n")
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+        assert file_kind(path) is UTF8
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+        assert file_kind(path) is BINARY
+        st = path.stat()
+        path.write_bytes(b"text again\n")  # a size change alone also invalidates
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+        assert file_kind(path) is UTF8
+
+
+if __name__ == "__main__":
+    print("🧪 Testing file kind detection...\n")
+    tests = [(name, fn) for name, fn in list(globals().items()) if name.startswith("test_")]
+    for name, fn in tests:
+        fn()
+        print(f"  ✓ {name}")
+    print(f"\n✅ {len(tests)} tests passed!")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test streaming reads with continuation cursors:
+- windows of any size reassemble into the file's lines, without stray "\\r"
+- CR-only and mixed line endings are numbered as read_lines numbers them, in line and raw mode
+- raw chunks never split a UTF-8 character
+- a cursor is refused once the file is replaced
+- read_file_stream decodes with the sniffed encoding and refuses UTF-16/32
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from deepagents_cli.agent.claude_file_tools import read_file_stream
+from deepagents_cli.agent.file_stream import read_window
+from deepagents_cli.agent.line_index import read_lines
+
+
+def read_all_lines(path: Path, max_bytes: int, max_lines: int = 3) -> list:
+    """Page through ``path`` and join line pieces back into whole lines."""
+    lines, current, cursor = [], [], None
+    while True:
+        window = read_window(path, cursor, max_lines=max_lines, max_bytes=max_bytes)
+        for i, (_, text) in enumerate(window.lines):
+            assert "\r" not in text
+            current.append(text)
+            if not (window.ends_mid_line and i == len(window.lines) - 1):
+                lines.append("".join(current))
+                current = []
+        cursor = window.cursor
+        if cursor is None:
+            return lines
+
+
+def test_windows_reassemble_crlf_lines():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "crlf.txt"
+        expected = ["short", "x" * 37, "", "é" * 11, "tail"]
+        path.write_bytes("\r\n".join(expected).encode("utf-8"))
+        for max_bytes in (2, 4, 7, 8, 64):
+            assert read_all_lines(path, max_bytes) == expected, max_bytes
+
+
+def test_cr_and_mixed_endings_match_read_lines():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "mixed.txt"
+        path.write_bytes(b"one\rtwo\r\nthree\n\rfive\r\r\nseven\r")
+        expected, total = read_lines(path)
+        assert expected == ["one", "two", "three", "", "five", "", "seven"] and total == 7
+        for max_bytes in (2, 3, 5, 64):
+            assert read_all_lines(path, max_bytes) == expected, max_bytes
+        window = read_window(path, max_lines=None)
+        assert window.lines == list(enumerate(expected, start=1))
+        cursor = None
+        while True:
+            # 4-byte chunks end inside "\r\n" pairs; each pair still counts once
+            window = read_window(path, cursor, max_bytes=4, raw=True)
+            cursor = window.cursor
+            if cursor is None:
+                break
+        assert window.next_line == total + 1
+
+
+def test_raw_chunks_keep_characters_whole():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "utf8.txt"
+        text = "aé€😀\n" * 20
+        path.write_bytes(text.encode("utf-8"))
+        pieces, cursor = [], None
+        while True:
+            window = read_window(path, cursor, max_bytes=5, raw=True)
+            pieces.append(window.text)
+            cursor = window.cursor
+            if cursor is None:
+                break
+        assert "".join(pieces) == text
+
+
+def test_cursor_is_refused_after_replace():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "log.txt"
+        path.write_text("one\ntwo\nthree\n")
+        window = read_window(path, max_lines=1)
+        replacement = Path(tmp) / "new.txt"
+        replacement.write_text("ONE\nTWO\nTHREE\n")
+        replacement.replace(path)
+        try:
+            read_window(path, window.cursor)
+            assert False, "a stale cursor should be refused"
+        except ValueError:
+            pass
+
+
+def test_read_file_stream_encodings():
+    with tempfile.TemporaryDirectory() as tmp:
+        latin = Path(tmp) / "latin.txt"
+        latin.write_bytes("café\r\nnaïve\r\n".encode("cp1252"))
+        out = read_file_stream(str(latin))
+        assert out.splitlines()[:2] == ["    1→café", "    2→naïve"]
+        assert out.endswith("end of file")
+        wide = Path(tmp) / "wide.txt"
+        wide.write_bytes("\ufeffhello\nworld\n".encode("utf-16-le"))
+        assert read_file_stream(str(wide)).startswith("Cannot stream UTF-16 file")
+        assert read_file_stream(str(wide), raw=True).startswith("Cannot stream UTF-16 file")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing streaming reads...\n")
+    tests = [(name, fn) for name, fn in list(globals().items()) if name.startswith("test_")]
+    for name, fn in tests:
+        fn()
+        print(f"  ✓ {name}")
+    print(f"\n✅ {len(tests)} tests passed!")
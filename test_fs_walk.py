@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Test the shared .gitignore-aware directory walker:
+- .gitignore rules, negation, directory-only and anchored patterns, nested files
+- walk order, pruning of ignored directories, max_depth and hidden files
+- iglob agrees with filtering walk, lists only directories that can match, and the glob tools cap results
+- iglob searches an ignore_dirs directory named in the pattern, but not a .gitignore'd one
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from deepagents_cli.agent import config, fs_walk
+from deepagents_cli.agent.claude_file_tools import glob_files_unrestricted
+from deepagents_cli.agent.fs_walk import IgnoreRules, compile_glob, iglob, walk
+from deepagents_cli.agent.tools import fs_glob
+
+
+def make_repo(root: Path) -> None:
+    (root / ".git").mkdir()
+    (root / ".gitignore").write_text("*.log\n!keep.log\nbuild/\n/top.txt\n")
+    for rel in ["app.log", "keep.log", "top.txt", "main.py", ".env",
+                "build/out.o", "src/build", "src/top.txt", "src/local.txt", "src/deep/mod.py",
+                "node_modules/dep/index.js", "local.txt"]:
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(rel)
+    (root / "src" / ".gitignore").write_text("local.txt\n")
+
+
+def test_gitignore_rules():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_repo(root)
+        rules = IgnoreRules(root)
+        assert rules.ignored("app.log", False)
+        assert rules.ignored("src/deep/app.log", False)
+        assert not rules.ignored("keep.log", False)
+        assert rules.ignored("build", True)
+        assert not rules.ignored("src/build", False)  # "build/" only matches directories
+        assert rules.ignored("top.txt", False)
+        assert not rules.ignored("src/top.txt", False)  # "/top.txt" is anchored to the root
+        assert rules.ignored("src/local.txt", False)
+        assert not rules.ignored("local.txt", False)  # src/.gitignore only applies below src
+        assert rules.ignored("node_modules", True)
+        assert not IgnoreRules(root, use_gitignore=False).ignored("app.log", False)
+
+
+def test_walk_prunes_ignored_directories():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_repo(root)
+        rels = [rel for rel, _ in walk(root)]
+        assert rels == [".env", ".gitignore", "keep.log", "local.txt", "main.py",
+                        "src/.gitignore", "src/build", "src/deep/mod.py", "src/top.txt"]
+        with_dirs = [rel for rel, _ in walk(root, include_dirs=True, max_depth=0, show_hidden=False)]
+        assert with_dirs == ["keep.log", "local.txt", "main.py", "src"]
+
+
+def test_iglob_agrees_with_walk():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_repo(root)
+        everything = [rel for rel, _ in walk(root, include_dirs=True)]
+        for pattern in ["**/*.py", "*.log", "src/**", "src/*", "**/top.txt", "s*/**/mod.py", "**/deep", "**"]:
+            regex = compile_glob(pattern)
+            expected = [rel for rel in everything if regex.fullmatch(rel)]
+            assert [rel for rel, _ in iglob(root, pattern)] == expected, pattern
+        # a trailing "**" matches directories too, unless include_dirs=False
+        assert [rel for rel, _ in iglob(root, "src/**", include_dirs=False)] == [
+            "src/.gitignore", "src/build", "src/deep/mod.py", "src/top.txt"]
+        # naming a directory skipped by name searches it; a .gitignore'd one stays ignored
+        assert [rel for rel, _ in iglob(root, "node_modules/*/*.js")] == ["node_modules/dep/index.js"]
+        assert [rel for rel, _ in iglob(root, "build/*.o")] == []
+
+
+def test_iglob_lists_only_directories_that_can_match():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_repo(root)
+        listed = []
+        real_scan_dir = fs_walk.scan_dir
+
+        def recording_scan_dir(path, *args, **kwargs):
+            listed.append(Path(path).relative_to(root).as_posix())
+            return real_scan_dir(path, *args, **kwargs)
+
+        fs_walk.scan_dir = recording_scan_dir
+        try:
+            assert [rel for rel, _ in iglob(root, "src/deep/*.py")] == ["src/deep/mod.py"]
+            assert listed == ["src/deep"]
+            listed.clear()
+            assert [rel for rel, _ in iglob(root, "src/*/mod.py")] == ["src/deep/mod.py"]
+            assert listed == ["src", "src/deep"]
+        finally:
+            fs_walk.scan_dir = real_scan_dir
+
+
+def test_glob_tools_sort_and_cap_results():
+    saved_root = config.FS_ROOT
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp).resolve()
+        for name in ["b.py", "a-c.py", "a/z.py", "a/b/y.py"]:
+            (root / name).parent.mkdir(parents=True, exist_ok=True)
+            (root / name).write_text("x\n")
+        out = glob_files_unrestricted("**/*.py", str(root)).splitlines()
+        assert [line.split()[1] for line in out[2:]] == ["a/b/y.py", "a/z.py", "a-c.py", "b.py"]
+        out = glob_files_unrestricted("**/*.py", str(root), max_results=2).splitlines()
+        assert out[0] == "Found more than 2 files matching '**/*.py' (showing first 2):"
+        assert len(out) == 4
+        config.set_fs_root(root)
+        try:
+            assert fs_glob("**/*.py", max_results=3).splitlines()[-1] == "... [truncated at 3 matches]"
+            assert fs_glob("*.py").splitlines() == ["a-c.py", "b.py"]
+            assert fs_glob("*.rs") == "(no matches)"
+        finally:
+            config.set_fs_root(saved_root)
+
+
+if __name__ == "__main__":
+    print("🧪 Testing the directory walker...\n")
+    tests = [(name, fn) for name, fn in list(globals().items()) if name.startswith("test_")]
+    for name, fn in tests:
+        fn()
+        print(f"  ✓ {name}")
+    print(f"\n✅ {len(tests)} tests passed!")
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Test the line-offset index behind ranged reads:
+- ranged reads return the same lines as splitting a full read, for any mix of newlines
+- lines split across read chunks (including a "\\r\\n" pair) are indexed once
+- the cached index is rebuilt when the file changes
+"""
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from deepagents_cli.agent import line_index
+from deepagents_cli.agent.line_index import get_line_index, read_lines, split_lines
+
+
+def test_ranged_reads_match_full_reads():
+    rng = random.Random(5)
+    pieces = ["a", "bc", "é", "\n", "\r\n", "\r", "\x0c", " ", "  "]
+    saved = line_index._CHUNK_BYTES
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "mixed.txt"
+        try:
+            for chunk_bytes in (1, 2, 3, 7, saved):
+                line_index._CHUNK_BYTES = chunk_bytes
+                for _ in range(30):
+                    text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 60)))
+                    path.write_bytes(text.encode("utf-8"))
+                    line_index._INDEXES.clear()
+                    full = split_lines(path.read_text(encoding="utf-8"))
+                    lines, total = read_lines(path)
+                    assert (lines, total) == (full, len(full)), (chunk_bytes, text)
+                    for _ in range(5):
+                        start = rng.randint(1, len(full) + 1)
+                        end = rng.randint(start, len(full) + 1)
+                        assert read_lines(path, start, end)[0] == full[start - 1:end], (text, start, end)
+        finally:
+            line_index._CHUNK_BYTES = saved
+
+
+def test_index_is_rebuilt_after_a_change():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "a.txt"
+        path.write_text("one\ntwo\n")
+        first = get_line_index(path)
+        assert get_line_index(path) is first
+        path.write_text("one\ntwo\nthree\n")
+        assert read_lines(path, 3, 3) == (["three"], 3)
+        assert get_line_index(path) is not first
+
+
+if __name__ == "__main__":
+    print("🧪 Testing the line index...\n")
+    tests = [(name, fn) for name, fn in list(globals().items()) if name.startswith("test_")]
+    for name, fn in tests:
+        fn()
+        print(f"  ✓ {name}")
+    print(f"\n✅ {len(tests)} tests passed!")
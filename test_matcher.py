@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test literal-prefiltered regex matching:
+- LineMatcher finds exactly the lines a per-line re.search finds
+- the literal prefilter never rules out text the regex matches
+"""
+import random
+import re
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from deepagents_cli.agent.matcher import LineMatcher, required_literals
+
+PATTERNS = [r"foo", r"foo\w+bar", r"(?i)FOO", r"ba[rz]", r"x{2,}y", r"(foo|baz)qux", r"\bqux\b", r"é+",
+            r"(?i)éfoo"]
+WORDS = ["foo", "bar", "baz", "qux", "FOO", "xxy", "é", "É", "Foobar", " ", "\t", "fooqux", "x"]
+
+
+def random_text(rng, lines=40):
+    return "\n".join("".join(rng.choice(WORDS) for _ in range(rng.randint(0, 6))) for _ in range(lines))
+
+
+def test_line_matcher_agrees_with_re():
+    rng = random.Random(1)
+    for pattern in PATTERNS:
+        matcher = LineMatcher(pattern)
+        regex = re.compile(pattern)
+        for _ in range(50):
+            text = random_text(rng)
+            lines = text.split("\n")
+            expected = [n for n, line in enumerate(lines, 1) if regex.search(line)]
+            found = list(matcher.iter_lines(text))
+            assert [n for n, _, _ in found] == expected, (pattern, text)
+            for n, start, end in found:
+                assert text[start:end] == lines[n - 1]
+
+
+def test_crlf_lines_exclude_the_carriage_return():
+    matcher = LineMatcher("foo")
+    text = "foo\r\nbar\r\nfoo bar\r\n"
+    assert [text[s:e] for _, s, e in matcher.iter_lines(text)] == ["foo", "foo bar"]
+
+
+def test_prefilter_never_rejects_a_match():
+    rng = random.Random(2)
+    for pattern in PATTERNS:
+        matcher = LineMatcher(pattern)
+        regex = re.compile(pattern)
+        for _ in range(50):
+            text = random_text(rng, lines=3)
+            if regex.search(text):
+                assert matcher.may_match(text), (pattern, text)
+                for encoding in ("utf-8", "cp1252"):
+                    raw = text.encode(encoding)
+                    assert matcher.may_match_bytes(raw, 0, len(raw), encoding), (pattern, encoding, text)
+
+
+def test_required_literals():
+    assert "hello" in required_literals(r"hello\s+world")
+    assert "world" in required_literals(r"hello\s+world")
+    # an alternation requires neither branch
+    assert "foo" not in required_literals(r"foo|bar")
+    assert required_literals(r"\w+") == []
+
+
+if __name__ == "__main__":
+    print("🧪 Testing the regex line matcher...\n")
+    tests = [(name, fn) for name, fn in list(globals().items()) if name.startswith("test_")]
+    for name, fn in tests:
+        fn()
+        print(f"  ✓ {name}")
+    print(f"\n✅ {len(tests)} tests passed!")
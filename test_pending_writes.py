@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test applying queued proposals in bulk (:accept all):
+- every selected proposal is written and removed from the queue
+- the latest proposal for a file wins
+- one stale proposal blocks the whole batch, leaving every file untouched
+"""
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from deepagents_cli.agent import config, tools
+from deepagents_cli.agent.proposals import StaleProposalError
+from deepagents_cli.agent.tools import apply_pending_writes, clear_pending_write, propose_write
+
+
+@contextmanager
+def sandbox():
+    """Temporary FS_ROOT with writes allowed and an empty proposal queue."""
+    saved = (config.FS_ROOT, config.ALLOW_FS_WRITE, config.ALLOW_AUTO_APPLY, config.FSYNC_WRITES)
+    with tempfile.TemporaryDirectory() as tmp:
+        config.set_fs_root(tmp)
+        config.ALLOW_FS_WRITE, config.ALLOW_AUTO_APPLY, config.FSYNC_WRITES = True, False, False
+        clear_pending_write()
+        try:
+            yield config.FS_ROOT
+        finally:
+            clear_pending_write()
+            config.set_fs_root(saved[0])
+            config.ALLOW_FS_WRITE, config.ALLOW_AUTO_APPLY, config.FSYNC_WRITES = saved[1:]
+
+
+def test_apply_all_and_latest_wins():
+    with sandbox() as root:
+        (root / "a.txt").write_text("a\n")
+        propose_write("a.txt", "first\n")
+        propose_write("b/new.txt", "created\n")
+        propose_write("a.txt", "second\n")
+        assert (root / "a.txt").read_text() == "a\n"  # nothing written until accepted
+        out = apply_pending_writes()
+        assert out == "applied 3 proposals to 2 files (1 superseded by later proposals for the same file)"
+        assert (root / "a.txt").read_text() == "second\n"
+        assert (root / "b" / "new.txt").read_text() == "created\n"
+        assert tools.PENDING_WRITES == []
+
+
+def test_selected_ids_leave_the_rest_queued():
+    with sandbox() as root:
+        for name in "abc":
+            (root / f"{name}.txt").write_text(f"{name}\n")
+            propose_write(f"{name}.txt", f"{name.upper()}\n")
+        assert apply_pending_writes([0, 2]) == "applied 2 proposals to 2 files"
+        assert [(root / f"{n}.txt").read_text() for n in "abc"] == ["A\n", "b\n", "C\n"]
+        assert [Path(p.path).name for p in tools.PENDING_WRITES] == ["b.txt"]
+        try:
+            apply_pending_writes([5])
+            assert False, "an unknown id should be refused"
+        except IndexError:
+            pass
+
+
+def test_stale_proposal_blocks_the_batch():
+    with sandbox() as root:
+        (root / "a.txt").write_text("a\n")
+        (root / "b.txt").write_text("b\n")
+        propose_write("a.txt", "A\n")
+        propose_write("b.txt", "B\n")
+        (root / "b.txt").write_text("edited\n")
+        try:
+            apply_pending_writes()
+            assert False, "a stale proposal should block the batch"
+        except StaleProposalError as e:
+            assert "#1" in str(e) and "#0" not in str(e)
+        assert (root / "a.txt").read_text() == "a\n"
+        assert (root / "b.txt").read_text() == "edited\n"
+        assert len(tools.PENDING_WRITES) == 2
+
+
+if __name__ == "__main__":
+    print("🧪 Testing bulk proposal apply...\n")
+    tests = [(name, fn) for name, fn in list(globals().items()) if name.startswith("test_")]
+    for name, fn in tests:
+        fn()
+        print(f"  ✓ {name}")
+    print(f"\n✅ {len(tests)} tests passed!")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test the patch-based pending-write queue:
+- hunks rebuild the proposed content from the base
+- large payloads spill to disk and are removed on discard
+- a proposal whose base file changed is refused instead of overwriting it
+"""
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from deepagents_cli.agent import proposals
+from deepagents_cli.agent.proposals import Proposal, StaleProposalError, apply_hunks, make_hunks, read_base
+
+
+def test_hunks_round_trip():
+    rng = random.Random(21)
+    words = ["a\n", "b\n", "c\n", "d\n", "e\n", "tail"]
+    for _ in range(200):
+        old = [rng.choice(words) for _ in range(rng.randint(0, 12))]
+        new = [rng.choice(words) for _ in range(rng.randint(0, 12))]
+        assert apply_hunks(old, make_hunks(old, new)) == new, (old, new)
+    assert make_hunks(["x\n"], ["x\n"]) == []
+
+
+def test_spilled_payload_is_loaded_and_discarded():
+    saved = proposals.SPILL_CHARS
+    proposals.SPILL_CHARS = 10
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        path = root / "a.txt"
+        path.write_text("one\ntwo\nthree\n")
+        base_hash, old = read_base(path)
+        new = "one\nTWO, now longer\nthree\n"
+        try:
+            proposal = Proposal.create(str(path), base_hash, old, new, spill_dir=proposals.proposals_dir(root))
+        finally:
+            proposals.SPILL_CHARS = saved
+        assert proposal.spill_path is not None and proposal._hunks is None
+        assert (proposal.added, proposal.removed) == (1, 1)
+        assert proposal.new_content() == new
+        assert "+TWO, now longer" in proposal.diff
+        spill = Path(proposal.spill_path)
+        proposal.discard()
+        assert not spill.exists() and proposal.spill_path is None
+
+
+def test_stale_base_is_refused():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "a.txt"
+        path.write_text("one\n")
+        base_hash, old = read_base(path)
+        proposal = Proposal.create(str(path), base_hash, old, "one\ntwo\n")
+        path.write_text("edited\n")
+        try:
+            proposal.new_content()
+            assert False, "a changed base should be refused"
+        except StaleProposalError as e:
+            assert "changed since the proposal was made" in str(e)
+        assert proposal.diff.startswith("(")
+        # a proposal to create a file goes stale once the file exists
+        created = Path(tmp) / "new.txt"
+        proposal = Proposal.create(str(created), None, "", "hello\n")
+        assert proposal.new_content() == "hello\n"
+        created.write_text("someone else\n")
+        try:
+            proposal.new_content()
+            assert False, "a created base should be refused"
+        except StaleProposalError as e:
+            assert "was created" in str(e)
+
+
+if __name__ == "__main__":
+    print("🧪 Testing write proposals...\n")
+    tests = [(name, fn) for name, fn in list(globals().items()) if name.startswith("test_")]
+    for name, fn in tests:
+        fn()
+        print(f"  ✓ {name}")
+    print(f"\n✅ {len(tests)} tests passed!")
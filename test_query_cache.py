@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test the session cache for repeated searches:
+- entries are dropped when a fingerprinted file or the version changes
+- the least recently used entry is evicted first
+- intelligent_search answers repeats from the cache until a file changes
+- a cached "no matches" is dropped once any file gains the query, and tool writes clear the cache
+- a cached ranking is dropped when a file that did not contain the query's terms gains one
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from deepagents_cli.agent import config
+from deepagents_cli.agent.claude_tools import intelligent_search
+from deepagents_cli.agent.atomic_write import atomic_write_text
+from deepagents_cli.agent.query_cache import QueryCache, fingerprint, query_cache
+from deepagents_cli.agent.tools import code_search
+
+
+def test_fingerprint_and_version_invalidate():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "a.txt"
+        path.write_text("one")
+        cache = QueryCache()
+        cache.put("k", "result", {str(path): fingerprint(path)}, version=1)
+        assert cache.get("k", 1) == "result"
+        assert cache.get("k", 2) is None  # a version mismatch drops the entry
+        cache.put("k", "result", {str(path): fingerprint(path)}, version=1)
+        path.write_text("changed")
+        assert cache.get("k", 1) is None
+        cache.put("k", "result", {str(path): fingerprint(path)})
+        path.unlink()
+        assert cache.get("k") is None
+
+
+def test_lru_eviction():
+    cache = QueryCache(max_entries=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"  # "b" is now the least recently used
+    cache.put("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+
+
+def test_intelligent_search_repeats_are_cached():
+    saved_root = config.FS_ROOT
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp).resolve()
+        (root / "src").mkdir()
+        (root / "src" / "a.py").write_text("def cached_lookup(): pass\n")
+        (root / "b.py").write_text("nothing here\n")
+        config.set_fs_root(root)
+        try:
+            first = intelligent_search("cached_lookup", context=0)
+            assert "src/a.py:1" in first
+            hits = query_cache.hits
+            assert intelligent_search("cached_lookup", context=0) == first
+            assert query_cache.hits == hits + 1
+            (root / "b.py").write_text("cached_lookup()\n")
+            updated = intelligent_search("cached_lookup", context=0)
+            assert "b.py:1" in updated and "src/a.py:1" in updated
+            assert query_cache.hits == hits + 1
+        finally:
+            config.set_fs_root(saved_root)
+
+
+def test_no_match_is_dropped_when_a_file_gains_the_query():
+    saved_root = config.FS_ROOT
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp).resolve()
+        (root / "src").mkdir()
+        (root / "src" / "a.py").write_text("a = 1\n")
+        (root / "src" / "b.py").write_text("b = 2\n")
+        config.set_fs_root(root)
+        try:
+            assert code_search("needle_xyz") == "(no matches)"
+            assert intelligent_search("needle_xyz", context=0) == "🔍 No matches found for 'needle_xyz'"
+            with open(root / "src" / "b.py", "a") as f:  # edited in place: no directory changes
+                f.write("needle_xyz = 3\n")
+            assert code_search("needle_xyz") == "src/b.py:2: needle_xyz = 3"
+            assert "src/b.py:2" in intelligent_search("needle_xyz", context=0)
+            code_search("needle_xyz")
+            assert len(query_cache._entries) > 0
+            atomic_write_text(root / "src" / "a.py", "a = needle_xyz\n", fsync=False)
+            assert len(query_cache._entries) == 0
+            assert code_search("needle_xyz") == "src/a.py:1: a = needle_xyz\nsrc/b.py:2: needle_xyz = 3"
+        finally:
+            config.set_fs_root(saved_root)
+
+
+def test_ranking_follows_a_file_gaining_a_term():
+    saved_root = config.FS_ROOT
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp).resolve()
+        (root / "a.py").write_text("ranked_term = 1\n")
+        (root / "b.py").write_text("b = 2\n")
+        config.set_fs_root(root)
+        try:
+            first = intelligent_search("ranked_term", context=0, ranked=True)
+            assert "a.py:1" in first and "b.py" not in first
+            assert intelligent_search("ranked_term", context=0, ranked=True) == first
+            with open(root / "b.py", "a") as f:  # b.py was not scored, so only the version catches this
+                f.write("ranked_term = ranked_term\n")
+            updated = intelligent_search("ranked_term", context=0, ranked=True)
+            assert "📍 b.py:2" in updated and "📍 a.py:1" in updated
+        finally:
+            config.set_fs_root(saved_root)
+
+
+if __name__ == "__main__":
+    print("🧪 Testing the query cache...\n")
+    tests = [(name, fn) for name, fn in list(globals().items()) if name.startswith("test_")]
+    for name, fn in tests:
+        fn()
+        print(f"  ✓ {name}")
+    print(f"\n✅ {len(tests)} tests passed!")
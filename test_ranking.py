@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test BM25 ranking for intelligent_search(ranked=True):
+- compound identifiers are split into their parts
+- definitions and base-name matches outrank plain mentions; directory names do not boost
+- files are decoded with their sniffed encoding
+- rank(refresh=False) reuses the caller's index refresh
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from deepagents_cli.agent.ranking import TokenIndex, tokenize
+from deepagents_cli.agent.search_index import get_index
+
+
+def write(root: Path, rel: str, text: str, encoding: str = "utf-8") -> None:
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(text.encode(encoding))
+
+
+def scores(index: TokenIndex, query: str) -> dict:
+    return {f.path.relative_to(index.root).as_posix(): f.score for f in index.rank(query, top_k=50)}
+
+
+def test_tokenize_splits_identifiers():
+    assert tokenize("parseHTTPResponse snake_case2 42") == [
+        "parsehttpresponse", "parse", "http", "response", "snake_case2", "snake", "case", "2", "42"]
+
+
+def test_definitions_and_base_names_rank_first():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp).resolve()
+        filler = "\n".join(f"value_{i} = {i}" for i in range(20))
+        write(root, "uses.py", f"{filler}\nresult = parse_config(path)\n")
+        write(root, "defines.py", f"{filler}\ndef parse_config(path):\n    pass\n")
+        write(root, "config.py", f"{filler}\nresult = parse_config(path)\n")
+        write(root, "config/a.py", f"{filler}\nresult = parse_config(path)\n")
+        index = TokenIndex(root)
+        ranked = scores(index, "parse_config")
+        assert ranked["defines.py"] > ranked["uses.py"]
+        by_name = scores(index, "config")
+        assert by_name["config.py"] > by_name["uses.py"]
+        # a directory called "config" gives no file-name boost
+        assert by_name["config/a.py"] == by_name["uses.py"]
+        assert "missing" not in scores(index, "missing")
+
+
+def test_sniffed_encodings_are_tokenized():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp).resolve()
+        write(root, "wide.txt", "\ufeffdef decode_wide_text(): pass\n", "utf-16-le")
+        write(root, "latin.txt", "caf\xe9 = latin_one_value\n", "latin-1")
+        index = TokenIndex(root)
+        assert list(scores(index, "decode_wide_text")) == ["wide.txt"]
+        assert list(scores(index, "latin_one_value")) == ["latin.txt"]
+
+
+def test_rank_without_refresh_skips_the_index_refresh():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp).resolve()
+        write(root, "a.py", "def alpha(): pass\n")
+        trigrams = get_index(root)
+        trigrams.refresh()
+        calls = []
+        real_refresh = trigrams.refresh
+        trigrams.refresh = lambda *a, **kw: calls.append(1) or real_refresh(*a, **kw)
+        try:
+            index = TokenIndex(root)
+            assert list(scores(index, "alpha")) == ["a.py"]
+            assert len(calls) == 1
+            assert [f.path.name for f in index.rank("alpha", refresh=False)] == ["a.py"]
+            assert len(calls) == 1
+        finally:
+            del trigrams.refresh
+
+
+if __name__ == "__main__":
+    print("🧪 Testing BM25 ranking...\n")
+    tests = [(name, fn) for name, fn in list(globals().items()) if name.startswith("test_")]
+    for name, fn in tests:
+        fn()
+        print(f"  ✓ {name}")
+    print(f"\n✅ {len(tests)} tests passed!")
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Test the read_many batch read tool:
+- output keeps the order given, with line ranges and per-file errors
+- the character budget truncates at a line boundary and lists omitted files
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from deepagents_cli.agent.claude_file_tools import read_many
+
+
+def test_order_ranges_and_errors():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        for name in "abc":
+            (root / f"{name}.txt").write_text("".join(f"{name} line {i}\n" for i in range(1, 6)))
+        out = read_many([f"{root}/c.txt:2-3", f"{root}/a.txt:4", f"{root}/missing.txt", f"{root}/b.txt:5-"])
+        sections = out.split("\n\n")
+        assert sections[0] == f"==> {root}/c.txt (lines 2-3) <==\n    2→c line 2\n    3→c line 3"
+        assert sections[1] == f"==> {root}/a.txt (lines 4-4) <==\n    4→a line 4"
+        assert sections[2] == f"==> {root}/missing.txt <==\nFile not found: {root}/missing.txt"
+        assert sections[3] == f"==> {root}/b.txt (lines 5-end) <==\n    5→b line 5"
+
+
+def test_budget_truncates_and_lists_omitted_files():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        for name in "abc":
+            (root / f"{name}.txt").write_text("".join(f"{name} line {i}\n" for i in range(1, 6)))
+        paths = [str(root / f"{name}.txt") for name in "abc"]
+        out = read_many(paths, max_total_chars=40)
+        first = out.split("\n\n")[0].splitlines()
+        assert first[-1] == "[truncated: output budget of 40 chars reached]"
+        assert all(line.startswith("    ") for line in first[1:-1])  # whole lines only
+        assert out.endswith(f"[2 file(s) omitted, over budget: {paths[1]}, {paths[2]}]")
+        assert read_many([]) == "No paths given"
+
+
+if __name__ == "__main__":
+    print("🧪 Testing read_many...\n")
+    tests = [(name, fn) for name, fn in list(globals().items()) if name.startswith("test_")]
+    for name, fn in tests:
+        fn()
+        print(f"  ✓ {name}")
+    print(f"\n✅ {len(tests)} tests passed!")
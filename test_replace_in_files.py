@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test replace_in_files:
+- a dry run previews diffs and writes nothing
+- regex mode expands group references, replacement pairs prefer the longest key
+- regex=True together with replacement pairs is refused rather than run as literals
+- files that are not UTF-8 text are left alone
+"""
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from deepagents_cli.agent import config, tools
+from deepagents_cli.agent.tools import clear_pending_write, replace_in_files
+
+
+@contextmanager
+def sandbox(auto_apply: bool):
+    """Temporary FS_ROOT with writes allowed and an empty proposal queue."""
+    saved = (config.FS_ROOT, config.ALLOW_FS_WRITE, config.ALLOW_AUTO_APPLY, config.FSYNC_WRITES)
+    with tempfile.TemporaryDirectory() as tmp:
+        config.set_fs_root(tmp)
+        config.ALLOW_FS_WRITE, config.ALLOW_AUTO_APPLY, config.FSYNC_WRITES = True, auto_apply, False
+        clear_pending_write()
+        try:
+            yield config.FS_ROOT
+        finally:
+            clear_pending_write()
+            config.set_fs_root(saved[0])
+            config.ALLOW_FS_WRITE, config.ALLOW_AUTO_APPLY, config.FSYNC_WRITES = saved[1:]
+
+
+def test_dry_run_and_queued_proposals():
+    with sandbox(auto_apply=False) as root:
+        (root / "a.py").write_text("foo = 1\nfoo2 = foo\n")
+        (root / "b.md").write_text("foo bar\n")
+        out = replace_in_files("foo", "baz")
+        assert out.startswith("affected files: 2, replacements: 4 (preview only)")
+        assert "+baz2 = baz" in out
+        assert tools.PENDING_WRITES == []
+        assert (root / "a.py").read_text() == "foo = 1\nfoo2 = foo\n"
+
+        out = replace_in_files("foo", "baz", include_ext="py", dry_run=False)
+        assert out.startswith("affected files: 1, replacements: 3\n")
+        assert [Path(p.path).name for p in tools.PENDING_WRITES] == ["a.py"]
+        assert tools.PENDING_WRITES[0].new_content() == "baz = 1\nbaz2 = baz\n"
+        assert (root / "a.py").read_text() == "foo = 1\nfoo2 = foo\n"
+
+
+def test_regex_and_replacement_pairs():
+    with sandbox(auto_apply=True) as root:
+        (root / "a.py").write_text("x = 12\ny = 3\n")
+        (root / "b.md").write_text("foo bar foo\n")
+        replace_in_files(r"(\d+)", r"<\1>", regex=True, dry_run=False)
+        assert (root / "a.py").read_text() == "x = <12>\ny = <3>\n"
+        replace_in_files("", "", replacements={"foo": "F", "foo bar": "FB"}, dry_run=False)
+        assert (root / "b.md").read_text() == "FB F\n"
+        assert replace_in_files("(", "", regex=True).startswith("(invalid regex:")
+
+
+def test_regex_with_replacement_pairs_is_refused():
+    with sandbox(auto_apply=True) as root:
+        (root / "a.py").write_text("foo = 1\nbar = 2\n")
+        out = replace_in_files(r"\d", "N", regex=True, replacements={"foo": "F"}, dry_run=False)
+        assert out.startswith("(regex=True cannot be combined with replacements")
+        assert (root / "a.py").read_text() == "foo = 1\nbar = 2\n"
+        # without regex the query pair is applied along with the others
+        replace_in_files("bar", "B", replacements={"foo": "F"}, dry_run=False)
+        assert (root / "a.py").read_text() == "F = 1\nB = 2\n"
+
+
+def test_non_utf8_files_are_skipped():
+    with sandbox(auto_apply=True) as root:
+        latin = "foo é\n".encode("latin-1")
+        (root / "latin.txt").write_bytes(latin)
+        (root / "utf8.txt").write_text("foo é\n", encoding="utf-8")
+        out = replace_in_files("foo", "bar", dry_run=False)
+        assert out.startswith("affected files: 1, replacements: 1\n")
+        assert (root / "latin.txt").read_bytes() == latin
+        assert (root / "utf8.txt").read_text(encoding="utf-8") == "bar é\n"
+
+
+if __name__ == "__main__":
+    print("🧪 Testing replace_in_files...\n")
+    tests = [(name, fn) for name, fn in list(globals().items()) if name.startswith("test_")]
+    for name, fn in tests:
+        fn()
+        print(f"  ✓ {name}")
+    print(f"\n✅ {len(tests)} tests passed!")
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Test the parallel search engine behind the grep-style tools:
+- hits come back in input-file order, whichever worker finishes first
+- max_matches stops the scan early
+- thread and process pools give the same results, including the automatic switch
+- mmap scans of large files, in any chunk size, find what a scan of the decoded text finds
+- a process batch that times out is rescanned on threads
+- a parked stream resumes where it stopped
+"""
+import os
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from deepagents_cli.agent import search_engine
+from deepagents_cli.agent.search_engine import SearchStream, search_files
+
+
+def make_files(root: Path, count: int = 40) -> list:
+    files = []
+    for i in range(count):
+        path = root / f"f{i:03}.txt"
+        lines = [f"line {j} of file {i}" + (" needle" if (i + j) % 7 == 0 else "") for j in range(30)]
+        path.write_text("\n".join(lines) + "\n")
+        files.append(path)
+    return files
+
+
+def expected_hits(files, pattern: str) -> list:
+    regex = re.compile(pattern)
+    return [(path, n, line) for path in files
+            for n, line in enumerate(path.read_text().split("\n")[:-1], 1) if regex.search(line)]
+
+
+def as_tuples(hits) -> list:
+    return [(hit.path, hit.line_no, hit.line) for hit in hits]
+
+
+def test_hits_keep_input_order():
+    with tempfile.TemporaryDirectory() as tmp:
+        files = make_files(Path(tmp))
+        found = search_files(reversed(files), r"need\w+", workers=4, use_processes=False)
+        assert as_tuples(found.hits) == expected_hits(list(reversed(files)), r"need\w+")
+        assert found.files_searched == len(files)
+        assert not found.truncated
+
+
+def test_max_matches_stops_early():
+    with tempfile.TemporaryDirectory() as tmp:
+        files = make_files(Path(tmp), count=200)
+        found = search_files(files, "needle", max_matches=5, workers=2)
+        assert as_tuples(found.hits) == expected_hits(files, "needle")[:5]
+        assert found.truncated
+        assert found.files_searched < len(files)
+        one_each = search_files(files[:10], "needle", max_per_file=1)
+        assert [hit.path for hit in one_each.hits] == files[:10]
+
+
+def test_mmap_scan_matches_decoded_scan():
+    saved = search_engine.MMAP_MIN_BYTES, search_engine._MMAP_CHUNK_BYTES
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "big.txt"
+        lines = [f"row {i} {'needle' if i % 9 == 0 else 'hay'} é{i}" for i in range(300)]
+        lines[40] = "Needle at the start " + "x" * 200  # one line longer than a chunk
+        lines[41:41 + 80] = [f"dense needle {i}" for i in range(80)]
+        path.write_bytes("\r\n".join(lines).encode("utf-8"))
+        cases = [("needle", 0), ("needle", 2), (r"^dense needle \d+$", 1), (r"NEEDLE|hay", 0),
+                 (r"\d{3}", 1), ("é2", 0)]
+        try:
+            for pattern, context in cases:
+                flags = re.IGNORECASE if pattern.isupper() or "|" in pattern else 0
+                search_engine.MMAP_MIN_BYTES = 1 << 40
+                decoded = search_engine._scan_file(str(path), pattern, flags, context, None, None, "replace")
+                search_engine.MMAP_MIN_BYTES = 0
+                for chunk in (64, 1000, 1 << 20):
+                    search_engine._MMAP_CHUNK_BYTES = chunk
+                    mapped = search_engine._scan_file(str(path), pattern, flags, context, None, None, "replace")
+                    assert mapped == decoded, (pattern, chunk)
+                assert decoded[0], pattern
+        finally:
+            search_engine.MMAP_MIN_BYTES, search_engine._MMAP_CHUNK_BYTES = saved
+
+
+def test_process_pool_matches_threads():
+    with tempfile.TemporaryDirectory() as tmp:
+        files = make_files(Path(tmp))
+        threads = search_files(files, "needle", context_lines=1, use_processes=False)
+        processes = search_files(files, "needle", context_lines=1, use_processes=True)
+        assert [(h.path, h.line_no, h.line, h.context) for h in processes.hits] == \
+            [(h.path, h.line_no, h.line, h.context) for h in threads.hits]
+        assert processes.files_searched == threads.files_searched
+
+
+def test_large_scans_move_to_processes():
+    with tempfile.TemporaryDirectory() as tmp:
+        files = make_files(Path(tmp))
+        saved = search_engine.PROCESS_MIN_FILES, os.cpu_count
+        search_engine.PROCESS_MIN_FILES = 8
+        os.cpu_count = lambda: 4
+        try:
+            with SearchStream(files, "needle") as stream:
+                hits = stream.take()
+                assert stream._processes is not None
+        finally:
+            search_engine.PROCESS_MIN_FILES, os.cpu_count = saved
+        assert as_tuples(hits) == expected_hits(files, "needle")
+
+
+def test_process_timeout_falls_back_to_threads():
+    with tempfile.TemporaryDirectory() as tmp:
+        files = make_files(Path(tmp))
+        saved = search_engine.PROCESS_RESULT_TIMEOUT
+        search_engine.PROCESS_RESULT_TIMEOUT = 0
+        # a fresh pool cannot answer before its workers have started
+        search_engine._drop_process_pool(search_engine._process_pool())
+        try:
+            with SearchStream(files, "needle", use_processes=True) as stream:
+                hits = stream.take()
+                assert stream._processes is None
+        finally:
+            search_engine.PROCESS_RESULT_TIMEOUT = saved
+        assert as_tuples(hits) == expected_hits(files, "needle")
+
+
+def test_parked_stream_resumes():
+    with tempfile.TemporaryDirectory() as tmp:
+        files = make_files(Path(tmp))
+        stream = SearchStream(files, "needle", workers=2)
+        first = stream.take(7)
+        stream.park()
+        rest = stream.take()
+        assert not stream.more()
+        assert as_tuples(first + rest) == expected_hits(files, "needle")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing the search engine...\n")
+    tests = [(name, fn) for name, fn in list(globals().items()) if name.startswith("test_")]
+    for name, fn in tests:
+        fn()
+        print(f"  ✓ {name}")
+    print(f"\n✅ {len(tests)} tests passed!")
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test the persistent trigram index behind code_search:
+- candidates are exactly the files holding every query trigram
+- oversized files are always candidates, ignored directories never are
+- a reopened index answers from the stored postings
+- refresh picks up new, edited and deleted files, with and without git
+"""
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from deepagents_cli.agent import search_index
+from deepagents_cli.agent.search_index import TrigramIndex
+
+
+def make_tree(root: Path) -> None:
+    (root / "src").mkdir()
+    (root / "src" / "alpha.py").write_text("def handle_request(): pass\n")
+    (root / "src" / "beta.py").write_text("HANDLE_REQUEST = 1\n")
+    (root / "gamma.txt").write_text("nothing to see\n")
+    (root / "node_modules").mkdir()
+    (root / "node_modules" / "dep.js").write_text("handle_request()\n")
+
+
+def rel_names(root: Path, paths) -> list:
+    return [p.relative_to(root).as_posix() for p in paths]
+
+
+def test_candidates_match_trigrams():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp).resolve()
+        make_tree(root)
+        index = TrigramIndex(root)
+        # trigrams are lowercase, so case differences still narrow to the same files
+        assert rel_names(root, index.candidates(["handle_request"])) == ["src/alpha.py", "src/beta.py"]
+        assert rel_names(root, index.candidates(["def handle"])) == ["src/alpha.py"]
+        assert rel_names(root, index.candidates(["missing literal"])) == []
+        assert rel_names(root, index.candidates(["handle"], prefix="src")) == ["src/alpha.py", "src/beta.py"]
+        # literals under three characters do not narrow
+        assert len(index.candidates(["ab"])) == 3
+
+
+def test_oversized_files_are_always_candidates():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp).resolve()
+        make_tree(root)
+        (root / "big.log").write_bytes(b"z" * (search_index.MAX_INDEXED_BYTES + 1))
+        index = TrigramIndex(root)
+        assert "big.log" in rel_names(root, index.candidates(["def handle"]))
+        assert "big.log" not in index.text_files()
+
+
+def test_reopened_index_uses_stored_postings():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp).resolve()
+        make_tree(root)
+        first = TrigramIndex(root)
+        expected = first.candidates(["handle_request"])
+        first.save()
+        assert (root / search_index.INDEX_DIRNAME / search_index.INDEX_FILENAME).exists()
+        # unchanged files are not tokenized again
+        real_trigrams = search_index.file_trigrams
+        search_index.file_trigrams = None
+        try:
+            assert TrigramIndex(root).candidates(["handle_request"]) == expected
+        finally:
+            search_index.file_trigrams = real_trigrams
+
+
+def test_refresh_sees_new_edited_and_deleted_files():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp).resolve()
+        make_tree(root)
+        index = TrigramIndex(root)
+        assert rel_names(root, index.candidates(["handle_request"])) == ["src/alpha.py", "src/beta.py"]
+        (root / "src" / "alpha.py").unlink()
+        (root / "src" / "beta.py").write_text("renamed = 2\n")
+        (root / "src" / "delta.py").write_text("handle_request()\n")
+        (root / "gamma.txt").write_text("now it will handle_request too\n")
+        assert rel_names(root, index.candidates(["handle_request"])) == ["gamma.txt", "src/delta.py"]
+
+
+def test_refresh_uses_git_status_for_tracked_files():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp).resolve()
+        make_tree(root)
+        git = ["git", "-c", "user.name=t", "-c", "user.email=t@t", "-C", str(root)]
+        subprocess.run(git + ["init", "-q"], check=True)
+        (root / "scratch.txt").write_text("untracked\n")
+        subprocess.run(git + ["add", "src", "gamma.txt"], check=True)
+        subprocess.run(git + ["commit", "-q", "-m", "init"], check=True)
+        index = TrigramIndex(root)
+        assert rel_names(root, index.candidates(["tracked_edit"])) == []
+        version = index.version
+        index.refresh()
+        assert index.version == version  # nothing changed, nothing re-read
+        # edits in place leave directory mtimes alone: git status finds the tracked
+        # file, and the untracked one is re-stat'ed because git does not track it
+        (root / "gamma.txt").write_text("tracked_edit\n")
+        (root / "scratch.txt").write_text("untracked tracked_edit\n")
+        assert rel_names(root, index.candidates(["tracked_edit"])) == ["gamma.txt", "scratch.txt"]
+
+
+if __name__ == "__main__":
+    print("🧪 Testing the trigram index...\n")
+    tests = [(name, fn) for name, fn in list(globals().items()) if name.startswith("test_")]
+    for name, fn in tests:
+        fn()
+        print(f"  ✓ {name}")
+    print(f"\n✅ {len(tests)} tests passed!")
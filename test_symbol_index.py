@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test the symbol index behind find_definition / find_references / list_symbols:
+- Python definitions, containers and references
+- JS/TS declarations and class members, with strings, comments and regex literals skipped
+- files are decoded with their sniffed encoding and re-parsed when they change
+- reference lines are numbered on \n only, as the parser does, so a form feed does not shift them
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from deepagents_cli.agent import config
+from deepagents_cli.agent.symbol_index import js_symbols, python_symbols
+from deepagents_cli.agent.tools import find_definition, find_references, list_symbols
+
+PY_SOURCE = '''\
+LIMIT = 10
+
+class Parser:
+    def parse(self, text):
+        return helper(text) + LIMIT
+
+def helper(value):
+    return Parser().parse(value)
+'''
+
+JS_SOURCE = '''\
+// function notDefined() {}
+export const API_URL = "https://example.com/*not a comment*/";
+const quotes = /["'`\\/]+/g;
+const ratio = total / 2 / count;
+function cleanName(name) {
+    return name.replace(/[/"]/g, "").split(/'/);
+}
+class Widget extends Base {
+    static create() { return new Widget(); }
+    render() { return cleanName(this.title); }
+}
+const tick = /`/;
+function afterTick() { return `tick ${tick}`; }
+interface Props { title: string }
+'''
+
+
+def defs_of(symbols) -> list:
+    return [(s.name, s.kind, s.line, s.container) for s in symbols]
+
+
+def test_python_symbols():
+    defs, refs = python_symbols(PY_SOURCE, "m.py")
+    assert defs_of(defs) == [("LIMIT", "variable", 1, None), ("Parser", "class", 3, None),
+                             ("parse", "method", 4, "Parser"), ("helper", "function", 7, None)]
+    assert refs["helper"] == [5]
+    assert refs["LIMIT"] == [5]
+    assert refs["parse"] == [8]
+    assert python_symbols("def broken(:\n", "x.py") == ([], {})
+
+
+def test_js_symbols_skip_strings_comments_and_regexes():
+    defs, refs = js_symbols(JS_SOURCE, "w.ts")
+    assert defs_of(defs) == [
+        ("API_URL", "variable", 2, None), ("quotes", "variable", 3, None), ("ratio", "variable", 4, None),
+        ("cleanName", "function", 5, None), ("Widget", "class", 8, None),
+        ("create", "method", 9, "Widget"), ("render", "method", 10, "Widget"),
+        ("tick", "variable", 12, None), ("afterTick", "function", 13, None), ("Props", "interface", 14, None),
+    ]
+    assert "notDefined" not in refs
+    assert refs["cleanName"] == [10]
+    assert refs["total"] == [4] and refs["count"] == [4]
+
+
+def test_lookup_tools():
+    saved_root = config.FS_ROOT
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp).resolve()
+        (root / "pkg").mkdir()
+        (root / "pkg" / "m.py").write_text(PY_SOURCE)
+        (root / "w.ts").write_text(JS_SOURCE)
+        # sniffed as UTF-16 from its byte-order mark
+        (root / "wide.py").write_bytes("\ufeffdef wide_helper():\n    return helper(1)\n".encode("utf-16-le"))
+        config.set_fs_root(root)
+        try:
+            assert find_definition("helper") == "pkg/m.py:7: function helper"
+            assert find_definition("parse", kind="method") == "pkg/m.py:4: method parse (in Parser)"
+            assert find_definition("wide_helper") == "wide.py:1: function wide_helper"
+            assert find_definition("render") == "w.ts:10: method render (in Widget)"
+            assert find_references("helper").splitlines() == [
+                "pkg/m.py:5: return helper(text) + LIMIT", "wide.py:2: return helper(1)"]
+            assert list_symbols("pkg/m.py").splitlines()[:3] == [
+                "    1: variable LIMIT", "    3: class Parser", "    4:     method parse"]
+            # an edited file is re-parsed on the next lookup
+            (root / "pkg" / "m.py").write_text("def renamed_helper():\n    pass\n")
+            assert find_definition("helper") == "(no definition of 'helper' found)"
+            assert find_definition("renamed_helper") == "pkg/m.py:1: function renamed_helper"
+        finally:
+            config.set_fs_root(saved_root)
+
+
+def test_references_on_lines_after_a_form_feed():
+    saved_root = config.FS_ROOT
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp).resolve()
+        (root / "m.py").write_text("def helper():\n    pass\n\x0c\n# section\u2028note\nx = 1\nhelper()\n")
+        config.set_fs_root(root)
+        try:
+            assert find_references("helper") == "m.py:6: helper()"
+        finally:
+            config.set_fs_root(saved_root)
+
+
+if __name__ == "__main__":
+    print("🧪 Testing the symbol index...\n")
+    tests = [(name, fn) for name, fn in list(globals().items()) if name.startswith("test_")]
+    for name, fn in tests:
+        fn()
+        print(f"  ✓ {name}")
+    print(f"\n✅ {len(tests)} tests passed!")